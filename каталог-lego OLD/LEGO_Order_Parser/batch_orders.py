@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Пакетная обработка заказов без графического интерфейса
+
+Для каждого HTML файла заказа выполняется то же, что и в OrderParser:
+парсинг, обогащение данными Rebrickable и экспорт в CSV. Заказы
+обрабатываются параллельно пулом процессов; каталог загружается один раз
+(при запуске через fork процессы получают уже загруженный каталог).
+
+Пример:
+    python batch_orders.py orders/ "archive/**/*.html" -o out --merged out/all_orders.csv
+"""
+
+import argparse
+import contextlib
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import order_html
+from catalog_snapshot import default_snapshot_dir, file_hash
+from order_export import EXPORT_SCHEMA, available_formats, export_items, items_to_rows, open_exporter
+from catalog_api import RebrickableAPI
+from result_store import ResultStore
+
+# Каталог процесса-обработчика (загружается один раз на процесс)
+_api: Optional[RebrickableAPI] = None
+# Версия каталога на момент загрузки (ключ сохраненных результатов)
+_version: Optional[str] = None
+_store: Optional[ResultStore] = None
+_quiet = False
+
+
+@contextlib.contextmanager
+def silenced(enabled: bool = True):
+    """Подавление отладочного вывода парсера и поиска"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def collect_order_files(patterns: List[str]) -> List[Path]:
+    """HTML файлы заказов из списка папок, масок и путей (без повторов)"""
+    files = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(list(path.glob("*.html")) + list(path.glob("*.htm")))
+        elif any(ch in pattern for ch in "*?["):
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+        else:
+            matches = [path]
+        files.extend(p for p in matches if p.is_file())
+    return list(dict.fromkeys(p.resolve() for p in files))
+
+
+def load_catalog(data_dir: str) -> RebrickableAPI:
+    """Загрузка каталога с построением всех индексов"""
+    global _api, _version
+    if _api is None:
+        _version = RebrickableAPI.version_for(data_dir)
+        _api = RebrickableAPI(data_dir, persist_cache=True)
+        _api.build_indexes()
+    return _api
+
+
+def init_worker(data_dir: str, quiet: bool, use_store: bool = True):
+    """Инициализация процесса пула"""
+    global _quiet, _store
+    _quiet = quiet
+    _store = ResultStore(default_snapshot_dir(Path(data_dir)).parent / "orders") if use_store else None
+    with silenced(quiet):
+        load_catalog(data_dir)
+
+
+def enrich_items(api: RebrickableAPI, items: List[Dict]) -> int:
+    """Обогащение товаров данными каталога; возвращает число найденных"""
+    if api.parts_df.empty:
+        return 0
+    enriched_count = 0
+    for item, result in zip(items, api.resolve_many(items)):
+        item.update(result)
+        if result.get('part_info') or result.get('set_info') or result.get('minifig_info'):
+            enriched_count += 1
+    return enriched_count
+
+
+# Расширения файлов по заказам для каждого формата
+OUTPUT_SUFFIXES = {'csv': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+
+
+def process_order(path: Path, output_dir: Optional[Path], fmt: str = 'csv') -> Dict:
+    """Парсинг, обогащение и экспорт одного заказа (выполняется в процессе пула)"""
+    started = time.perf_counter()
+    summary = {'file': str(path), 'items': 0, 'enriched': 0, 'rows': [], 'output': None,
+               'restored': False, 'error': None}
+    try:
+        # Заказ с тем же содержимым уже обрабатывался с этой версией каталога
+        content_hash = file_hash(path) if _store else None
+        items = _store.get(content_hash, _version) if _store else None
+        if items is not None:
+            summary['restored'] = True
+            summary['enriched'] = sum(1 for item in items
+                                      if item.get('part_info') or item.get('set_info') or item.get('minifig_info'))
+        else:
+            # Отладочный вывод парсера и поиска в пакетном режиме не нужен
+            with silenced(_quiet):
+                items = order_html.parse_order_file(path)
+                summary['enriched'] = enrich_items(_api, items)
+            if _store and not _api.parts_df.empty:
+                _store.put(content_hash, _version, items)
+
+        output_path = (output_dir or path.parent) / f"{path.stem}_lego_import_api{OUTPUT_SUFFIXES[fmt]}"
+        export_items(output_path, items, fmt)
+        summary.update(items=len(items), rows=items_to_rows(items), output=str(output_path))
+    except Exception as e:
+        summary['error'] = f"{type(e).__name__}: {e}"
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Пакетная обработка HTML заказов LEGO: парсинг, обогащение Rebrickable, экспорт CSV")
+    parser.add_argument("inputs", nargs="+", help="папки, маски (glob) или пути к HTML файлам заказов")
+    parser.add_argument("-o", "--output-dir", help="папка для файлов по заказам (по умолчанию - рядом с HTML)")
+    parser.add_argument("--merged", help="путь к общему файлу по всем заказам (формат - по расширению: .csv, .jsonl, .parquet)")
+    parser.add_argument("--append", action="store_true", help="дописывать в существующий общий файл/набор данных")
+    parser.add_argument("--format", choices=available_formats(), default="csv", help="формат файлов по заказам")
+    parser.add_argument("--data-dir", default="Data", help="папка с CSV Rebrickable (по умолчанию Data)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="число процессов")
+    parser.add_argument("--no-store", action="store_true", help="не использовать сохраненные результаты заказов")
+    parser.add_argument("-v", "--verbose", action="store_true", help="не скрывать отладочный вывод парсера")
+    args = parser.parse_args(argv)
+
+    files = collect_order_files(args.inputs)
+    if not files:
+        print("Файлы заказов не найдены", file=sys.stderr)
+        return 2
+
+    output_dir = Path(args.output_dir) if args.output_dir else None
+    if output_dir:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    workers = max(1, min(args.workers, len(files)))
+    quiet = not args.verbose
+
+    # Каталог загружается до создания пула: при fork процессы получают его готовым,
+    # при spawn (Windows) - читают уже собранные снимки, а не пересобирают их одновременно
+    started = time.perf_counter()
+    with silenced(quiet):
+        load_catalog(args.data_dir)
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    load_seconds = time.perf_counter() - started
+    print(f"Заказов: {len(files)}, процессов: {workers}, загрузка каталога: {load_seconds:.1f} с")
+
+    # Общий файл пишется по мере готовности заказов, порциями, с колонкой order
+    merged = open_exporter(args.merged, schema=[('order', 'str')] + EXPORT_SCHEMA,
+                           append=args.append) if args.merged else None
+
+    results = []
+    # Порядок в общем файле - как во входном списке, а не по времени завершения
+    position = {str(path): i for i, path in enumerate(files)}
+    ready = {}
+    next_position = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=(args.data_dir, quiet, not args.no_store)) as pool:
+        futures = [pool.submit(process_order, path, output_dir, args.format) for path in files]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            status = f"ошибка: {result['error']}" if result['error'] else \
+                f"{result['enriched']}/{result['items']} обогащено" + (" (сохранено ранее)" if result['restored'] else "")
+            print(f"[{done}/{len(files)}] {Path(result['file']).name}: {status} ({result['seconds']:.2f} с)")
+
+            if merged is None:
+                continue
+            ready[position[result['file']]] = result
+            while next_position in ready:
+                result = ready.pop(next_position)
+                order = Path(result['file']).stem
+                merged.write_rows(dict(row, order=order) for row in result.pop('rows'))
+                next_position += 1
+    if merged is not None:
+        merged.close()
+    elapsed = time.perf_counter() - started
+
+    failed = [r for r in results if r['error']]
+    total_items = sum(r['items'] for r in results)
+    total_enriched = sum(r['enriched'] for r in results)
+    restored = sum(1 for r in results if r['restored'])
+    print(f"Готово за {elapsed:.1f} с: заказов {len(results) - len(failed)}/{len(results)}, "
+          f"товаров {total_items} (обогащено {total_enriched}), из сохраненных результатов {restored}, "
+          f"{len(results) / elapsed:.1f} заказов/с, {total_items / elapsed:.0f} товаров/с")
+    if args.merged:
+        print(f"Общий файл: {args.merged} (строк: {merged.rows_written})")
+    for result in failed:
+        print(f"Ошибка: {result['file']}: {result['error']}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
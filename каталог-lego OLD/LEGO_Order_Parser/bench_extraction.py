@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк правил разбора названий товаров
+
+Сравнивает прежнюю цепочку (determine_item_type, extract_part_number и поиск
+цвета в названии отдельными проходами с некомпилированными выражениями) с
+order_html.analyze_name и проверяет, что результаты совпадают.
+
+    python bench_extraction.py [число названий]
+"""
+
+import random
+import re
+import sys
+import time
+
+from order_html import COLOR_WORDS, analyze_name
+
+
+def legacy_determine_item_type(name):
+    name_lower = name.lower()
+    if any(word in name_lower for word in ['минифигурка', 'minifig', 'фигурка', 'figure']):
+        return 'minifig'
+    elif any(word in name_lower for word in ['набор', 'set', 'конструктор']):
+        return 'set'
+    else:
+        return 'part'
+
+
+def legacy_extract_part_number(name):
+    part_match = re.search(r'([a-z]{2}\d{4}|\d{5})', name, re.IGNORECASE)
+    if part_match:
+        return part_match.group(1).upper()
+    bracket_match = re.search(r'\(([^)]+)\)', name)
+    if bracket_match:
+        number_match = re.search(r'([a-z]{2}\d{4}|\d{5})', bracket_match.group(1), re.IGNORECASE)
+        if number_match:
+            return number_match.group(1).upper()
+    number_match = re.search(r'(\d{4,6})', name)
+    if number_match:
+        return number_match.group(1)
+    clean_name = re.sub(r'[^\w\s\d-]', '', name)
+    for word in clean_name.split():
+        if re.match(r'^\d{3,6}$', word):
+            return word
+    number_match = re.search(r'[№N]\s*(\d{3,6})', name, re.IGNORECASE)
+    if number_match:
+        return number_match.group(1)
+    number_match = re.search(r'(?:номер|number)\s*[:\-]?\s*(\d{3,6})', name, re.IGNORECASE)
+    if number_match:
+        return number_match.group(1)
+    number_match = re.search(r'(\d{3,6})[-/]\d{1,3}', name)
+    if number_match:
+        return number_match.group(1)
+    number_match = re.search(r'\s(\d{3,6})\s*$', name)
+    if number_match:
+        return number_match.group(1)
+    all_numbers = re.findall(r'\d{3,}', name)
+    if all_numbers:
+        longest_number = max(all_numbers, key=len)
+        if len(longest_number) >= 3:
+            return longest_number
+    return None
+
+
+def legacy_color_from_name(name):
+    color_match = re.search(r'([A-Za-z\-\s]+)\s*[UBN]\s*$', name)
+    if color_match:
+        potential_color = color_match.group(1).strip()
+        if any(color_word in potential_color.lower() for color_word in COLOR_WORDS):
+            return potential_color, False
+    bracket_match = re.search(r'\(([^)]+)\)', name)
+    if bracket_match:
+        bracket_content = bracket_match.group(1)
+        if any(color_word in bracket_content.lower() for color_word in COLOR_WORDS):
+            return bracket_content.strip(), True
+    return None, False
+
+
+def legacy_analyze(name):
+    color_hint, in_brackets = legacy_color_from_name(name)
+    return (legacy_determine_item_type(name), legacy_extract_part_number(name), color_hint, in_brackets)
+
+
+def make_names(count, seed=1):
+    """Названия, похожие на строки реальных заказов"""
+    rng = random.Random(seed)
+    kinds = ["Деталь LEGO", "Кубик", "Пластина", "Plate", "Tile", "Brick", "Минифигурка", "Minifig",
+             "Набор LEGO", "Конструктор", "Technic Beam", "Bar 4L", "Детали для набора", "Фигурка"]
+    colors = ["Black", "Trans-Red", "Dark Bluish Gray", "красный", "белый", "Light Gray", "Pearl Gold", ""]
+    names = []
+    for _ in range(count):
+        number = rng.choice([
+            str(rng.randint(3000, 99999)), f"sw{rng.randint(1, 1300):04d}", f"{rng.randint(100, 999)}",
+            f"{rng.randint(10000, 79999)}-1", f"№ {rng.randint(100, 999)}", f"{rng.randint(1, 99)}.{rng.randint(10, 99)}", ""])
+        color = rng.choice(colors)
+        template = rng.choice([
+            "{kind} {number} {size}", "{kind} {size} ({number}) {color}", "{kind} {number} {color} U",
+            "{kind} ({color}) {size}", "{kind} номер: {number}", "{kind} {size}, {color} B"])
+        names.append(template.format(kind=rng.choice(kinds), number=number, color=color,
+                                     size=rng.choice(["1 x 2", "2 x 4", "1 x 1 x 3", "4L", ""])).strip())
+    return names
+
+
+def bench(func, names, repeat=3):
+    """Лучшее время из repeat прогонов, товаров/с"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for name in names:
+            func(name)
+        best = min(best, time.perf_counter() - started)
+    return len(names) / best
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if argv else 50000
+    names = make_names(count)
+
+    mismatches = [name for name in names if tuple(analyze_name(name)) != legacy_analyze(name)]
+    if mismatches:
+        print(f"Результаты различаются для {len(mismatches)} названий, например: {mismatches[:3]}")
+        return 1
+
+    before = bench(legacy_analyze, names)
+    after = bench(analyze_name, names)
+    print(f"Названий: {count}, результаты совпадают")
+    print(f"До:    {before:,.0f} товаров/с")
+    print(f"После: {after:,.0f} товаров/с ({after / before:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,721 @@
+"""
+Каталог Rebrickable без графического интерфейса (общий для окна парсера и пакетной обработки)
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from catalog_snapshot import CatalogSnapshot, default_snapshot_dir
+from catalog_index import ColorResolver, IdIndex, NameIndex, build_lookup, name_query_terms
+from lookup_cache import LookupCache, cached_lookup
+
+class RebrickableAPI:
+    """Класс для работы с данными Rebrickable"""
+    
+    # Таблицы каталога: атрибут -> файл, нужные колонки и компактные типы.
+    # Колонки img_url читаются только при include_images=True.
+    TABLE_SPECS = {
+        'parts_df': {
+            'file': "parts.csv",
+            'usecols': ['part_num', 'name', 'part_cat_id'],
+            'dtype': {'part_num': 'object', 'name': 'object', 'part_cat_id': 'int32'}
+        },
+        'colors_df': {
+            'file': "colors.csv",
+            'usecols': ['id', 'name', 'rgb', 'is_trans'],
+            'dtype': {'id': 'int32', 'name': 'object', 'rgb': 'object', 'is_trans': 'bool'}
+        },
+        'sets_df': {
+            'file': "sets.csv",
+            'usecols': ['set_num', 'name', 'year', 'theme_id', 'num_parts'],
+            'dtype': {'set_num': 'object', 'name': 'object', 'year': 'int16',
+                      'theme_id': 'int32', 'num_parts': 'int32'},
+            'images': ['img_url']
+        },
+        'minifigs_df': {
+            'file': "minifigs.csv",
+            'usecols': ['fig_num', 'name', 'num_parts'],
+            'dtype': {'fig_num': 'object', 'name': 'object', 'num_parts': 'int32'},
+            'images': ['img_url']
+        },
+        'elements_df': {
+            'file': "elements.csv",
+            'usecols': ['element_id', 'part_num', 'color_id', 'design_id'],
+            'dtype': {'element_id': 'int64', 'part_num': 'category',
+                      'color_id': 'int32', 'design_id': 'Int32'}
+        },
+        'part_categories_df': {
+            'file': "part_categories.csv",
+            'usecols': ['id', 'name'],
+            'dtype': {'id': 'int32', 'name': 'object'}
+        },
+        'themes_df': {
+            'file': "themes.csv",
+            'usecols': ['id', 'name', 'parent_id'],
+            'dtype': {'id': 'int32', 'name': 'object', 'parent_id': 'Int32'}
+        }
+    }
+    
+    # Индексы строятся при первом обращении: атрибут -> функция построения
+    INDEX_BUILDERS = {
+        'parts_index': lambda api: IdIndex(api.parts_df, 'part_num'),
+        'sets_index': lambda api: IdIndex(api.sets_df, 'set_num'),
+        'minifigs_index': lambda api: IdIndex(api.minifigs_df, 'fig_num'),
+        'part_names': lambda api: NameIndex(api.parts_index.records),
+        'set_names': lambda api: NameIndex(api.sets_index.records),
+        'minifig_names': lambda api: NameIndex(api.minifigs_index.records),
+        'color_resolver': lambda api: ColorResolver(api.colors_df),
+        'category_names': lambda api: build_lookup(api.part_categories_df, 'id', 'name'),
+        'theme_names': lambda api: build_lookup(api.themes_df, 'id', 'name')
+    }
+    
+    def __init__(self, data_dir: str = "Data", use_snapshot: bool = True, include_images: bool = False,
+                 cache_size: int = 50000, persist_cache: bool = False):
+        self.data_dir = Path(data_dir)
+        self.use_snapshot = use_snapshot
+        self.include_images = include_images
+        self.snapshot = None
+        # Кэш результатов поиска (в том числе отрицательных)
+        self.lookup_cache = LookupCache(cache_size)
+        self.persist_cache = persist_cache
+        self.load_data()
+    
+    def __getattr__(self, name):
+        """Ленивая загрузка таблиц и индексов при первом обращении"""
+        # Вызывается только для отсутствующих атрибутов
+        if name in RebrickableAPI.TABLE_SPECS:
+            value = self.load_table(name)
+        elif name in RebrickableAPI.INDEX_BUILDERS:
+            started = time.perf_counter()
+            value = RebrickableAPI.INDEX_BUILDERS[name](self)
+            print(f"Индекс {name} построен за {time.perf_counter() - started:.2f} с")
+        else:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        setattr(self, name, value)
+        return value
+    
+    def load_data(self):
+        """Подготовка каталога Rebrickable: таблицы загружаются при первом обращении"""
+        # Сбрасываем уже загруженные таблицы и индексы
+        for name in list(self.TABLE_SPECS) + list(self.INDEX_BUILDERS):
+            self.__dict__.pop(name, None)
+        
+        # Результаты поиска по старым данным больше не действительны
+        self.lookup_cache.clear()
+        if self.persist_cache:
+            loaded = self.lookup_cache.load(self.lookup_cache_path(), self.catalog_version())
+            if loaded:
+                print(f"Загружено {loaded} сохраненных результатов поиска")
+        
+        try:
+            self.snapshot = CatalogSnapshot(self.data_dir) if self.use_snapshot else None
+        except Exception as e:
+            print(f"Снимки данных недоступны, CSV будут читаться напрямую: {e}")
+            self.snapshot = None
+    
+    def table_spec(self, attr: str) -> Dict:
+        """Параметры чтения таблицы с учетом include_images"""
+        spec = self.TABLE_SPECS[attr]
+        usecols = list(spec['usecols'])
+        if self.include_images:
+            usecols += spec.get('images', [])
+        return {'file': spec['file'], 'usecols': usecols, 'dtype': spec['dtype']}
+    
+    def load_table(self, attr: str) -> pd.DataFrame:
+        """Загрузка одной таблицы (из снимка, если он актуален)"""
+        spec = self.table_spec(attr)
+        filename = spec['file']
+        
+        def read_csv(path: Path) -> pd.DataFrame:
+            try:
+                return pd.read_csv(path, usecols=spec['usecols'], dtype=spec['dtype'])
+            except ValueError as e:
+                # Неожиданный формат колонок: читаем как есть, без компактных типов
+                print(f"Предупреждение: {filename} прочитан без оптимизации типов: {e}")
+                return pd.read_csv(path)
+        
+        started = time.perf_counter()
+        try:
+            if self.snapshot is not None:
+                df = self.snapshot.load(filename, read_csv, spec=json.dumps(spec, sort_keys=True))
+                source = self.snapshot.timings[filename][0]
+            else:
+                df = read_csv(self.data_dir / filename)
+                source = 'CSV'
+            print(f"Таблица {filename} загружена за {time.perf_counter() - started:.3f} с ({source})")
+            return df
+        except Exception as e:
+            print(f"Ошибка загрузки данных Rebrickable ({filename}): {e}")
+            # Создаем пустой DataFrame если файл не найден
+            return pd.DataFrame()
+    
+    def catalog_version(self) -> str:
+        """Версия каталога: размеры и время изменения CSV плюс параметры чтения"""
+        return RebrickableAPI.version_for(self.data_dir, self.include_images)
+    
+    @staticmethod
+    def version_for(data_dir, include_images: bool = False) -> str:
+        """Версия каталога для папки данных без загрузки таблиц"""
+        digest = hashlib.sha1()
+        digest.update(repr(include_images).encode())
+        for attr, spec in RebrickableAPI.TABLE_SPECS.items():
+            digest.update(json.dumps(spec, sort_keys=True).encode())
+            try:
+                stat = (Path(data_dir) / spec['file']).stat()
+                digest.update(f"{spec['file']}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+            except OSError:
+                digest.update(f"{spec['file']}:missing".encode())
+        return digest.hexdigest()
+    
+    def lookup_cache_path(self) -> Path:
+        """Файл сохраненного кэша результатов поиска"""
+        return default_snapshot_dir(self.data_dir).parent / "lookups.pkl"
+    
+    def save_lookup_cache(self):
+        """Сохранение кэша результатов поиска на диск (если включено persist_cache)"""
+        if not self.persist_cache:
+            return
+        try:
+            self.lookup_cache.save(self.lookup_cache_path(), self.catalog_version())
+        except Exception as e:
+            print(f"Не удалось сохранить кэш поиска: {e}")
+    
+    def cache_stats(self) -> Dict[str, float]:
+        """Статистика кэша результатов поиска"""
+        return self.lookup_cache.stats()
+    
+    def build_indexes(self):
+        """Загрузка всех таблиц и построение индексов заранее"""
+        for name in self.INDEX_BUILDERS:
+            getattr(self, name)
+    
+    def memory_report(self) -> Dict[str, int]:
+        """Вывод объема памяти, занятого загруженными таблицами (в байтах)"""
+        report = {}
+        for attr, spec in self.TABLE_SPECS.items():
+            df = self.__dict__.get(attr)
+            if df is None:
+                print(f"{spec['file']:<22} не загружена")
+                continue
+            size = int(df.memory_usage(deep=True).sum())
+            report[attr] = size
+            print(f"{spec['file']:<22} {len(df):>8} строк  {size / (1024 * 1024):8.2f} МБ")
+        print(f"{'Всего':<22} {sum(report.values()) / (1024 * 1024):23.2f} МБ")
+        return report
+    
+    def _part_info(self, part_data) -> Dict:
+        """Словарь с информацией о детали для UI и экспорта"""
+        return {
+            'part_num': part_data['part_num'],
+            'name': part_data['name'],
+            'part_cat_id': part_data['part_cat_id'],
+            'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
+        }
+    
+    def _set_info(self, set_info) -> Dict:
+        """Словарь с информацией о наборе для UI и экспорта"""
+        return {
+            'set_num': set_info['set_num'],
+            'name': set_info['name'],
+            'theme_id': set_info['theme_id'],
+            'theme_name': self.get_theme_name(set_info['theme_id']),
+            'year': set_info['year'],
+            'num_parts': set_info['num_parts']
+        }
+    
+    def _minifig_info(self, fig_data) -> Dict:
+        """Словарь с информацией о минифигурке для UI и экспорта"""
+        return {
+            'fig_num': fig_data['fig_num'],
+            'name': fig_data['name'],
+            'num_parts': fig_data['num_parts']
+        }
+    
+    def _find_exact(self, index: IdIndex, number: str) -> Optional[Dict]:
+        """Точный поиск по индексу: номер, очищенный номер, нижний регистр"""
+        # Точное совпадение
+        record = index.get(number)
+        if record is not None:
+            return record
+        
+        # Поиск по похожим номерам (убираем лишние символы)
+        clean_number = re.sub(r'[^a-zA-Z0-9]', '', number)
+        if clean_number != number:
+            record = index.get(clean_number)
+            if record is not None:
+                print(f"DEBUG: ✓ Очищенный номер найден: '{clean_number}' -> {record[index.key_column]}")
+                return record
+        
+        # Поиск по альтернативным форматам (например, SW0578 -> sw0578)
+        if number.isupper():
+            record = index.get(number.lower())
+            if record is not None:
+                print(f"DEBUG: ✓ Нижний регистр найден: '{number.lower()}' -> {record[index.key_column]}")
+                return record
+        
+        # Совпадение без учета регистра и пробелов (например, Sw0578 -> sw0578)
+        record = index.get_normalized(number)
+        if record is not None:
+            print(f"DEBUG: ✓ Нормализованный номер найден: '{number}' -> {record[index.key_column]}")
+        return record
+    
+    def similar_ids(self, item_type: str, number: str, max_distance: int = 1) -> List[Tuple[str, int]]:
+        """Номера деталей/наборов/минифигурок в пределах max_distance опечаток, лучшие первыми"""
+        index = {
+            'part': self.parts_index,
+            'set': self.sets_index,
+            'minifig': self.minifigs_index
+        }.get(item_type)
+        if index is None:
+            return []
+        return [(record[index.key_column], distance)
+                for record, distance in index.find_similar(number, max_distance)]
+    
+    @cached_lookup('part', lambda part_num, max_distance=1: (part_num, max_distance))
+    def search_part(self, part_num: str, max_distance: int = 1) -> Optional[Dict]:
+        """Поиск детали по номеру (max_distance - допустимое число опечаток)"""
+        if self.parts_df.empty:
+            return None
+        
+        # Точное совпадение
+        part_data = self.parts_index.get(part_num)
+        if part_data is not None:
+            return self._part_info(part_data)
+        
+        # Поиск по частичному совпадению (если номер содержит цифры)
+        if part_num.isdigit():
+            # Ищем детали, которые содержат этот номер
+            part_data = self.parts_index.find_containing(part_num)
+            if part_data is not None:
+                print(f"DEBUG: ✓ Частичное совпадение найдено: {part_data['part_num']} содержит {part_num}")
+                return self._part_info(part_data)
+        
+        # Очищенный номер, нижний регистр и нормализованный номер - после частичного
+        # совпадения, чтобы порядок проверок (и результаты) остались прежними
+        part_data = self._find_exact(self.parts_index, part_num)
+        if part_data is not None:
+            return self._part_info(part_data)
+        
+        # Поиск по цифровой части (например, SW0578 -> 0578)
+        if not part_num.isdigit():
+            digits = re.findall(r'\d+', part_num)
+            if digits:
+                for digit in digits:
+                    if len(digit) >= 3:  # Ищем цифры длиной от 3 символов
+                        part_data = self.parts_index.find_containing(digit)
+                        if part_data is not None:
+                            print(f"DEBUG: ✓ Цифровая часть найдена: '{digit}' в {part_data['part_num']}")
+                            return self._part_info(part_data)
+        
+        # Поиск по похожим номерам: замена, перестановка, вставка или удаление символа
+        # (например, 18860 -> 18680, 18861, 18862)
+        if part_num.isdigit() and len(part_num) >= 4 and max_distance > 0:
+            for part_data, distance in self.parts_index.find_similar(part_num, max_distance):
+                print(f"DEBUG: ✓ Похожий номер найден: '{part_num}' -> {part_data['part_num']} (правок: {distance})")
+                return self._part_info(part_data)
+        
+        print(f"DEBUG: ✗ Деталь не найдена: '{part_num}'")
+        return None
+    
+    @cached_lookup('set', lambda set_num: set_num)
+    def search_set(self, set_num: str) -> Optional[Dict]:
+        """Поиск набора по номеру"""
+        if self.sets_df.empty:
+            return None
+        
+        # Точное совпадение
+        set_info = self.sets_index.get(set_num)
+        if set_info is not None:
+            return self._set_info(set_info)
+        
+        # Поиск по частичному совпадению (если номер содержит цифры)
+        if set_num.isdigit():
+            # Ищем наборы, которые содержат этот номер
+            set_data = self.sets_index.find_containing(set_num)
+            if set_data is not None:
+                return self._set_info(set_data)
+        
+        # Очищенный номер, нижний регистр, нормализованный номер
+        set_info = self._find_exact(self.sets_index, set_num)
+        if set_info is not None:
+            return self._set_info(set_info)
+        
+        # Поиск по цифровой части (например, SW0578 -> 0578)
+        if not set_num.isdigit():
+            digits = re.findall(r'\d+', set_num)
+            if digits:
+                for digit in digits:
+                    if len(digit) >= 3:  # Ищем цифры длиной от 3 символов
+                        set_data = self.sets_index.find_containing(digit)
+                        if set_data is not None:
+                            return self._set_info(set_data)
+        
+        return None
+    
+    @cached_lookup('minifig', lambda fig_num: fig_num)
+    def search_minifig(self, fig_num: str) -> Optional[Dict]:
+        """Поиск минифигурки по номеру"""
+        if self.minifigs_df.empty:
+            return None
+        
+        # Точное совпадение
+        fig_data = self.minifigs_index.get(fig_num)
+        if fig_data is not None:
+            return self._minifig_info(fig_data)
+        
+        # Поиск по частичному совпадению (если номер содержит цифры)
+        if fig_num.isdigit():
+            # Ищем минифигурки, которые содержат этот номер
+            minifig = self.minifigs_index.find_containing(fig_num)
+            if minifig is not None:
+                return self._minifig_info(minifig)
+        
+        # Очищенный номер, нижний регистр, нормализованный номер
+        fig_data = self._find_exact(self.minifigs_index, fig_num)
+        if fig_data is not None:
+            return self._minifig_info(fig_data)
+        
+        # Поиск по цифровой части (например, SW0578 -> 0578)
+        if not fig_num.isdigit():
+            digits = re.findall(r'\d+', fig_num)
+            if digits:
+                for digit in digits:
+                    if len(digit) >= 3:  # Ищем цифры длиной от 3 символов
+                        minifig = self.minifigs_index.find_containing(digit)
+                        if minifig is not None:
+                            return self._minifig_info(minifig)
+        
+        return None
+    
+    @cached_lookup('color', lambda color_name: color_name.lower().strip())
+    def search_color(self, color_name: str) -> Optional[Dict]:
+        """Поиск цвета по названию"""
+        if self.colors_df.empty:
+            return None
+        
+        return self.color_resolver.resolve(color_name)
+    
+    def get_part_category_name(self, category_id: int) -> str:
+        """Получение названия категории детали"""
+        if not self.category_names or pd.isna(category_id):
+            return ""
+        
+        return self.category_names.get(category_id, "")
+    
+    def get_theme_name(self, theme_id: int) -> str:
+        """Получение названия темы набора"""
+        if not self.theme_names or pd.isna(theme_id):
+            return ""
+        
+        return self.theme_names.get(theme_id, "")
+    
+    # Ключ результата в товаре для каждого типа
+    INFO_KEYS = {'part': 'part_info', 'set': 'set_info', 'minifig': 'minifig_info'}
+    
+    def _search_by_number(self, item_type: str, number: str) -> Optional[Dict]:
+        searchers = {'part': self.search_part, 'set': self.search_set, 'minifig': self.search_minifig}
+        return searchers[item_type](number)
+    
+    def _search_by_name(self, item_type: str, name: str) -> Optional[Dict]:
+        searchers = {'part': self.search_part_by_name, 'set': self.search_set_by_name,
+                     'minifig': self.search_minifig_by_name}
+        return searchers[item_type](name)
+    
+    def resolve_item(self, item: Dict) -> Dict:
+        """Поиск информации о товаре так же, как при обогащении в UI
+        
+        Возвращает поля для обновления товара: part_info/set_info/minifig_info,
+        color_info и type (если товар найден под другим типом).
+        """
+        part_number = item.get('part_number')
+        item_type = item.get('type')
+        item_name = item.get('name', '')
+        result = {}
+        
+        if part_number and part_number != 'UNKNOWN':
+            # Сначала пробуем найти по определенному типу: по номеру, затем по названию
+            if item_type in self.INFO_KEYS:
+                info = self._search_by_number(item_type, part_number)
+                if not info:
+                    info = self._search_by_name(item_type, item_name)
+                if info:
+                    result[self.INFO_KEYS[item_type]] = info
+            
+            # Если не удалось найти по определенному типу, пробуем все типы
+            if not result:
+                for search, query in ((self._search_by_number, part_number), (self._search_by_name, item_name)):
+                    for other_type in ('part', 'set', 'minifig'):
+                        info = search(other_type, query)
+                        if info:
+                            result[self.INFO_KEYS[other_type]] = info
+                            result['type'] = other_type  # Обновляем тип
+                            break
+                    if result:
+                        break
+            
+            # Поиск цвета
+            color_name = item.get('color', '')
+            if color_name:
+                color_info = self.search_color(color_name)
+                if color_info:
+                    result['color_info'] = color_info
+        elif item_name and item_type in self.INFO_KEYS:
+            # Пробуем найти по названию, если номер не извлечен
+            info = self._search_by_name(item_type, item_name)
+            if info:
+                result[self.INFO_KEYS[item_type]] = info
+        
+        return result
+    
+    def resolve_many(self, items: List[Dict], progress: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
+        """Пакетное обогащение товаров заказа (результаты в порядке items)
+        
+        Одинаковые товары ищутся один раз. Точные совпадения номера с типом
+        товара находятся одним проходом по хэш-индексам, и только промахи
+        идут в цепочку нечеткого поиска resolve_item.
+        """
+        def item_key(item):
+            return (item.get('part_number'), item.get('type'), item.get('color', ''), item.get('name', ''))
+        
+        unique_items = {}
+        for item in items:
+            unique_items.setdefault(item_key(item), item)
+        
+        resolved = {}
+        colors = {}
+        misses = []
+        
+        # Точные совпадения: хэш-соединение уникальных номеров с индексами таблиц
+        indexes = {'part': (self.parts_index, self._part_info),
+                   'set': (self.sets_index, self._set_info),
+                   'minifig': (self.minifigs_index, self._minifig_info)}
+        for key, item in unique_items.items():
+            part_number, item_type, color_name, _ = key
+            record = None
+            if part_number and part_number != 'UNKNOWN' and item_type in indexes:
+                index, make_info = indexes[item_type]
+                record = index.get(part_number)
+            if record is None:
+                misses.append(key)
+                continue
+            
+            result = {self.INFO_KEYS[item_type]: make_info(record)}
+            if color_name:
+                if color_name not in colors:
+                    colors[color_name] = self.search_color(color_name)
+                if colors[color_name]:
+                    result['color_info'] = colors[color_name]
+            resolved[key] = result
+        
+        print(f"DEBUG: Пакетный поиск: {len(items)} товаров, уникальных {len(unique_items)}, "
+              f"точных совпадений {len(resolved)}, нечеткий поиск для {len(misses)}")
+        
+        # Промахи - через полную цепочку поиска
+        done = len(resolved)
+        if progress:
+            progress(done, len(unique_items))
+        for key in misses:
+            resolved[key] = self.resolve_item(unique_items[key])
+            done += 1
+            if progress:
+                progress(done, len(unique_items))
+        
+        # Каждому товару - своя копия результата
+        return [{field: dict(value) if isinstance(value, dict) else value
+                 for field, value in resolved[item_key(item)].items()}
+                for item in items]
+    
+    def rank_by_name(self, item_type: str, item_name: str, top_k: int = 5) -> List[Tuple[Dict, float]]:
+        """Лучшие кандидаты по названию товара с оценками BM25"""
+        targets = {
+            'part': (self.parts_index, self.part_names, self._part_info),
+            'set': (self.sets_index, self.set_names, self._set_info),
+            'minifig': (self.minifigs_index, self.minifig_names, self._minifig_info)
+        }
+        if item_type not in targets:
+            return []
+        index, names, make_info = targets[item_type]
+        
+        # Ищем только значимые слова
+        words = name_query_terms(item_name)
+        if not words:
+            return []
+        
+        return [(make_info(index.records[position]), score)
+                for position, score in names.search(words, top_k)]
+    
+    @cached_lookup('part_name', lambda item_name: tuple(name_query_terms(item_name)))
+    def search_part_by_name(self, item_name: str) -> Optional[Dict]:
+        """Поиск детали по названию товара"""
+        if self.parts_df.empty:
+            return None
+        
+        print(f"DEBUG: Поиск детали по названию: '{item_name}'")
+        
+        candidates = self.rank_by_name('part', item_name, top_k=1)
+        if candidates:
+            part_info, score = candidates[0]
+            print(f"DEBUG: ✓ Найдена деталь по названию: {part_info['part_num']} - {part_info['name']} (оценка {score:.2f})")
+            return part_info
+        
+        print(f"DEBUG: ✗ Деталь не найдена по названию: '{item_name}'")
+        return None
+    
+    @cached_lookup('set_name', lambda item_name: tuple(name_query_terms(item_name)))
+    def search_set_by_name(self, item_name: str) -> Optional[Dict]:
+        """Поиск набора по названию товара"""
+        if self.sets_df.empty:
+            return None
+        
+        candidates = self.rank_by_name('set', item_name, top_k=1)
+        return candidates[0][0] if candidates else None
+    
+    @cached_lookup('minifig_name', lambda item_name: tuple(name_query_terms(item_name)))
+    def search_minifig_by_name(self, item_name: str) -> Optional[Dict]:
+        """Поиск минифигурки по названию товара"""
+        if self.minifigs_df.empty:
+            return None
+        
+        candidates = self.rank_by_name('minifig', item_name, top_k=1)
+        return candidates[0][0] if candidates else None
+
+class SharedCatalog:
+    """Общий для процесса каталог Rebrickable
+
+    Загружается один раз и переиспользуется для всех заказов. При изменении
+    CSV в папке данных каталог перезагружается в фоновом потоке, а до конца
+    перезагрузки продолжает работать прежний экземпляр. После ошибки загрузки
+    повторная попытка делается только когда CSV снова изменятся.
+    """
+    
+    def __init__(self, data_dir: str = "Data"):
+        self.data_dir = Path(data_dir)
+        self.api: Optional[RebrickableAPI] = None
+        self.state = "не загружен"
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.signature = None
+        # Сигнатура данных, на которых загрузка завершилась ошибкой
+        self.failed_signature = None
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def is_current(self) -> bool:
+        """Загруженный каталог соответствует текущим CSV в папке данных"""
+        return self.api is not None and not self.is_loading and self.data_signature() == self.signature
+    
+    def data_signature(self) -> Tuple:
+        """Размер и время изменения CSV каталога (дешевая проверка изменений)"""
+        signature = []
+        for spec in RebrickableAPI.TABLE_SPECS.values():
+            path = self.data_dir / spec['file']
+            try:
+                stat = path.stat()
+                signature.append((spec['file'], stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append((spec['file'], None, None))
+        return tuple(signature)
+    
+    @property
+    def is_loading(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start_loading(self) -> bool:
+        """Запуск загрузки в фоновом потоке (если она еще не идет)"""
+        with self._lock:
+            if self.is_loading:
+                return False
+            self.state = "загрузка" if self.api is None else "перезагрузка"
+            if self.api is None:
+                self._ready.clear()
+            self._thread = threading.Thread(target=self._load, name="catalog-loader", daemon=True)
+            self._thread.start()
+            return True
+    
+    def _load(self):
+        """Загрузка и прогрев нового экземпляра каталога"""
+        started = time.perf_counter()
+        signature = self.data_signature()
+        try:
+            api = RebrickableAPI(self.data_dir, persist_cache=True)
+            api.build_indexes()
+        except Exception as e:
+            with self._lock:
+                self.state = "ошибка"
+                self.error = str(e)
+                self.failed_signature = signature
+            print(f"Ошибка загрузки каталога Rebrickable: {e}")
+            self._ready.set()
+            return
+        
+        with self._lock:
+            if self.api is not None:
+                self.reloads += 1
+            self.api = api
+            self.signature = signature
+            self.load_seconds = time.perf_counter() - started
+            self.loaded_at = time.time()
+            self.state = "готов"
+            self.error = None
+            self.failed_signature = None
+        self._ready.set()
+    
+    def get(self, timeout: Optional[float] = None) -> Optional[RebrickableAPI]:
+        """Текущий каталог; при первом обращении ждет окончания загрузки"""
+        if self.api is None:
+            self.start_loading()
+            self._ready.wait(timeout)
+        return self.api
+    
+    def check_for_changes(self) -> bool:
+        """Запуск фоновой перезагрузки, если CSV изменились. True - перезагрузка начата"""
+        if self.is_loading or (self.signature is None and self.failed_signature is None):
+            return False
+        # Те же данные, что уже загружены или уже не загрузились, повторно не читаются
+        signature = self.data_signature()
+        if signature == self.signature or signature == self.failed_signature:
+            return False
+        print("Данные Rebrickable изменились, перезагружаем каталог в фоне")
+        return self.start_loading()
+    
+    def status_text(self) -> str:
+        """Строка состояния каталога для статусной строки"""
+        with self._lock:
+            if self.state == "готов":
+                loaded = time.strftime("%H:%M:%S", time.localtime(self.loaded_at))
+                stats = self.api.cache_stats()
+                return (f"Каталог: готов за {self.load_seconds:.1f} с (загружен в {loaded}), "
+                        f"кэш поиска: {stats['size']} записей, попаданий {stats['hit_rate']:.0%}")
+            if self.state == "ошибка":
+                return f"Каталог: ошибка загрузки ({self.error})"
+            if self.state == "перезагрузка":
+                return "Каталог: перезагрузка в фоне..."
+            return f"Каталог: {self.state}..."
+
+
+# Общие каталоги процесса по папкам данных
+_shared_catalogs: Dict[Path, SharedCatalog] = {}
+_shared_catalogs_lock = threading.Lock()
+
+
+def get_shared_catalog(data_dir: str = "Data") -> SharedCatalog:
+    """Общий каталог для папки данных (создается при первом обращении)"""
+    key = Path(data_dir).resolve()
+    with _shared_catalogs_lock:
+        if key not in _shared_catalogs:
+            _shared_catalogs[key] = SharedCatalog(data_dir)
+        return _shared_catalogs[key]
+
+
+class TaskCancelled(Exception):
+    """Фоновая операция остановлена пользователем"""
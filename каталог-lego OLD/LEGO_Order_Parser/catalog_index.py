@@ -0,0 +1,555 @@
+"""
+Индексы по таблицам Rebrickable для быстрого поиска в RebrickableAPI
+"""
+
+import bisect
+import heapq
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+# Русско-английские соответствия для цветов
+COLOR_ALIASES = {
+    'красный': 'red',
+    'синий': 'blue',
+    'зеленый': 'green',
+    'желтый': 'yellow',
+    'черный': 'black',
+    'белый': 'white',
+    'серый': 'gray',
+    'оранжевый': 'orange',
+    'фиолетовый': 'purple',
+    'розовый': 'pink',
+    'коричневый': 'brown',
+    'голубой': 'light blue',
+    'светло-зеленый': 'light green',
+    'темно-синий': 'dark blue',
+    'темно-красный': 'dark red',
+    'светло-серый': 'light gray',
+    'темно-серый': 'dark gray',
+    'золотой': 'gold',
+    'серебряный': 'silver',
+    'прозрачный': 'transparent',
+    'прозрачно-красный': 'transparent red',
+    'прозрачно-синий': 'transparent blue',
+    'прозрачно-зеленый': 'transparent green',
+    'прозрачно-желтый': 'transparent yellow',
+    'прозрачно-оранжевый': 'transparent orange',
+    'прозрачно-фиолетовый': 'transparent purple',
+    'прозрачно-розовый': 'transparent pink',
+    'прозрачно-коричневый': 'transparent brown',
+    'прозрачно-голубой': 'transparent light blue',
+    'прозрачно-светло-зеленый': 'transparent light green',
+    'прозрачно-темно-синий': 'transparent dark blue',
+    'прозрачно-темно-красный': 'transparent dark red',
+    'прозрачно-светло-серый': 'transparent light gray',
+    'прозрачно-темно-серый': 'transparent dark gray',
+    'прозрачно-золотой': 'transparent gold',
+    'прозрачно-серебряный': 'transparent silver',
+    # Дополнительные вариации
+    'красн': 'red',
+    'син': 'blue',
+    'зелен': 'green',
+    'желт': 'yellow',
+    'черн': 'black',
+    'бел': 'white',
+    'сер': 'gray',
+    'оранж': 'orange',
+    'фиолет': 'purple',
+    'розов': 'pink',
+    'коричнев': 'brown',
+    'голуб': 'light blue',
+    'золот': 'gold',
+    'серебр': 'silver',
+    'прозрачн': 'transparent',
+    # Английские варианты
+    'red': 'red',
+    'blue': 'blue',
+    'green': 'green',
+    'yellow': 'yellow',
+    'black': 'black',
+    'white': 'white',
+    'gray': 'gray',
+    'orange': 'orange',
+    'purple': 'purple',
+    'pink': 'pink',
+    'brown': 'brown',
+    'gold': 'gold',
+    'silver': 'silver',
+    'trans': 'transparent',
+    'transparent': 'transparent',
+    # Дополнительные английские вариации
+    'light': 'light',
+    'dark': 'dark',
+    'bright': 'bright',
+    'pale': 'pale',
+    'neon': 'neon',
+    'metallic': 'metallic',
+    'pearl': 'pearl',
+    'chrome': 'chrome',
+    'copper': 'copper',
+    'brass': 'brass',
+    'bronze': 'bronze',
+    'steel': 'steel',
+    'aluminum': 'aluminum',
+    'titanium': 'titanium',
+    'platinum': 'platinum',
+    'ivory': 'ivory',
+    'cream': 'cream',
+    'beige': 'beige',
+    'tan': 'tan',
+    'olive': 'olive',
+    'lime': 'lime',
+    'teal': 'teal',
+    'turquoise': 'turquoise',
+    'navy': 'navy',
+    'maroon': 'maroon',
+    'burgundy': 'burgundy',
+    'crimson': 'crimson',
+    'scarlet': 'scarlet',
+    'coral': 'coral',
+    'salmon': 'salmon',
+    'peach': 'peach',
+    'apricot': 'apricot',
+    'amber': 'amber',
+    'indigo': 'indigo',
+    'violet': 'violet',
+    'lavender': 'lavender',
+    'magenta': 'magenta',
+    'fuchsia': 'fuchsia',
+    'cyan': 'cyan',
+    'aqua': 'aqua',
+    'azure': 'azure',
+    'cobalt': 'cobalt',
+    'ultramarine': 'ultramarine',
+    'emerald': 'emerald',
+    'jade': 'jade',
+    'forest': 'forest',
+    'mint': 'mint',
+    'sage': 'sage',
+    'khaki': 'khaki',
+    'sand': 'sand',
+    'wheat': 'wheat',
+    'champagne': 'champagne',
+    'rose': 'rose',
+    'blush': 'blush',
+    'mauve': 'mauve',
+    'taupe': 'taupe',
+    'charcoal': 'charcoal',
+    'slate': 'slate',
+    'gunmetal': 'gunmetal'
+}
+
+
+def normalize_id(value: str) -> str:
+    """Нормализация номера: нижний регистр, без пробелов
+
+    Дефис сохраняется: иначе суффикс версии набора сливается с номером
+    (455-21 совпал бы с 4552-1).
+    """
+    return re.sub(r'\s+', '', str(value).lower())
+
+
+class IdIndex:
+    """Хэш-индекс по первичному ключу таблицы (сырой и нормализованный номер)"""
+
+    def __init__(self, df: pd.DataFrame, key_column: str):
+        self.key_column = key_column
+        self.records: List[Dict] = []
+        self.keys: List[str] = []
+        self.by_key: Dict[str, int] = {}
+        self.by_normalized: Dict[str, int] = {}
+
+        if df is not None and not df.empty and key_column in df.columns:
+            # Пустые ключи пропускаем так же, как их пропускало сравнение в pandas
+            for record in df.to_dict('records'):
+                key = record[key_column]
+                if pd.isna(key):
+                    continue
+                key = str(key)
+                position = len(self.records)
+                self.records.append(record)
+                self.keys.append(key)
+                # При дубликатах побеждает первая строка, как у iloc[0]
+                self.by_key.setdefault(key, position)
+                self.by_normalized.setdefault(normalize_id(key), position)
+
+        self.fragments = FragmentIndex(self.keys)
+        # Индекс опечаток нужен только для ненайденных номеров, строим при первом обращении
+        self.typos: Optional['TypoIndex'] = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Точное совпадение по номеру"""
+        position = self.by_key.get(key)
+        return self.records[position] if position is not None else None
+
+    def get_normalized(self, key: str) -> Optional[Dict]:
+        """Совпадение без учета регистра и пробелов"""
+        position = self.by_normalized.get(normalize_id(key))
+        return self.records[position] if position is not None else None
+
+    def find_containing(self, fragment: str) -> Optional[Dict]:
+        """Первая строка, номер которой содержит фрагмент (аналог str.contains)"""
+        position = self.fragments.first(fragment)
+        return self.records[position] if position is not None else None
+
+    def find_similar(self, key: str, max_distance: int = 1) -> List[Tuple[Dict, int]]:
+        """Строки с номерами в пределах max_distance правок, лучшие первыми"""
+        if self.typos is None:
+            self.typos = TypoIndex(self.keys, max_distance)
+        return [(self.records[position], distance)
+                for position, distance in self.typos.candidates(key, max_distance)]
+
+
+class FragmentIndex:
+    """N-граммный индекс номеров: какие номера содержат заданный фрагмент"""
+
+    def __init__(self, keys: List[str], n: int = 3):
+        self.n = n
+        self.keys = keys
+        self.postings: Dict[str, List[int]] = {}
+
+        for position, key in enumerate(keys):
+            seen = set()
+            for start in range(len(key) - n + 1):
+                gram = key[start:start + n]
+                if gram not in seen:
+                    seen.add(gram)
+                    # Позиции добавляются по возрастанию, списки остаются отсортированными
+                    self.postings.setdefault(gram, []).append(position)
+
+    def find(self, fragment: str) -> List[int]:
+        """Позиции номеров, содержащих фрагмент, в порядке строк таблицы"""
+        if len(fragment) < self.n:
+            # Короткий фрагмент не раскладывается на n-граммы, проверяем все номера
+            return [position for position, key in enumerate(self.keys) if fragment in key]
+
+        grams = {fragment[start:start + self.n] for start in range(len(fragment) - self.n + 1)}
+        posting_lists = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if not posting:
+                return []
+            posting_lists.append(posting)
+
+        # Пересекаем начиная с самого короткого списка
+        posting_lists.sort(key=len)
+        candidates = set(posting_lists[0])
+        for posting in posting_lists[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        # N-граммы могут совпасть вразброс, поэтому проверяем подстроку
+        return sorted(position for position in candidates if fragment in self.keys[position])
+
+    def first(self, fragment: str) -> Optional[int]:
+        """Позиция первого номера, содержащего фрагмент"""
+        positions = self.find(fragment)
+        return positions[0] if positions else None
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Расстояние Дамерау-Левенштейна (OSA): перестановка соседних символов - одна правка"""
+    two_back = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if two_back is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], two_back[j - 2] + 1)
+        two_back, previous = previous, current
+    return previous[len(b)]
+
+
+class TypoIndex:
+    """Словарь симметричных удалений: номера с опечатками находятся за одну пробу"""
+
+    def __init__(self, keys: List[str], max_distance: int = 1):
+        self.keys = keys
+        self.depth = 0
+        # Вариант с удалениями -> позиция (или список позиций при совпадениях)
+        self.deletes: Dict[str, object] = {}
+        self.build(max_distance)
+
+    @staticmethod
+    def deletion_variants(word: str, depth: int) -> set:
+        """Все варианты слова с удалением не более depth символов"""
+        variants = {word}
+        frontier = {word}
+        for _ in range(depth):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            variants |= frontier
+        return variants
+
+    def build(self, depth: int):
+        """Построение словаря удалений заданной глубины"""
+        deletes: Dict[str, object] = {}
+        for position, key in enumerate(self.keys):
+            for variant in self.deletion_variants(key, depth):
+                existing = deletes.get(variant)
+                if existing is None:
+                    deletes[variant] = position
+                elif isinstance(existing, int):
+                    deletes[variant] = [existing, position]
+                else:
+                    existing.append(position)
+        self.deletes = deletes
+        self.depth = depth
+
+    def candidates(self, query: str, max_distance: int = 1) -> List[Tuple[int, int]]:
+        """Позиции и расстояния номеров в пределах max_distance, лучшие первыми"""
+        if max_distance > self.depth:
+            self.build(max_distance)
+
+        positions = set()
+        for variant in self.deletion_variants(query, max_distance):
+            found = self.deletes.get(variant)
+            if found is None:
+                continue
+            if isinstance(found, int):
+                positions.add(found)
+            else:
+                positions.update(found)
+
+        ranked = []
+        for position in positions:
+            key = self.keys[position]
+            if abs(len(key) - len(query)) > max_distance:
+                continue
+            distance = edit_distance(query, key)
+            if distance <= max_distance:
+                ranked.append((self.rank(query, key, distance), position, distance))
+        ranked.sort()
+        return [(position, distance) for _, position, distance in ranked]
+
+    @staticmethod
+    def rank(query: str, key: str, distance: int) -> Tuple:
+        """Ранг кандидата: замены, затем перестановки, затем вставки и удаления"""
+        mismatches = [i for i, (a, b) in enumerate(zip(query, key)) if a != b]
+        first_mismatch = mismatches[0] if mismatches else min(len(query), len(key))
+        if len(key) != len(query):
+            kind = 2
+        elif len(mismatches) == distance:
+            kind = 0
+        else:
+            kind = 1
+        return (distance, kind, first_mismatch, key)
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбиение названия на слова в нижнем регистре"""
+    return re.findall(r'\w+', str(text).lower())
+
+
+def name_query_terms(item_name: str) -> List[str]:
+    """Значимые слова названия товара для поиска (длиннее 3 символов)"""
+    return [word for word in tokenize(item_name) if len(word) > 3]
+
+
+class NameIndex:
+    """Инвертированный индекс по словам названий с ранжированием BM25"""
+
+    # Сколько слов словаря может подставиться вместо одного слова запроса по префиксу
+    MAX_PREFIX_EXPANSION = 50
+    # Вес совпадения по префиксу относительно точного совпадения слова
+    PREFIX_WEIGHT = 0.5
+
+    def __init__(self, records: List[Dict], column: str = 'name', k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths: List[int] = []
+
+        for position, record in enumerate(records):
+            value = record.get(column)
+            tokens = tokenize(value) if not pd.isna(value) else []
+            self.doc_lengths.append(len(tokens))
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                self.postings.setdefault(token, []).append((position, count))
+
+        self.doc_count = len(self.doc_lengths)
+        self.avg_length = (sum(self.doc_lengths) / self.doc_count) if self.doc_count else 0.0
+        self.vocabulary = sorted(self.postings)
+
+    def idf(self, token: str) -> float:
+        """Обратная частота слова (вариант BM25 без отрицательных значений)"""
+        df = len(self.postings.get(token, ()))
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def expand(self, term: str) -> List[Tuple[str, float]]:
+        """Слова словаря для слова запроса: точное совпадение и продолжения по префиксу"""
+        expanded = []
+        if term in self.postings:
+            expanded.append((term, 1.0))
+        start = bisect.bisect_right(self.vocabulary, term)
+        for token in self.vocabulary[start:start + self.MAX_PREFIX_EXPANSION]:
+            if not token.startswith(term):
+                break
+            expanded.append((token, self.PREFIX_WEIGHT))
+        return expanded
+
+    def search(self, terms: List[str], top_k: int = 5) -> List[Tuple[int, float]]:
+        """Лучшие top_k позиций с оценками BM25 за один проход по спискам"""
+        scores: Dict[int, float] = {}
+        for term in dict.fromkeys(terms):
+            # Для каждого слова запроса учитываем лучшее из его вариантов в документе
+            term_scores: Dict[int, float] = {}
+            for token, weight in self.expand(term):
+                idf = self.idf(token) * weight
+                for position, tf in self.postings[token]:
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / self.avg_length)
+                    score = idf * tf * (self.k1 + 1) / (tf + norm)
+                    if score > term_scores.get(position, 0.0):
+                        term_scores[position] = score
+            for position, score in term_scores.items():
+                scores[position] = scores.get(position, 0.0) + score
+
+        # При равных оценках выигрывает строка, стоящая выше в таблице
+        return heapq.nsmallest(top_k, ((position, score) for position, score in scores.items()),
+                               key=lambda hit: (-hit[1], hit[0]))
+
+
+class ColorResolver:
+    """Скомпилированный поиск цвета по названию (таблица цветов + русско-английские синонимы)
+
+    Порядок правил как у прежнего поиска: точное название, синоним, подстрока,
+    вхождение синонима, отдельные слова, пары слов, начало названия, похожие слова.
+    """
+
+    def __init__(self, colors_df: pd.DataFrame, aliases: Optional[Dict[str, str]] = None):
+        self.aliases = COLOR_ALIASES if aliases is None else aliases
+        self.records: List[Dict] = []
+        self.exact: Dict[str, int] = {}
+        self.substrings: Dict[str, int] = {}
+        self.prefixes: Dict[str, int] = {}
+
+        if colors_df is not None and not colors_df.empty and 'name' in colors_df.columns:
+            for record in colors_df.to_dict('records'):
+                if pd.isna(record['name']):
+                    continue
+                position = len(self.records)
+                self.records.append({'id': record['id'], 'name': record['name']})
+                name = str(record['name']).lower()
+                # При совпадениях побеждает цвет, стоящий выше в таблице
+                self.exact.setdefault(name, position)
+                for start in range(len(name)):
+                    for end in range(start + 1, len(name) + 1):
+                        self.substrings.setdefault(name[start:end], position)
+                for end in range(1, len(name) + 1):
+                    self.prefixes.setdefault(name[:end], position)
+
+        # Синонимы, английское название которых есть в таблице, с их порядковым номером
+        self.alias_targets: Dict[str, int] = {}
+        self.alias_order: Dict[str, int] = {}
+        self.alias_substrings: Dict[str, int] = {}
+        for order, (alias, english) in enumerate(self.aliases.items()):
+            position = self.exact.get(english.lower())
+            if position is None:
+                continue
+            self.alias_targets[alias] = position
+            self.alias_order[alias] = order
+            for start in range(len(alias)):
+                for end in range(start + 1, len(alias) + 1):
+                    self.alias_substrings.setdefault(alias[start:end], order)
+        self.alias_by_order = {order: alias for alias, order in self.alias_order.items()}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _match_alias(self, query: str) -> Optional[int]:
+        """Первый по порядку синоним, который содержит запрос или содержится в нем"""
+        best = self.alias_substrings.get(query)
+        for start in range(len(query)):
+            for end in range(start + 1, len(query) + 1):
+                order = self.alias_order.get(query[start:end])
+                if order is not None and (best is None or order < best):
+                    best = order
+        if best is None:
+            return None
+        return self.alias_targets[self.alias_by_order[best]]
+
+    def resolve_position(self, color_name: str) -> Optional[int]:
+        """Позиция цвета в таблице или None"""
+        query = color_name.lower().strip()
+        if not query or not self.records:
+            return None
+
+        # Сначала ищем точное совпадение
+        position = self.exact.get(query)
+        if position is not None:
+            return position
+
+        # Ищем по русско-английским соответствиям
+        if query in self.aliases:
+            position = self.alias_targets.get(query)
+            if position is not None:
+                return position
+
+        # Ищем частичное совпадение
+        position = self.substrings.get(query)
+        if position is not None:
+            return position
+
+        # Ищем по английским названиям из соответствий
+        position = self._match_alias(query)
+        if position is not None:
+            return position
+
+        words = query.split()
+
+        # Поиск по частичному совпадению в названиях цветов
+        for word in words:
+            if len(word) > 2 and word in self.substrings:
+                return self.substrings[word]
+
+        # Поиск по комбинации слов (например, "light blue" -> "light blue")
+        for i in range(len(words) - 1):
+            for j in range(i + 1, len(words)):
+                if len(words[i]) > 2 and len(words[j]) > 2:
+                    position = self.substrings.get(f"{words[i]} {words[j]}")
+                    if position is not None:
+                        return position
+
+        # Поиск по началу названия цвета
+        for word in words:
+            if len(word) > 3 and word in self.prefixes:
+                return self.prefixes[word]
+
+        # Поиск по похожим названиям (word без последней буквы, +s, +y, +ish)
+        for word in words:
+            if len(word) > 3:
+                found = [self.substrings[variant]
+                         for variant in (word, word[:-1], word + 's', word + 'y', word + 'ish')
+                         if variant in self.substrings]
+                if found:
+                    return min(found)
+
+        return None
+
+    def resolve(self, color_name: str) -> Optional[Dict]:
+        """Поиск цвета: словарь {'id', 'name'} или None"""
+        position = self.resolve_position(color_name)
+        return dict(self.records[position]) if position is not None else None
+
+
+def build_lookup(df: pd.DataFrame, key_column: str, value_column: str) -> Dict:
+    """Словарь ключ -> значение (первая строка при дубликатах)"""
+    lookup = {}
+    if df is None or df.empty or key_column not in df.columns or value_column not in df.columns:
+        return lookup
+    for key, value in zip(df[key_column].tolist(), df[value_column].tolist()):
+        if not pd.isna(key):
+            lookup.setdefault(key, value)
+    return lookup
@@ -0,0 +1,155 @@
+"""
+Бинарный кэш (снимок) таблиц Rebrickable рядом с папкой Data/
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+# Меняется при изменении формата снимков, старые снимки пересобираются
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def file_hash(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-1 содержимого файла (читается блоками)"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def replace_atomically(path: Path, write: Callable[[Path], None]):
+    """Запись файла через временный файл и os.replace
+
+    Имя временного файла уникально для процесса и потока: процессы пакетной
+    обработки и потоки окна могут записывать один и тот же файл одновременно.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def default_snapshot_dir(data_dir: Path) -> Path:
+    """Папка снимков рядом с папкой данных: Data -> Data_cache/snapshot"""
+    data_dir = Path(data_dir)
+    return data_dir.with_name(data_dir.name + "_cache") / "snapshot"
+
+
+class CatalogSnapshot:
+    """Снимки распарсенных CSV в формате pickle
+
+    Каждый снимок привязан к размеру, времени изменения и хэшу исходного CSV.
+    Если CSV изменился, таблица перечитывается и снимок пересобирается.
+    """
+
+    def __init__(self, data_dir: Path, snapshot_dir: Optional[Path] = None):
+        self.data_dir = Path(data_dir)
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else default_snapshot_dir(self.data_dir)
+        self.manifest_path = self.snapshot_dir / MANIFEST_NAME
+        self.manifest = self._read_manifest()
+        # Статистика последней загрузки: имя файла -> (источник, секунды)
+        self.timings: Dict[str, tuple] = {}
+
+    def _read_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('format') == SNAPSHOT_FORMAT_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'format': SNAPSHOT_FORMAT_VERSION, 'tables': {}}
+
+    def _write_manifest(self):
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        replace_atomically(self.manifest_path, write)
+
+    def _snapshot_path(self, filename: str) -> Path:
+        return self.snapshot_dir / (Path(filename).stem + ".pkl")
+
+    def _is_fresh(self, entry: Dict, csv_path: Path, spec: str) -> bool:
+        """Проверка, что снимок соответствует текущему CSV"""
+        if not entry or entry.get('spec') != spec:
+            return False
+        if not self._snapshot_path(entry['file']).exists():
+            return False
+
+        stat = csv_path.stat()
+        if stat.st_size != entry.get('size'):
+            return False
+        if stat.st_mtime_ns == entry.get('mtime_ns'):
+            return True
+
+        # Время изменилось, но размер тот же: сверяем хэш (файл могли просто скопировать)
+        if file_hash(csv_path) != entry.get('sha1'):
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+        try:
+            self._write_manifest()
+        except OSError:
+            pass
+        return True
+
+    def load(self, filename: str, reader: Callable[[Path], pd.DataFrame], spec: str = "") -> pd.DataFrame:
+        """Загрузка таблицы из снимка или из CSV с сохранением нового снимка
+
+        spec описывает параметры чтения CSV; при его изменении снимок пересобирается.
+        """
+        csv_path = self.data_dir / filename
+        started = time.perf_counter()
+        entry = self.manifest['tables'].get(filename)
+
+        if self._is_fresh(entry, csv_path, spec):
+            try:
+                df = pd.read_pickle(self._snapshot_path(filename))
+                self.timings[filename] = ('снимок', time.perf_counter() - started)
+                return df
+            except Exception as e:
+                print(f"Снимок {filename} поврежден, перечитываем CSV: {e}")
+
+        df = reader(csv_path)
+        self.timings[filename] = ('CSV', time.perf_counter() - started)
+        self._save(filename, csv_path, df, spec)
+        return df
+
+    def _save(self, filename: str, csv_path: Path, df: pd.DataFrame, spec: str):
+        """Сохранение снимка; ошибки записи не мешают работе с данными"""
+        try:
+            self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+            replace_atomically(self._snapshot_path(filename), df.to_pickle)
+
+            stat = csv_path.stat()
+            self.manifest['tables'][filename] = {
+                'file': filename,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha1': file_hash(csv_path),
+                'spec': spec
+            }
+            self._write_manifest()
+        except Exception as e:
+            print(f"Не удалось сохранить снимок {filename}: {e}")
+
+    def report(self) -> str:
+        """Строка с временем загрузки каждой таблицы"""
+        return ", ".join(f"{name}: {seconds:.3f} с ({source})"
+                         for name, (source, seconds) in self.timings.items())
@@ -0,0 +1,154 @@
+"""
+Параллельная загрузка изображений деталей и наборов Rebrickable
+"""
+
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from thumbnail_cache import ThumbnailCache
+
+# Адреса изображений по типу товара
+IMAGE_PATHS = {
+    'part': "/part_img/parts/{number}.jpg",
+    'set': "/sets/{number}.jpg"
+}
+DEFAULT_BASE_URL = "https://img.rebrickable.com"
+THUMBNAIL_SIZE = (80, 80)
+
+
+class ImageLoader:
+    """Пул потоков для загрузки миниатюр с общей keep-alive сессией
+
+    Запросы одного изображения объединяются: пока оно загружается, новые
+    подписчики только добавляются к ожидающим. Callback вызывается в потоке
+    пула с PIL-изображением (или None) и признаком missing - изображения нет
+    на сервере (404); при сетевых ошибках missing ложно и запрос можно
+    повторить. PhotoImage из изображения нужно создавать в главном потоке Tk.
+    Если задан thumbnails, уменьшенные изображения и ответы 404 сохраняются на
+    диск и повторно не скачиваются.
+    """
+
+    def __init__(self, max_workers: int = 6, base_url: str = DEFAULT_BASE_URL,
+                 timeout: float = 10, retries: int = 3, backoff: float = 0.5,
+                 thumbnails: Optional[ThumbnailCache] = None):
+        self.base_url = base_url.rstrip('/')
+        self.thumbnails = thumbnails
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        # Одна сессия на все потоки: соединения с сервером переиспользуются
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="images")
+        self._lock = threading.Lock()
+        self._waiting: Dict[Tuple[str, str], List[Callable]] = {}
+        self.stats = {'requests': 0, 'retries': 0, 'failed': 0, 'disk_hits': 0}
+
+    def image_url(self, item_type: str, number: str) -> Optional[str]:
+        """URL изображения товара (у минифигурок изображений по номеру нет)"""
+        path = IMAGE_PATHS.get(item_type)
+        return self.base_url + path.format(number=number) if path else None
+
+    def request(self, item_type: str, number: str, callback: Callable[[Tuple[str, str], object, bool], None]):
+        """Поставить загрузку в очередь; callback(key, image, missing) вызывается по готовности"""
+        key = (item_type, number)
+        with self._lock:
+            if key in self._waiting:
+                self._waiting[key].append(callback)
+                return
+            self._waiting[key] = [callback]
+        self._executor.submit(self._load, key)
+
+    def _load(self, key: Tuple[str, str]):
+        image = None
+        missing = False
+        try:
+            known, path = self.thumbnails.get(key) if self.thumbnails else (False, None)
+            if known:
+                # Миниатюра (или отметка об ее отсутствии) уже на диске
+                self._count('disk_hits')
+                if path is not None:
+                    image = self.open_thumbnail(path)
+                else:
+                    missing = True
+            else:
+                url = self.image_url(*key)
+                status, data = self.fetch(url) if url else (None, None)
+                if data is not None:
+                    image = self.make_thumbnail(data)
+                    if self.thumbnails:
+                        self.thumbnails.put(key, image)
+                elif status == 404:
+                    missing = True
+                    if self.thumbnails:
+                        self.thumbnails.put_missing(key)
+        except Exception as e:
+            print(f"Ошибка загрузки изображения {key[1]}: {e}")
+
+        with self._lock:
+            callbacks = self._waiting.pop(key, [])
+        for callback in callbacks:
+            callback(key, image, missing)
+
+    def fetch(self, url: str) -> Tuple[Optional[int], Optional[bytes]]:
+        """Загрузка с повторами и экспоненциальной задержкой; 404 не повторяется
+        
+        Возвращает (код ответа, содержимое); при сетевой ошибке код - None.
+        """
+        status = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            self._count('requests')
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException:
+                continue
+            status = response.status_code
+            if status == 200:
+                return status, response.content
+            if status == 404:
+                return status, None
+            # 429 и 5xx - временные ошибки, пробуем еще раз
+            if status != 429 and status < 500:
+                break
+        self._count('failed')
+        return status, None
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def make_thumbnail(data: bytes):
+        """Уменьшенная копия изображения для карточки (PIL.Image)"""
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image.resize(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+
+    @staticmethod
+    def open_thumbnail(path):
+        """Миниатюра из дискового кэша"""
+        from PIL import Image
+
+        image = Image.open(path)
+        image.load()
+        return image
+
+    def shutdown(self):
+        """Остановка пула: ожидающие загрузки отменяются"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,109 @@
+"""
+Ограниченный LRU-кэш результатов поиска RebrickableAPI
+"""
+
+import copy
+import functools
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable
+
+from catalog_snapshot import replace_atomically
+
+# Маркер отсутствующего значения (None - допустимый закэшированный результат)
+_MISSING = object()
+
+
+class LookupCache:
+    """LRU-кэш с ограничением размера; отрицательные результаты тоже кэшируются"""
+
+    def __init__(self, max_size: int = 50000):
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        """Значение из кэша или результат compute() с сохранением в кэш"""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+                self.hits += 1
+        if value is not _MISSING:
+            # Копия, чтобы изменения у вызывающего кода не портили кэш
+            return copy.copy(value)
+
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return copy.copy(value)
+
+    def clear(self):
+        """Очистка кэша (например, после перезагрузки каталога)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Счетчики попаданий, промахов и вытеснений"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+    def save(self, path: Path, version: str):
+        """Сохранение кэша на диск вместе с версией каталога"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            payload = {'version': version, 'items': list(self._data.items())}
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        replace_atomically(path, write)
+
+    def load(self, path: Path, version: str) -> int:
+        """Загрузка кэша с диска, если он построен для той же версии каталога"""
+        try:
+            with open(path, 'rb') as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return 0
+        if payload.get('version') != version:
+            return 0
+        with self._lock:
+            for key, value in payload['items'][-self.max_size:]:
+                self._data[key] = value
+        return len(self._data)
+
+
+def cached_lookup(kind: str, key_func: Callable = None):
+    """Декоратор метода поиска: результат кэшируется в self.lookup_cache
+
+    key_func получает аргументы метода и возвращает нормализованный ключ.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (kind, key_func(*args, **kwargs) if key_func else (args, tuple(sorted(kwargs.items()))))
+            return self.lookup_cache.get_or_compute(key, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
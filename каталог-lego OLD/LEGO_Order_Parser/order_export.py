@@ -0,0 +1,249 @@
+"""
+Экспорт товаров заказа: CSV для импорта в каталог LEGO, JSON Lines и Parquet
+
+Схема колонок задается один раз (EXPORT_SCHEMA). Экспортеры пишут строки
+порциями по chunk_size и умеют дописывать в существующий файл или набор
+данных (append=True). Для Parquet нужен pyarrow (необязательная зависимость).
+"""
+
+import csv
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Колонки экспорта и их типы (для JSON Lines и Parquet; в CSV все значения - текст)
+EXPORT_SCHEMA: List[Tuple[str, str]] = [
+    ('type', 'str'), ('id', 'str'), ('quantity', 'int'), ('name', 'str'),
+    ('part_cat_id', 'int'), ('part_cat_name', 'str'),
+    ('color_id', 'int'), ('color_name', 'str'),
+    ('set_theme_id', 'int'), ('set_theme_name', 'str'), ('set_year', 'int'), ('set_num_parts', 'int'),
+    ('minifig_num_parts', 'int')
+]
+
+# Заголовки для импорта в LEGO каталог
+CSV_FIELDNAMES = [name for name, _ in EXPORT_SCHEMA]
+
+# Формат по расширению файла
+FORMAT_SUFFIXES = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+
+
+def item_to_row(item: Dict) -> Optional[Dict]:
+    """Строка CSV для товара (None для неизвестного типа)"""
+    item_type = item.get('type', 'part')
+    part_number = item.get('part_number', 'UNKNOWN')
+
+    # Приоритет названий: сначала API, потом оригинальное название
+    api_name = ""
+    if item_type == 'part' and item.get('part_info'):
+        api_name = item['part_info'].get('name', '')
+    elif item_type == 'set' and item.get('set_info'):
+        api_name = item['set_info'].get('name', '')
+    elif item_type == 'minifig' and item.get('minifig_info'):
+        api_name = item['minifig_info'].get('name', '')
+
+    # Используем название из API если доступно, иначе оригинальное
+    final_name = api_name if api_name else item.get('name', '')
+
+    row = dict.fromkeys(CSV_FIELDNAMES, '')
+    row.update({
+        'type': item_type,
+        'id': part_number,
+        'quantity': item.get('quantity', '1'),
+        'name': final_name
+    })
+
+    if item_type == 'part':
+        # Для деталей
+        part_info = item.get('part_info', {})
+        color_info = item.get('color_info', {})
+        row.update({
+            'part_cat_id': part_info.get('part_cat_id', ''),
+            'part_cat_name': part_info.get('part_cat_name', ''),
+            'color_id': color_info.get('id', ''),
+            'color_name': color_info.get('name', item.get('color', ''))
+        })
+    elif item_type == 'set':
+        # Для наборов
+        set_info = item.get('set_info', {})
+        row.update({
+            'set_theme_id': set_info.get('theme_id', ''),
+            'set_theme_name': set_info.get('theme_name', ''),
+            'set_year': set_info.get('year', ''),
+            'set_num_parts': set_info.get('num_parts', '')
+        })
+    elif item_type == 'minifig':
+        # Для минифигурок
+        minifig_info = item.get('minifig_info', {})
+        row['minifig_num_parts'] = minifig_info.get('num_parts', '')
+    else:
+        return None
+    return row
+
+
+def items_to_rows(items: Iterable[Dict]) -> List[Dict]:
+    """Строки CSV для всех товаров известных типов"""
+    return [row for row in map(item_to_row, items) if row is not None]
+
+
+def typed_value(value, kind: str):
+    """Значение колонки по схеме: пустые значения - None, числа - int"""
+    if value is None or value == '':
+        return None
+    if kind == 'int':
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    return str(value)
+
+
+class Exporter:
+    """Базовый экспортер: буферизует строки и сбрасывает их порциями"""
+
+    def __init__(self, path, schema: List[Tuple[str, str]] = EXPORT_SCHEMA,
+                 append: bool = False, chunk_size: int = 10000):
+        self.path = Path(path)
+        self.schema = schema
+        self.columns = [name for name, _ in schema]
+        self.append = append
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self._buffer: List[Dict] = []
+
+    def write_items(self, items: Iterable[Dict]):
+        """Экспорт товаров (строки строятся через item_to_row)"""
+        self.write_rows(row for row in map(item_to_row, items) if row is not None)
+
+    def write_rows(self, rows: Iterable[Dict]):
+        for row in rows:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._write_chunk(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+
+    def typed_rows(self, rows: List[Dict]) -> List[Dict]:
+        return [{name: typed_value(row.get(name), kind) for name, kind in self.schema} for row in rows]
+
+    def _write_chunk(self, rows: List[Dict]):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvExporter(Exporter):
+    """CSV (UTF-8 с BOM, как ожидает импорт каталога); значения пишутся как есть"""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        write_header = not (self.append and self.path.exists() and self.path.stat().st_size > 0)
+        # При дописывании в непустой файл BOM повторно не пишется
+        self._file = open(self.path, 'a' if self.append else 'w', newline='', encoding='utf-8-sig')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.columns, delimiter=',')
+        if write_header:
+            self._writer.writeheader()
+
+    def _write_chunk(self, rows: List[Dict]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class JsonLinesExporter(Exporter):
+    """JSON Lines: одна строка - один товар, значения приведены к типам схемы"""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self._file = open(self.path, 'a' if self.append else 'w', encoding='utf-8')
+
+    def _write_chunk(self, rows: List[Dict]):
+        self._file.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in self.typed_rows(rows)))
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class ParquetExporter(Exporter):
+    """Набор данных Parquet: папка с файлами part-*.parquet
+
+    Каждый запуск экспорта пишет новый файл (порция = группа строк), поэтому
+    дописывание не переписывает историю; без append старые файлы удаляются.
+    """
+
+    TYPES = {'str': 'string', 'int': 'int64'}
+
+    def __init__(self, path, **kwargs):
+        if pa is None:
+            raise RuntimeError("Для экспорта в Parquet установите pyarrow: pip install pyarrow")
+        super().__init__(path, **kwargs)
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not self.append:
+            for old_part in self.path.glob("part-*.parquet"):
+                old_part.unlink()
+        self.arrow_schema = pa.schema([(name, getattr(pa, self.TYPES[kind])()) for name, kind in self.schema])
+        self.part_path = self.path / f"part-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        self._tmp_path = self.part_path.with_suffix('.tmp')
+        self._writer = None
+
+    def _write_chunk(self, rows: List[Dict]):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._tmp_path, self.arrow_schema)
+        self._writer.write_table(pa.Table.from_pylist(self.typed_rows(rows), schema=self.arrow_schema))
+
+    def close(self):
+        super().close()
+        if self._writer is not None:
+            self._writer.close()
+            # Файл появляется в наборе только целиком
+            os.replace(self._tmp_path, self.part_path)
+
+
+EXPORTERS = {'csv': CsvExporter, 'jsonl': JsonLinesExporter, 'parquet': ParquetExporter}
+
+
+def available_formats() -> List[str]:
+    """Форматы экспорта, доступные в текущем окружении"""
+    return [fmt for fmt in EXPORTERS if fmt != 'parquet' or pa is not None]
+
+
+def detect_format(path) -> str:
+    """Формат по расширению; папка без расширения считается набором Parquet"""
+    suffix = Path(path).suffix.lower()
+    return FORMAT_SUFFIXES.get(suffix, 'parquet' if not suffix and Path(path).is_dir() else 'csv')
+
+
+def open_exporter(path, fmt: Optional[str] = None, **kwargs) -> Exporter:
+    """Экспортер нужного формата (по умолчанию - по расширению пути)"""
+    return EXPORTERS[fmt or detect_format(path)](path, **kwargs)
+
+
+def export_items(path, items: Iterable[Dict], fmt: Optional[str] = None, append: bool = False) -> int:
+    """Экспорт товаров в файл; возвращает число записанных строк"""
+    with open_exporter(path, fmt, append=append) as exporter:
+        exporter.write_items(items)
+    return exporter.rows_written
+
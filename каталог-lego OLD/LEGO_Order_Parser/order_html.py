@@ -0,0 +1,401 @@
+"""
+Разбор HTML страницы заказа: товары из раздела "Содержимое заказа"
+
+Основной вариант работает на lxml: файл читается потоково, дерево строится
+только до конца раздела заказа, а строки товаров выбираются заранее
+скомпилированными XPath-выражениями. Если lxml не установлен, используется
+BeautifulSoup с html.parser. Оба варианта возвращают одинаковые словари товаров.
+"""
+
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+ORDER_HEADING = 'Содержимое заказа'
+SECTION_CLASS = 'sale-order-detail-payment-options-order-content'
+ROW_CLASS = 'sale-order-detail-order-item-tr'
+ITEM_ROW_CLASS = 'sale-order-detail-order-basket-info'
+TITLE_CLASS = 'sale-order-detail-order-item-title'
+TD_CLASS = 'sale-order-detail-order-item-td'
+TD_TITLE_CLASS = 'sale-order-detail-order-item-td-title'
+TD_TEXT_CLASS = 'sale-order-detail-order-item-td-text'
+COLOR_CLASS = 'sale-order-detail-order-item-color'
+COLOR_NAME_CLASS = 'sale-order-detail-order-item-color-name'
+COLOR_TYPE_CLASS = 'sale-order-detail-order-item-color-type'
+
+# Слова, по которым текст считается названием цвета
+COLOR_WORDS = ['red', 'blue', 'green', 'yellow', 'black', 'white', 'gray', 'orange', 'purple', 'pink', 'brown', 'gold', 'silver', 'trans', 'красн', 'син', 'зелен', 'желт', 'черн', 'бел', 'сер', 'оранж', 'фиолет', 'розов', 'коричнев', 'голуб', 'золот', 'серебр', 'прозрачн']
+
+# Сырые поля строки товара: название, текст количества, пары (подпись, значение) блоков цвета
+RowFields = Tuple[Optional[str], Optional[str], List[Tuple[str, Optional[str]]]]
+
+
+def _has_class(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+if etree is not None:
+    _ROWS = etree.XPath(f".//div[{_has_class(ROW_CLASS)}]")
+    _TITLE = etree.XPath(f".//div[{_has_class(TITLE_CLASS)}]")
+    _LINK = etree.XPath(".//a")
+    _TDS = etree.XPath(f".//div[{_has_class(TD_CLASS)}]")
+    _TD_TITLE = etree.XPath(f".//div[{_has_class(TD_TITLE_CLASS)}]")
+    _TD_TEXT = etree.XPath(f".//div[{_has_class(TD_TEXT_CLASS)}]")
+    _SPAN = etree.XPath(".//span")
+    _COLORS = etree.XPath(f".//div[{_has_class(COLOR_CLASS)}]")
+    _COLOR_NAME = etree.XPath(f".//span[{_has_class(COLOR_NAME_CLASS)}]")
+    _COLOR_TYPE = etree.XPath(f".//span[{_has_class(COLOR_TYPE_CLASS)}]")
+
+
+def available_backends() -> List[str]:
+    """Доступные парсеры; первый - используемый по умолчанию"""
+    return (['lxml'] if etree is not None else []) + ['html.parser']
+
+
+def parse_order_file(path, progress: Optional[Callable[[int, int], None]] = None,
+                     backend: Optional[str] = None) -> List[Dict]:
+    """Товары заказа из HTML файла
+
+    Если раздел "Содержимое заказа" не найден, выбрасывается ValueError.
+    """
+    backend = backend or available_backends()[0]
+    if backend == 'lxml':
+        heading_found, section = find_order_section_lxml(path)
+        rows = _ROWS(section) if section is not None else []
+        row_classes = lambda row: row.get('class', '').split()
+        row_fields = row_fields_lxml
+    else:
+        heading_found, section = find_order_section_bs(path)
+        rows = section.find_all('div', class_=ROW_CLASS) if section is not None else []
+        row_classes = lambda row: row.get('class', [])
+        row_fields = row_fields_bs
+
+    if not heading_found:
+        raise ValueError("Раздел 'Содержимое заказа' не найден в файле")
+
+    items = []
+    for i, row in enumerate(rows):
+        if ITEM_ROW_CLASS in row_classes(row):
+            item_data = extract_item_data(row, row_fields)
+            if item_data:
+                items.append(item_data)
+        if progress:
+            progress(i + 1, len(rows))
+    return items
+
+
+def find_order_section_bs(path):
+    """(найден ли заголовок раздела, div раздела) через BeautifulSoup"""
+    with open(path, 'r', encoding='utf-8') as file:
+        html_content = file.read()
+
+    # Парсинг HTML
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Поиск раздела "Содержимое заказа"
+    order_content = soup.find('h3', string=lambda text: text and ORDER_HEADING in text)
+    if not order_content:
+        return False, None
+    return True, order_content.find_parent('div', class_=SECTION_CLASS)
+
+
+def find_order_section_lxml(path, chunk_size: int = 64 * 1024):
+    """(найден ли заголовок раздела, div раздела) потоковым разбором lxml
+
+    Чтение файла прекращается, как только закрыт div с заголовком раздела.
+    Элементы вне раздела очищаются и удаляются из дерева сразу после разбора.
+    """
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8')
+    open_sections = []
+    open_headings = 0
+    heading_found = False
+    target = None
+
+    def handle(events) -> bool:
+        """Обработка событий парсера; True - раздел разобран, читать дальше не нужно"""
+        nonlocal open_headings, heading_found, target
+        for event, element in events:
+            tag = element.tag
+            if event == 'start':
+                if tag == 'h3':
+                    open_headings += 1
+                elif tag == 'div' and SECTION_CLASS in element.get('class', '').split():
+                    open_sections.append(element)
+                continue
+
+            if tag == 'h3':
+                open_headings -= 1
+                if not heading_found and ORDER_HEADING in ''.join(element.itertext()):
+                    heading_found = True
+                    # Раздел - ближайший охватывающий div; без него товаров нет
+                    if not open_sections:
+                        return True
+                    target = open_sections[-1]
+            elif open_sections and element is open_sections[-1]:
+                open_sections.pop()
+                if element is target:
+                    return True
+            if not open_sections and not open_headings:
+                element.clear()
+                # Разобранные соседи тоже удаляются, иначе дерево растет с размером страницы
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+        return False
+
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            parser.feed(chunk)
+            if handle(parser.read_events()):
+                break
+        else:
+            parser.close()
+            handle(parser.read_events())
+
+    return heading_found, target
+
+
+def _text(element) -> str:
+    """Текст элемента как get_text(strip=True) в BeautifulSoup"""
+    return ''.join(part.strip() for part in element.itertext())
+
+
+def row_fields_lxml(row) -> RowFields:
+    """Сырые поля строки товара (lxml)"""
+    name = None
+    titles = _TITLE(row)
+    if titles:
+        links = _LINK(titles[0])
+        name = _text(links[0] if links else titles[0])
+
+    quantity_text = None
+    for td in _TDS(row):
+        td_titles = _TD_TITLE(td)
+        if td_titles and 'Количество' in ''.join(td_titles[0].itertext()):
+            texts = _TD_TEXT(td)
+            spans = _SPAN(texts[0]) if texts else []
+            if spans:
+                quantity_text = _text(spans[0])
+            break
+
+    colors = []
+    for color_div in _COLORS(row):
+        names = _COLOR_NAME(color_div)
+        if names:
+            types = _COLOR_TYPE(color_div)
+            colors.append((_text(names[0]), _text(types[0]) if types else None))
+    return name, quantity_text, colors
+
+
+def row_fields_bs(row) -> RowFields:
+    """Сырые поля строки товара (BeautifulSoup)"""
+    name = None
+    title_element = row.find('div', class_=TITLE_CLASS)
+    if title_element:
+        link = title_element.find('a')
+        name = (link or title_element).get_text(strip=True)
+
+    # Ищем количество в колонке "Количество"
+    quantity_text = None
+    for td in row.find_all('div', class_=TD_CLASS):
+        td_title = td.find('div', class_=TD_TITLE_CLASS)
+        if td_title and 'Количество' in td_title.get_text():
+            text_element = td.find('div', class_=TD_TEXT_CLASS)
+            span = text_element.find('span') if text_element else None
+            if span:
+                quantity_text = span.get_text(strip=True)
+            break
+
+    # Ищем все блоки с цветом
+    colors = []
+    for color_div in row.find_all('div', class_=COLOR_CLASS):
+        color_name_span = color_div.find('span', class_=COLOR_NAME_CLASS)
+        if color_name_span:
+            color_type_span = color_div.find('span', class_=COLOR_TYPE_CLASS)
+            colors.append((color_name_span.get_text(strip=True),
+                           color_type_span.get_text(strip=True) if color_type_span else None))
+    return name, quantity_text, colors
+
+
+def extract_item_data(row, row_fields: Callable = row_fields_bs) -> Optional[Dict]:
+    """Извлечение данных о товаре из строки HTML"""
+    try:
+        return build_item_data(*row_fields(row))
+    except Exception as e:
+        print(f"Ошибка при извлечении данных товара: {e}")
+        return None
+
+
+def build_item_data(name: Optional[str], quantity_text: Optional[str],
+                    colors: List[Tuple[str, Optional[str]]]) -> Optional[Dict]:
+    """Словарь товара из сырых полей строки"""
+    if not name:
+        return None
+    item_data = {'name': name}
+
+    # Ищем количество в формате "1 шт", "6 шт" и т.д.
+    quantity_found = False
+    if quantity_text is not None:
+        quantity_match = _QUANTITY.search(quantity_text)
+        if quantity_match:
+            item_data['quantity'] = quantity_match.group(1)
+            quantity_found = True
+            print(f"DEBUG: Количество найдено: '{quantity_text}' -> {item_data['quantity']}")
+        # Если не нашли "шт", ищем просто число
+        elif quantity_text.isdigit() and 1 <= int(quantity_text) <= 99:
+            item_data['quantity'] = quantity_text
+            quantity_found = True
+            print(f"DEBUG: Количество найдено как число: '{quantity_text}' -> {item_data['quantity']}")
+
+    # Ищем цвет в специальном блоке
+    color_found = False
+    for color_name_text, color_text in colors:
+        # Проверяем, что это блок с цветом, а не, например, с состоянием
+        if color_text is None or not _COLOR_LABEL.search(color_name_text.lower()):
+            continue
+        # Убираем код цвета в скобках, если есть, и лишние пробелы
+        color_match = _COLOR_VALUE.search(color_text)
+        if color_match:
+            item_data['color'] = _SPACES.sub(' ', color_match.group(1).strip())
+        else:
+            item_data['color'] = color_text.strip()
+        color_found = True
+        print(f"DEBUG: Цвет найден: '{color_text}' -> {item_data['color']}")
+        break
+
+    # Тип, номер и цвет из названия - за один разбор названия
+    info = analyze_name(name)
+
+    # Если цвет не найден в блоках, берем цвет из названия товара
+    if not color_found and info.color_hint:
+        item_data['color'] = info.color_hint
+        color_found = True
+        where = "в скобках" if info.color_in_brackets else "в названии"
+        print(f"DEBUG: Цвет найден {where}: '{info.color_hint}'")
+
+    # Если количество не найдено, устанавливаем по умолчанию
+    if not quantity_found:
+        item_data['quantity'] = '1'
+        print(f"DEBUG: Количество не найдено, установлено по умолчанию: 1")
+
+    # Если цвет не найден, устанавливаем пустую строку
+    if not color_found:
+        item_data['color'] = ''
+        print(f"DEBUG: Цвет не найден, установлен пустым")
+
+    item_data['type'] = info.item_type
+    item_data['part_number'] = info.part_number
+    return item_data
+
+
+# Правила разбора названия товара, скомпилированные один раз.
+# Наборы ключевых слов объединены в одно регулярное выражение (альтернацию).
+_MINIFIG_WORDS = re.compile('минифигурка|minifig|фигурка|figure')
+_SET_WORDS = re.compile('набор|set|конструктор')
+_COLOR_WORDS = re.compile('|'.join(map(re.escape, COLOR_WORDS)))
+_COLOR_LABEL = re.compile('цвет|color')  # покрывает и 'цвет:', 'color:'
+_QUANTITY = re.compile(r'(\d+)\s*шт')
+_COLOR_VALUE = re.compile(r'([^(]+)')
+_SPACES = re.compile(r'\s+')
+_NAME_COLOR = re.compile(r'([A-Za-z\-\s]+)\s*[UBN]\s*$')
+_BRACKETS = re.compile(r'\(([^)]+)\)')
+_DIGITS = re.compile(r'\d+')
+_CATALOG_NUMBER = re.compile(r'[a-z]{2}\d{4}|\d{5}', re.IGNORECASE)
+_NON_WORD = re.compile(r'[^\w\s\d-]')
+_WORD_NUMBER = re.compile(r'\d{3,6}')
+_SIGN_NUMBER = re.compile(r'[№N]\s*(\d{3,6})', re.IGNORECASE)
+_LABEL_NUMBER = re.compile(r'(?:номер|number)\s*[:\-]?\s*(\d{3,6})', re.IGNORECASE)
+_SUFFIXED_NUMBER = re.compile(r'(\d{3,6})[-/]\d{1,3}')
+_TRAILING_NUMBER = re.compile(r'\s(\d{3,6})\s*$')
+
+
+class NameInfo(NamedTuple):
+    """Результат разбора названия товара"""
+    item_type: str
+    part_number: Optional[str]
+    color_hint: Optional[str]
+    color_in_brackets: bool
+
+
+def analyze_name(name: str) -> NameInfo:
+    """Тип товара, номер и цвет из названия за один разбор
+
+    Название переводится в нижний регистр и делится на группы цифр один раз;
+    дальше правила применяются в прежнем порядке приоритета.
+    """
+    name_lower = name.lower()
+    digit_runs = _DIGITS.findall(name)
+    brackets = _BRACKETS.search(name)
+
+    # Цвет в конце названия (например, "Trans-Red U", "Black U"), иначе - в скобках
+    color_hint, in_brackets = None, False
+    # Выражение для цвета в конце дорогое: проверяем его, только если название оканчивается на U/B/N
+    color_match = _NAME_COLOR.search(name) if name.rstrip()[-1:] in ('U', 'B', 'N') else None
+    if color_match:
+        potential_color = color_match.group(1).strip()
+        if _COLOR_WORDS.search(potential_color.lower()):
+            color_hint = potential_color
+    if color_hint is None and brackets:
+        bracket_content = brackets.group(1)
+        if _COLOR_WORDS.search(bracket_content.lower()):
+            color_hint, in_brackets = bracket_content.strip(), True
+
+    return NameInfo(_item_type(name_lower), _part_number(name, digit_runs), color_hint, in_brackets)
+
+
+def _item_type(name_lower: str) -> str:
+    # Простые и четкие правила
+    if _MINIFIG_WORDS.search(name_lower):
+        return 'minifig'
+    elif _SET_WORDS.search(name_lower):
+        return 'set'
+    return 'part'  # По умолчанию считаем деталью
+
+
+def _part_number(name: str, digit_runs: List[str]) -> Optional[str]:
+    # Все правила ищут цифры: без цифр номера нет
+    if not digit_runs:
+        return None
+
+    # Номер в формате sw0578, 30374, 64567 и т.д.
+    # (правило для номера в скобках - частный случай этого же правила)
+    part_match = _CATALOG_NUMBER.search(name)
+    if part_match:
+        return part_match.group(0).upper()
+
+    # 4-6 цифр подряд: первая группа из 4+ цифр
+    for run in digit_runs:
+        if len(run) >= 4:
+            return run[:6]
+
+    # Отдельное слово из 3-6 цифр (после удаления лишних символов)
+    for word in _NON_WORD.sub('', name).split():
+        if _WORD_NUMBER.fullmatch(word):
+            return word
+
+    # "№123", "N123", "номер: 123", "123-45", "... 123" в конце строки
+    for pattern in (_SIGN_NUMBER, _LABEL_NUMBER, _SUFFIXED_NUMBER, _TRAILING_NUMBER):
+        number_match = pattern.search(name)
+        if number_match:
+            return number_match.group(1)
+
+    # Любые цифры длиной от 3 символов: берем самый длинный номер
+    all_numbers = [run for run in digit_runs if len(run) >= 3]
+    if all_numbers:
+        return max(all_numbers, key=len)
+    return None
+
+
+def determine_item_type(name: str) -> str:
+    """Определение типа товара по названию"""
+    return _item_type(name.lower())
+
+
+def extract_part_number(name: str) -> Optional[str]:
+    """Извлечение номера детали/набора из названия"""
+    return _part_number(name, _DIGITS.findall(name))
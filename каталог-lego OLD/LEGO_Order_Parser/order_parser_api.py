@@ -1,706 +1,28 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import csv
-import re
-from bs4 import BeautifulSoup
-import os
 from pathlib import Path
-import pandas as pd
-import requests
+import queue
+import threading
 import time
-from typing import Dict, List, Optional, Tuple
 
-class RebrickableAPI:
-    """Класс для работы с данными Rebrickable"""
-    
-    def __init__(self, data_dir: str = "Data"):
-        self.data_dir = Path(data_dir)
-        self.parts_df = None
-        self.colors_df = None
-        self.sets_df = None
-        self.minifigs_df = None
-        self.elements_df = None
-        self.part_categories_df = None
-        self.themes_df = None
-        self.load_data()
-    
-    def load_data(self):
-        """Загрузка CSV данных Rebrickable"""
-        try:
-            # Загружаем основные таблицы
-            self.parts_df = pd.read_csv(self.data_dir / "parts.csv")
-            self.colors_df = pd.read_csv(self.data_dir / "colors.csv")
-            self.sets_df = pd.read_csv(self.data_dir / "sets.csv")
-            self.minifigs_df = pd.read_csv(self.data_dir / "minifigs.csv")
-            self.elements_df = pd.read_csv(self.data_dir / "elements.csv")
-            self.part_categories_df = pd.read_csv(self.data_dir / "part_categories.csv")
-            self.themes_df = pd.read_csv(self.data_dir / "themes.csv")
-            
-            print("Данные Rebrickable успешно загружены")
-        except Exception as e:
-            print(f"Ошибка загрузки данных Rebrickable: {e}")
-            # Создаем пустые DataFrame если файлы не найдены
-            self.parts_df = pd.DataFrame()
-            self.colors_df = pd.DataFrame()
-            self.sets_df = pd.DataFrame()
-            self.minifigs_df = pd.DataFrame()
-            self.elements_df = pd.DataFrame()
-            self.part_categories_df = pd.DataFrame()
-            self.themes_df = pd.DataFrame()
-    
-    def search_part(self, part_num: str) -> Optional[Dict]:
-        """Поиск детали по номеру"""
-        if self.parts_df.empty:
-            return None
-        
-# print(f"DEBUG: Поиск детали по номеру: '{part_num}'")
-        
-        # Точное совпадение
-        part = self.parts_df[self.parts_df['part_num'] == part_num]
-        if not part.empty:
-            part_data = part.iloc[0]
-# print(f"DEBUG: ✓ Точное совпадение найдено: {part_data['part_num']}")
-            return {
-                'part_num': part_data['part_num'],
-                'name': part_data['name'],
-                'part_cat_id': part_data['part_cat_id'],
-                'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-            }
-        
-        # Поиск по частичному совпадению (если номер содержит цифры)
-        if part_num.isdigit():
-            # Ищем детали, которые содержат этот номер
-            part = self.parts_df[self.parts_df['part_num'].str.contains(part_num, na=False)]
-            if not part.empty:
-                part_data = part.iloc[0]
-                print(f"DEBUG: ✓ Частичное совпадение найдено: {part_data['part_num']} содержит {part_num}")
-                return {
-                    'part_num': part_data['part_num'],
-                    'name': part_data['name'],
-                    'part_cat_id': part_data['part_cat_id'],
-                    'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-                }
-        
-        # Поиск по похожим номерам (убираем лишние символы)
-        clean_part_num = re.sub(r'[^a-zA-Z0-9]', '', part_num)
-        if clean_part_num != part_num:
-            part = self.parts_df[self.parts_df['part_num'] == clean_part_num]
-            if not part.empty:
-                part_data = part.iloc[0]
-                print(f"DEBUG: ✓ Очищенный номер найден: '{clean_part_num}' -> {part_data['part_num']}")
-                return {
-                    'part_num': part_data['part_num'],
-                    'name': part_data['name'],
-                    'part_cat_id': part_data['part_cat_id'],
-                    'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-                }
-        
-        # Поиск по альтернативным форматам (например, SW0578 -> sw0578)
-        if part_num.isupper():
-            lower_part_num = part_num.lower()
-            part = self.parts_df[self.parts_df['part_num'] == lower_part_num]
-            if not part.empty:
-                part_data = part.iloc[0]
-                print(f"DEBUG: ✓ Нижний регистр найден: '{lower_part_num}' -> {part_data['part_num']}")
-                return {
-                    'part_num': part_data['part_num'],
-                    'name': part_data['name'],
-                    'part_cat_id': part_data['part_cat_id'],
-                    'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-                }
-        
-        # Поиск по цифровой части (например, SW0578 -> 0578)
-        if not part_num.isdigit():
-            digits = re.findall(r'\d+', part_num)
-            if digits:
-                for digit in digits:
-                    if len(digit) >= 3:  # Ищем цифры длиной от 3 символов
-                        part = self.parts_df[self.parts_df['part_num'].str.contains(digit, na=False)]
-                        if not part.empty:
-                            part_data = part.iloc[0]
-                            print(f"DEBUG: ✓ Цифровая часть найдена: '{digit}' в {part_data['part_num']}")
-                            return {
-                                'part_num': part_data['part_num'],
-                                'name': part_data['name'],
-                                'part_cat_id': part_data['part_cat_id'],
-                                'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-                            }
-        
-        # НОВЫЙ: Поиск по похожим номерам (например, 18860 -> 18680, 18861, 18862)
-        if part_num.isdigit() and len(part_num) >= 4:
-            # Ищем номера с похожими цифрами (замена одной цифры)
-            for i in range(len(part_num)):
-                for digit in '0123456789':
-                    if digit != part_num[i]:
-                        similar_num = part_num[:i] + digit + part_num[i+1:]
-                        part = self.parts_df[self.parts_df['part_num'] == similar_num]
-                        if not part.empty:
-                            part_data = part.iloc[0]
-                            print(f"DEBUG: ✓ Похожий номер найден: '{part_num}' -> '{similar_num}' -> {part_data['part_num']}")
-                            return {
-                                'part_num': part_data['part_num'],
-                                'name': part_data['name'],
-                                'part_cat_id': part_data['part_cat_id'],
-                                'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-                            }
-        
-        # НОВЫЙ: Поиск по номерам с перестановкой цифр
-        if part_num.isdigit() and len(part_num) >= 4:
-            # Ищем номера с перестановкой соседних цифр
-            for i in range(len(part_num) - 1):
-                swapped_num = part_num[:i] + part_num[i+1] + part_num[i] + part_num[i+2:]
-                part = self.parts_df[self.parts_df['part_num'] == swapped_num]
-                if not part.empty:
-                    part_data = part.iloc[0]
-                    print(f"DEBUG: ✓ Перестановка цифр найдена: '{part_num}' -> '{swapped_num}' -> {part_data['part_num']}")
-                    return {
-                        'part_num': part_data['part_num'],
-                        'name': part_data['name'],
-                        'part_cat_id': part_data['part_cat_id'],
-                        'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-                    }
-        
-        print(f"DEBUG: ✗ Деталь не найдена: '{part_num}'")
-        return None
-    
-    def search_set(self, set_num: str) -> Optional[Dict]:
-        """Поиск набора по номеру"""
-        if self.sets_df.empty:
-            return None
-        
-        # Точное совпадение
-        set_data = self.sets_df[self.sets_df['set_num'] == set_num]
-        if not set_data.empty:
-            set_info = set_data.iloc[0]
-            return {
-                'set_num': set_info['set_num'],
-                'name': set_info['name'],
-                'theme_id': set_info['theme_id'],
-                'theme_name': self.get_theme_name(set_info['theme_id']),
-                'year': set_info['year'],
-                'num_parts': set_info['num_parts']
-            }
-        
-        # Поиск по частичному совпадению (если номер содержит цифры)
-        if set_num.isdigit():
-            # Ищем наборы, которые содержат этот номер
-            set_data = self.sets_df[self.sets_df['set_num'].str.contains(set_num, na=False)]
-            if not set_data.empty:
-                set_info = set_data.iloc[0]
-                return {
-                    'set_num': set_info['set_num'],
-                    'name': set_info['name'],
-                    'theme_id': set_info['theme_id'],
-                    'theme_name': self.get_theme_name(set_info['theme_id']),
-                    'year': set_info['year'],
-                    'num_parts': set_info['num_parts']
-                }
-        
-        # Поиск по похожим номерам (убираем лишние символы)
-        clean_set_num = re.sub(r'[^a-zA-Z0-9]', '', set_num)
-        if clean_set_num != set_num:
-            set_data = self.sets_df[self.sets_df['set_num'] == clean_set_num]
-            if not set_data.empty:
-                set_info = set_data.iloc[0]
-                return {
-                    'set_num': set_info['set_num'],
-                    'name': set_info['name'],
-                    'theme_id': set_info['theme_id'],
-                    'theme_name': self.get_theme_name(set_info['theme_id']),
-                    'year': set_info['year'],
-                    'num_parts': set_info['num_parts']
-                }
-        
-        # Поиск по альтернативным форматам (например, SW0578 -> sw0578)
-        if set_num.isupper():
-            lower_set_num = set_num.lower()
-            set_data = self.sets_df[self.sets_df['set_num'] == lower_set_num]
-            if not set_data.empty:
-                set_info = set_data.iloc[0]
-                return {
-                    'set_num': set_info['set_num'],
-                    'name': set_info['name'],
-                    'theme_id': set_info['theme_id'],
-                    'theme_name': self.get_theme_name(set_info['theme_id']),
-                    'year': set_info['year'],
-                    'num_parts': set_info['num_parts']
-                }
-        
-        # Поиск по цифровой части (например, SW0578 -> 0578)
-        if not set_num.isdigit():
-            digits = re.findall(r'\d+', set_num)
-            if digits:
-                for digit in digits:
-                    if len(digit) >= 3:  # Ищем цифры длиной от 3 символов
-                        set_data = self.sets_df[self.sets_df['set_num'].str.contains(digit, na=False)]
-                        if not set_data.empty:
-                            set_info = set_data.iloc[0]
-                            return {
-                                'set_num': set_info['set_num'],
-                                'name': set_info['name'],
-                                'theme_id': set_info['theme_id'],
-                                'theme_name': self.get_theme_name(set_info['theme_id']),
-                                'year': set_info['year'],
-                                'num_parts': set_info['num_parts']
-                            }
-        
-        return None
-    
-    def search_minifig(self, fig_num: str) -> Optional[Dict]:
-        """Поиск минифигурки по номеру"""
-        if self.minifigs_df.empty:
-            return None
-        
-        # Точное совпадение
-        minifig = self.minifigs_df[self.minifigs_df['fig_num'] == fig_num]
-        if not minifig.empty:
-            fig_data = minifig.iloc[0]
-            return {
-                'fig_num': fig_data['fig_num'],
-                'name': fig_data['name'],
-                'num_parts': fig_data['num_parts']
-            }
-        
-        # Поиск по частичному совпадению (если номер содержит цифры)
-        if fig_num.isdigit():
-            # Ищем минифигурки, которые содержат этот номер
-            minifig = self.minifigs_df[self.minifigs_df['fig_num'].str.contains(fig_num, na=False)]
-            if not minifig.empty:
-                fig_data = minifig.iloc[0]
-                return {
-                    'fig_num': fig_data['fig_num'],
-                    'name': fig_data['name'],
-                    'num_parts': fig_data['num_parts']
-                }
-        
-        # Поиск по похожим номерам (убираем лишние символы)
-        clean_fig_num = re.sub(r'[^a-zA-Z0-9]', '', fig_num)
-        if clean_fig_num != fig_num:
-            minifig = self.minifigs_df[self.minifigs_df['fig_num'] == clean_fig_num]
-            if not minifig.empty:
-                fig_data = minifig.iloc[0]
-                return {
-                    'fig_num': fig_data['fig_num'],
-                    'name': fig_data['name'],
-                    'num_parts': fig_data['num_parts']
-                }
-        
-        # Поиск по альтернативным форматам (например, SW0578 -> sw0578)
-        if fig_num.isupper():
-            lower_fig_num = fig_num.lower()
-            minifig = self.minifigs_df[self.minifigs_df['fig_num'] == lower_fig_num]
-            if not minifig.empty:
-                fig_data = minifig.iloc[0]
-                return {
-                    'fig_num': fig_data['fig_num'],
-                    'name': fig_data['name'],
-                    'num_parts': fig_data['num_parts']
-                }
-        
-        # Поиск по цифровой части (например, SW0578 -> 0578)
-        if not fig_num.isdigit():
-            digits = re.findall(r'\d+', fig_num)
-            if digits:
-                for digit in digits:
-                    if len(digit) >= 3:  # Ищем цифры длиной от 3 символов
-                        minifig = self.minifigs_df[self.minifigs_df['fig_num'].str.contains(digit, na=False)]
-                        if not minifig.empty:
-                            fig_data = minifig.iloc[0]
-                            return {
-                                'fig_num': fig_data['fig_num'],
-                                'name': fig_data['name'],
-                                'num_parts': fig_data['num_parts']
-                            }
-        
-        return None
-    
-    def search_color(self, color_name: str) -> Optional[Dict]:
-        """Поиск цвета по названию"""
-        if self.colors_df.empty:
-            return None
-        
-        # Нормализуем название цвета для поиска
-        color_name_lower = color_name.lower().strip()
-        
-        # Русско-английские соответствия для цветов
-        color_mappings = {
-            'красный': 'red',
-            'синий': 'blue',
-            'зеленый': 'green',
-            'желтый': 'yellow',
-            'черный': 'black',
-            'белый': 'white',
-            'серый': 'gray',
-            'оранжевый': 'orange',
-            'фиолетовый': 'purple',
-            'розовый': 'pink',
-            'коричневый': 'brown',
-            'голубой': 'light blue',
-            'светло-зеленый': 'light green',
-            'темно-синий': 'dark blue',
-            'темно-красный': 'dark red',
-            'светло-серый': 'light gray',
-            'темно-серый': 'dark gray',
-            'золотой': 'gold',
-            'серебряный': 'silver',
-            'прозрачный': 'transparent',
-            'прозрачно-красный': 'transparent red',
-            'прозрачно-синий': 'transparent blue',
-            'прозрачно-зеленый': 'transparent green',
-            'прозрачно-желтый': 'transparent yellow',
-            'прозрачно-оранжевый': 'transparent orange',
-            'прозрачно-фиолетовый': 'transparent purple',
-            'прозрачно-розовый': 'transparent pink',
-            'прозрачно-коричневый': 'transparent brown',
-            'прозрачно-голубой': 'transparent light blue',
-            'прозрачно-светло-зеленый': 'transparent light green',
-            'прозрачно-темно-синий': 'transparent dark blue',
-            'прозрачно-темно-красный': 'transparent dark red',
-            'прозрачно-светло-серый': 'transparent light gray',
-            'прозрачно-темно-серый': 'transparent dark gray',
-            'прозрачно-золотой': 'transparent gold',
-            'прозрачно-серебряный': 'transparent silver',
-            # Дополнительные вариации
-            'красн': 'red',
-            'син': 'blue',
-            'зелен': 'green',
-            'желт': 'yellow',
-            'черн': 'black',
-            'бел': 'white',
-            'сер': 'gray',
-            'оранж': 'orange',
-            'фиолет': 'purple',
-            'розов': 'pink',
-            'коричнев': 'brown',
-            'голуб': 'light blue',
-            'золот': 'gold',
-            'серебр': 'silver',
-            'прозрачн': 'transparent',
-            # Английские варианты
-            'red': 'red',
-            'blue': 'blue',
-            'green': 'green',
-            'yellow': 'yellow',
-            'black': 'black',
-            'white': 'white',
-            'gray': 'gray',
-            'orange': 'orange',
-            'purple': 'purple',
-            'pink': 'pink',
-            'brown': 'brown',
-            'gold': 'gold',
-            'silver': 'silver',
-            'trans': 'transparent',
-            'transparent': 'transparent',
-            # Дополнительные английские вариации
-            'light': 'light',
-            'dark': 'dark',
-            'bright': 'bright',
-            'pale': 'pale',
-            'neon': 'neon',
-            'metallic': 'metallic',
-            'pearl': 'pearl',
-            'chrome': 'chrome',
-            'copper': 'copper',
-            'brass': 'brass',
-            'bronze': 'bronze',
-            'steel': 'steel',
-            'aluminum': 'aluminum',
-            'titanium': 'titanium',
-            'platinum': 'platinum',
-            'ivory': 'ivory',
-            'cream': 'cream',
-            'beige': 'beige',
-            'tan': 'tan',
-            'olive': 'olive',
-            'lime': 'lime',
-            'teal': 'teal',
-            'turquoise': 'turquoise',
-            'navy': 'navy',
-            'maroon': 'maroon',
-            'burgundy': 'burgundy',
-            'crimson': 'crimson',
-            'scarlet': 'scarlet',
-            'coral': 'coral',
-            'salmon': 'salmon',
-            'peach': 'peach',
-            'apricot': 'apricot',
-            'amber': 'amber',
-            'indigo': 'indigo',
-            'violet': 'violet',
-            'lavender': 'lavender',
-            'magenta': 'magenta',
-            'fuchsia': 'fuchsia',
-            'cyan': 'cyan',
-            'aqua': 'aqua',
-            'azure': 'azure',
-            'cobalt': 'cobalt',
-            'ultramarine': 'ultramarine',
-            'emerald': 'emerald',
-            'jade': 'jade',
-            'forest': 'forest',
-            'mint': 'mint',
-            'sage': 'sage',
-            'khaki': 'khaki',
-            'sand': 'sand',
-            'wheat': 'wheat',
-            'champagne': 'champagne',
-            'rose': 'rose',
-            'blush': 'blush',
-            'mauve': 'mauve',
-            'taupe': 'taupe',
-            'charcoal': 'charcoal',
-            'slate': 'slate',
-            'gunmetal': 'gunmetal'
-        }
-        
-        # Сначала ищем точное совпадение
-        color = self.colors_df[self.colors_df['name'].str.lower() == color_name_lower]
-        if not color.empty:
-            color_data = color.iloc[0]
-            return {
-                'id': color_data['id'],
-                'name': color_data['name']
-            }
-        
-        # Ищем по русско-английским соответствиям
-        if color_name_lower in color_mappings:
-            english_color = color_mappings[color_name_lower]
-            color = self.colors_df[self.colors_df['name'].str.lower() == english_color.lower()]
-            if not color.empty:
-                color_data = color.iloc[0]
-                return {
-                    'id': color_data['id'],
-                    'name': color_data['name']
-                }
-        
-        # Ищем частичное совпадение
-        color = self.colors_df[self.colors_df['name'].str.lower().str.contains(color_name_lower, na=False)]
-        if not color.empty:
-            color_data = color.iloc[0]
-            return {
-                'id': color_data['id'],
-                'name': color_data['name']
-            }
-        
-        # Ищем по английским названиям из соответствий
-        for russian, english in color_mappings.items():
-            if color_name_lower in russian or russian in color_name_lower:
-                color = self.colors_df[self.colors_df['name'].str.lower() == english.lower()]
-                if not color.empty:
-                    color_data = color.iloc[0]
-                    return {
-                        'id': color_data['id'],
-                        'name': color_data['name']
-                    }
-        
-        # Поиск по частичному совпадению в названиях цветов
-        for word in color_name_lower.split():
-            if len(word) > 2:
-                # Ищем цвета, содержащие это слово
-                color = self.colors_df[self.colors_df['name'].str.lower().str.contains(word, na=False)]
-                if not color.empty:
-                    color_data = color.iloc[0]
-                    return {
-                        'id': color_data['id'],
-                        'name': color_data['name']
-                    }
-        
-        # НОВЫЙ: Поиск по комбинации слов (например, "light blue" -> "light blue")
-        if ' ' in color_name_lower:
-            words = color_name_lower.split()
-            if len(words) >= 2:
-                # Пробуем найти по комбинации слов
-                for i in range(len(words) - 1):
-                    for j in range(i + 1, len(words)):
-                        if len(words[i]) > 2 and len(words[j]) > 2:
-                            combined_search = f"{words[i]} {words[j]}"
-                            color = self.colors_df[self.colors_df['name'].str.lower().str.contains(combined_search, na=False)]
-                            if not color.empty:
-                                color_data = color.iloc[0]
-                                return {
-                                    'id': color_data['id'],
-                                    'name': color_data['name']
-                                }
-        
-        # НОВЫЙ: Поиск по началу названия цвета
-        for word in color_name_lower.split():
-            if len(word) > 3:
-                # Ищем цвета, название которых начинается с этого слова
-                color = self.colors_df[self.colors_df['name'].str.lower().str.startswith(word, na=False)]
-                if not color.empty:
-                    color_data = color.iloc[0]
-                    return {
-                        'id': color_data['id'],
-                        'name': color_data['name']
-                    }
-        
-        # НОВЫЙ: Поиск по похожим названиям (fuzzy search)
-        for word in color_name_lower.split():
-            if len(word) > 3:
-                # Ищем цвета с похожими названиями
-                for _, color_row in self.colors_df.iterrows():
-                    color_name = str(color_row['name']).lower()
-                    # Проверяем, содержит ли название цвета наше слово или похожее
-                    if word in color_name or any(similar in color_name for similar in [word[:-1], word + 's', word + 'y', word + 'ish']):
-                        return {
-                            'id': color_row['id'],
-                            'name': color_row['name']
-                        }
-        
-        return None
-    
-    def get_part_category_name(self, category_id: int) -> str:
-        """Получение названия категории детали"""
-        if self.part_categories_df.empty or pd.isna(category_id):
-            return ""
-        
-        category = self.part_categories_df[self.part_categories_df['id'] == category_id]
-        if not category.empty:
-            return category.iloc[0]['name']
-        return ""
-    
-    def get_theme_name(self, theme_id: int) -> str:
-        """Получение названия темы набора"""
-        if self.themes_df.empty or pd.isna(theme_id):
-            return ""
-        
-        theme = self.themes_df[self.themes_df['id'] == theme_id]
-        if not theme.empty:
-            return theme.iloc[0]['name']
-        return ""
-    
-    def search_part_by_name(self, item_name: str) -> Optional[Dict]:
-        """Поиск детали по названию товара"""
-        if self.parts_df.empty:
-            return None
-        
-        print(f"DEBUG: Поиск детали по названию: '{item_name}'")
-        
-        # Нормализуем название для поиска
-        name_lower = item_name.lower().strip()
-        
-        # Убираем лишние слова и символы
-        clean_name = re.sub(r'[^\w\s]', ' ', item_name)
-        words = [word for word in clean_name.split() if len(word) > 2]
-        
-        # Сортируем слова по длине (более длинные слова более значимы)
-        words.sort(key=len, reverse=True)
-        
-        print(f"DEBUG: Ключевые слова для поиска: {words}")
-        
-        # Ищем детали, содержащие ключевые слова
-        for word in words:
-            if len(word) > 3:  # Ищем только значимые слова
-                # Поиск по частичному совпадению в названии
-                parts = self.parts_df[self.parts_df['name'].str.lower().str.contains(word, na=False)]
-                if not parts.empty:
-                    # Берем первую найденную деталь
-                    part_data = parts.iloc[0]
-                    print(f"DEBUG: ✓ Найдена деталь по ключевому слову '{word}': {part_data['part_num']} - {part_data['name']}")
-                    return {
-                        'part_num': part_data['part_num'],
-                        'name': part_data['name'],
-                        'part_cat_id': part_data['part_cat_id'],
-                        'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-                    }
-        
-        # Если не найдено по отдельным словам, пробуем найти по комбинации слов
-        if len(words) >= 2:
-            # Ищем детали, содержащие несколько ключевых слов
-            for i in range(len(words) - 1):
-                for j in range(i + 1, len(words)):
-                    if len(words[i]) > 3 and len(words[j]) > 3:
-                        combined_search = f"{words[i]} {words[j]}"
-                        parts = self.parts_df[self.parts_df['name'].str.lower().str.contains(combined_search, na=False)]
-                        if not parts.empty:
-                            part_data = parts.iloc[0]
-                            print(f"DEBUG: ✓ Найдена деталь по комбинации '{combined_search}': {part_data['part_num']} - {part_data['name']}")
-                            return {
-                                'part_num': part_data['part_num'],
-                                'name': part_data['name'],
-                                'part_cat_id': part_data['part_cat_id'],
-                                'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-                            }
-        
-        # НОВЫЙ: Поиск по частичному совпадению в начале названия
-        for word in words:
-            if len(word) > 4:  # Ищем только длинные слова
-                # Ищем детали, название которых начинается с этого слова
-                parts = self.parts_df[self.parts_df['name'].str.lower().str.startswith(word, na=False)]
-                if not parts.empty:
-                    part_data = parts.iloc[0]
-                    print(f"DEBUG: ✓ Найдена деталь по началу названия '{word}': {part_data['part_num']} - {part_data['name']}")
-                    return {
-                        'part_num': part_data['part_num'],
-                        'name': part_data['name'],
-                        'part_cat_id': part_data['part_cat_id'],
-                        'part_cat_name': self.get_part_category_name(part_data['part_cat_id'])
-                    }
-        
-        print(f"DEBUG: ✗ Деталь не найдена по названию: '{item_name}'")
-        return None
-    
-    def search_set_by_name(self, item_name: str) -> Optional[Dict]:
-        """Поиск набора по названию товара"""
-        if self.sets_df.empty:
-            return None
-        
-        # Нормализуем название для поиска
-        name_lower = item_name.lower().strip()
-        
-        # Убираем лишние слова и символы
-        clean_name = re.sub(r'[^\w\s]', ' ', item_name)
-        words = [word for word in clean_name.split() if len(word) > 2]
-        
-        # Ищем наборы, содержащие ключевые слова
-        for word in words:
-            if len(word) > 3:  # Ищем только значимые слова
-                # Поиск по частичному совпадению в названии
-                sets = self.sets_df[self.sets_df['name'].str.lower().str.contains(word, na=False)]
-                if not sets.empty:
-                    # Берем первый найденный набор
-                    set_data = sets.iloc[0]
-                    return {
-                        'set_num': set_data['set_num'],
-                        'name': set_data['name'],
-                        'theme_id': set_data['theme_id'],
-                        'theme_name': self.get_theme_name(set_data['theme_id']),
-                        'year': set_data['year'],
-                        'num_parts': set_data['num_parts']
-                    }
-        
-        return None
-    
-    def search_minifig_by_name(self, item_name: str) -> Optional[Dict]:
-        """Поиск минифигурки по названию товара"""
-        if self.minifigs_df.empty:
-            return None
-        
-        # Нормализуем название для поиска
-        name_lower = item_name.lower().strip()
-        
-        # Убираем лишние слова и символы
-        clean_name = re.sub(r'[^\w\s]', ' ', item_name)
-        words = [word for word in clean_name.split() if len(word) > 2]
-        
-        # Ищем минифигурки, содержащие ключевые слова
-        for word in words:
-            if len(word) > 3:  # Ищем только значимые слова
-                # Поиск по частичному совпадению в названии
-                minifigs = self.minifigs_df[self.minifigs_df['name'].str.lower().str.contains(word, na=False)]
-                if not minifigs.empty:
-                    # Берем первую найденную минифигурку
-                    fig_data = minifigs.iloc[0]
-                    return {
-                        'fig_num': fig_data['fig_num'],
-                        'name': fig_data['name'],
-                        'num_parts': fig_data['num_parts']
-                    }
-        
-        return None
+from catalog_api import RebrickableAPI, TaskCancelled, get_shared_catalog
+from catalog_snapshot import default_snapshot_dir, file_hash
+from image_loader import ImageLoader
+import order_html
+from order_export import available_formats, export_items
+from result_store import ResultStore
+from thumbnail_cache import PhotoCache, ThumbnailCache
 
 class OrderParser:
+    # Перерисовка измененных товаров: интервал кадра и число товаров за кадр
+    REDRAW_INTERVAL_MS = 16
+    REDRAW_BATCH_SIZE = 200
+    # Виртуальный список карточек: высота слота и запас карточек за краем окна
+    CARD_HEIGHT = 280
+    # Название карточки обрезается, чтобы занимать не больше двух строк
+    CARD_NAME_LENGTH = 80
+    CARD_OVERSCAN = 3
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Парсер заказов LEGO с API Rebrickable")
@@ -712,10 +34,48 @@ class OrderParser:
         self.parsed_data = []
         self.rebrickable_api = None
         
+        # Общий каталог Rebrickable: загружается в фоне один раз на весь сеанс
+        self.catalog = get_shared_catalog()
+        
+        # Обогащенные заказы сохраняются по хэшу HTML и версии каталога
+        self.result_store = ResultStore(default_snapshot_dir(self.catalog.data_dir).parent / "orders")
+        self.order_hash = None
+        
+        # Фоновые операции (парсинг, обогащение): поток-исполнитель и очередь сообщений для UI
+        self.task_queue = queue.Queue()
+        self.task_thread = None
+        self.task_name = ""
+        self.task_started = 0.0
+        self.task_last_report = 0.0
+        self.cancel_event = threading.Event()
+        
+        # Отображение: карточки и значения строк по товарам, отложенная перерисовка
+        self.visible_cards = {}
+        self.card_pool = []
+        self.cards_scroll_region = None
+        self.cards_render_scheduled = False
+        self.row_values = {}
+        self.dirty_items = set()
+        self.redraw_scheduled = False
+        
         # Проверка доступности PIL
         self.pil_available = self.check_pil_availability()
         
+        # Изображения карточек загружаются пулом потоков; до загрузки показывается иконка.
+        # Готовые PhotoImage держатся в памяти (LRU), миниатюры и ответы 404 - на диске
+        thumbnails_dir = default_snapshot_dir(self.catalog.data_dir).parent / "thumbnails"
+        self.image_loader = ImageLoader(thumbnails=ThumbnailCache(thumbnails_dir)) if self.pil_available else None
+        self.loaded_images = queue.Queue()
+        self.card_photos = PhotoCache()
+        self.images_requested = set()
+        self.images_missing = set()
+        self.images_pending = 0
+        
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        self.catalog.start_loading()
+        self.watch_catalog()
     
     def check_pil_availability(self):
         """Проверка доступности PIL/Pillow для обработки изображений"""
@@ -796,6 +156,9 @@ class OrderParser:
                   state="disabled", style="Success.TButton").pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="🗑️ Очистить", command=self.clear_data, 
                   style="Danger.TButton").pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="⏹ Отмена", command=self.cancel_task, 
+                                       state="disabled", style="Secondary.TButton")
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
         
         # Переключатель режимов отображения
         view_frame = ttk.Frame(main_frame)
@@ -835,18 +198,29 @@ class OrderParser:
         
         # Canvas для карточек с большим размером
         self.canvas = tk.Canvas(self.results_container, bg="white", width=1200, height=600)
-        self.card_frame = ttk.Frame(self.canvas)
         
         # Скроллбары для карточек
         self.v_scrollbar_cards = ttk.Scrollbar(self.results_container, orient=tk.VERTICAL, command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.v_scrollbar_cards.set)
+        self.canvas.configure(yscrollcommand=self.on_cards_scrolled)
+        # Карточки создаются только для видимой области: при прокрутке и
+        # изменении размера окна набор видимых карточек пересчитывается
+        self.canvas.bind("<Configure>", lambda event: self.schedule_cards_render())
         
         # Статус
         self.status_var = tk.StringVar()
         self.status_var.set("Готов к работе")
-        status_label = ttk.Label(main_frame, textvariable=self.status_var, 
+        status_frame = ttk.Frame(main_frame)
+        status_frame.grid(row=5, column=0, columnspan=3, pady=(10, 0))
+        status_label = ttk.Label(status_frame, textvariable=self.status_var, 
                                 font=("Arial", 10, "bold"), foreground="#2E86AB")
-        status_label.grid(row=5, column=0, columnspan=3, pady=(10, 0))
+        status_label.pack(side=tk.LEFT, padx=(0, 20))
+        
+        # Состояние общего каталога Rebrickable
+        self.catalog_status_var = tk.StringVar()
+        self.catalog_status_var.set(self.catalog.status_text())
+        catalog_label = ttk.Label(status_frame, textvariable=self.catalog_status_var, 
+                                 font=("Arial", 9), foreground="#7F8C8D")
+        catalog_label.pack(side=tk.LEFT)
         
         # Информация о PIL
         if not self.pil_available:
@@ -875,6 +249,90 @@ class OrderParser:
         self.setup_styles()
         self.show_cards_view()
     
+    def watch_catalog(self):
+        """Периодическая проверка изменений в Data/ и обновление статуса каталога"""
+        self.catalog.check_for_changes()
+        self.catalog_status_var.set(self.catalog.status_text())
+        # Пока каталог загружается, статус обновляем чаще
+        self.root.after(500 if self.catalog.is_loading else 5000, self.watch_catalog)
+    
+    def start_task(self, name, work, on_done, error_text):
+        """Запуск долгой операции в фоновом потоке
+        
+        work(progress) выполняется вне потока Tk и не должна трогать виджеты;
+        ее результат передается в on_done уже в главном потоке.
+        """
+        if self.task_thread is not None and self.task_thread.is_alive():
+            messagebox.showwarning("Предупреждение", "Дождитесь завершения текущей операции или отмените ее")
+            return
+        
+        self.task_name = name
+        self.task_started = time.perf_counter()
+        self.task_last_report = 0.0
+        self.cancel_event.clear()
+        self.cancel_button.configure(state="normal")
+        self.status_var.set(f"{name}...")
+        
+        def run():
+            try:
+                self.task_queue.put(('done', on_done, work(self.report_task_progress)))
+            except TaskCancelled:
+                self.task_queue.put(('cancelled', None, None))
+            except Exception as e:
+                self.task_queue.put(('error', error_text, e))
+        
+        self.task_thread = threading.Thread(target=run, name=name, daemon=True)
+        self.task_thread.start()
+        self.root.after(50, self.drain_task_queue)
+    
+    def report_task_progress(self, done, total, text=""):
+        """Прогресс из рабочего потока; здесь же проверяется запрос отмены"""
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+        # Не чаще 20 сообщений в секунду, последнее сообщение - всегда
+        now = time.perf_counter()
+        if done < total and now - self.task_last_report < 0.05:
+            return
+        self.task_last_report = now
+        self.task_queue.put(('progress', text, (done, total)))
+    
+    def cancel_task(self):
+        """Запрос отмены текущей фоновой операции"""
+        if self.task_thread is not None and self.task_thread.is_alive():
+            self.cancel_event.set()
+            self.cancel_button.configure(state="disabled")
+            self.status_var.set(f"{self.task_name}: отмена...")
+    
+    def drain_task_queue(self):
+        """Обработка сообщений фонового потока в главном потоке Tk"""
+        finished = False
+        try:
+            while True:
+                kind, extra, payload = self.task_queue.get_nowait()
+                if kind == 'progress':
+                    done, total = payload
+                    elapsed = time.perf_counter() - self.task_started
+                    rate = done / elapsed if elapsed > 0 else 0.0
+                    text = f" - {extra}" if extra else ""
+                    self.status_var.set(f"{self.task_name}: {done}/{total} ({rate:.0f} товаров/с){text}")
+                elif kind == 'done' and not self.cancel_event.is_set():
+                    finished = True
+                    extra(payload)
+                elif kind in ('done', 'cancelled'):
+                    finished = True
+                    self.status_var.set(f"{self.task_name}: отменено")
+                elif kind == 'error':
+                    finished = True
+                    messagebox.showerror("Ошибка", f"{extra}:\n{str(payload)}")
+                    self.status_var.set(f"{extra}")
+        except queue.Empty:
+            pass
+        
+        if finished:
+            self.cancel_button.configure(state="disabled")
+        else:
+            self.root.after(50, self.drain_task_queue)
+    
     def setup_styles(self):
         """Настройка стилей для красивого интерфейса"""
         style = ttk.Style()
@@ -973,98 +431,170 @@ class OrderParser:
         self.results_container.rowconfigure(0, weight=1)
     
     def update_cards_display(self):
-        """Обновить отображение карточек"""
-        # Очищаем старые карточки
-        for widget in self.card_frame.winfo_children():
-            widget.destroy()
+        """Обновить отображение карточек
         
-        if not self.parsed_data:
-            return
+        Список карточек виртуальный: каждому товару отведен слот высотой
+        CARD_HEIGHT, а виджеты существуют только для видимых слотов (плюс
+        CARD_OVERSCAN сверху и снизу). Время отрисовки не зависит от размера заказа.
+        """
+        self.render_visible_cards()
+    
+    def on_cards_scrolled(self, first, last):
+        """Прокрутка canvas: обновить скроллбар и набор видимых карточек"""
+        self.v_scrollbar_cards.set(first, last)
+        self.schedule_cards_render()
+    
+    def schedule_cards_render(self):
+        """Отрисовка видимых карточек один раз на цикл событий"""
+        if not self.cards_render_scheduled:
+            self.cards_render_scheduled = True
+            self.root.after_idle(self.render_visible_cards)
+    
+    def render_visible_cards(self):
+        """Привязать карточки к видимым слотам, переиспользуя ушедшие из видимости"""
+        self.cards_render_scheduled = False
+        count = len(self.parsed_data) if self.current_view_mode == "cards" else 0
+        width = max(self.canvas.winfo_width(), 200)
+        
+        # Прокрутка считается по числу товаров, а не по реальным виджетам
+        scroll_region = (0, 0, width, count * self.CARD_HEIGHT)
+        if scroll_region != self.cards_scroll_region:
+            self.cards_scroll_region = scroll_region
+            self.canvas.configure(scrollregion=scroll_region)
+        
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // self.CARD_HEIGHT) - self.CARD_OVERSCAN)
+        last = min(count, int((top + self.canvas.winfo_height()) // self.CARD_HEIGHT) + 1 + self.CARD_OVERSCAN)
+        
+        # Карточки вне окна возвращаются в пул
+        for index in [i for i in self.visible_cards if not first <= i < last]:
+            card = self.visible_cards.pop(index)
+            self.canvas.itemconfigure(card.window, state="hidden")
+            self.card_pool.append(card)
+        
+        for index in range(first, last):
+            item = self.parsed_data[index]
+            card = self.visible_cards.get(index)
+            if card is None:
+                card = self.card_pool.pop() if self.card_pool else self.create_item_card(item)
+                self.visible_cards[index] = card
+            # Для переиспользованной карточки меняются только отличающиеся поля
+            self.fill_item_card(card, item)
+            self.canvas.coords(card.window, 10, index * self.CARD_HEIGHT + 5)
+            self.canvas.itemconfigure(card.window, state="normal", width=width - 20)
+    
+    def request_redraw(self, indices):
+        """Отметить товары как измененные; перерисовка - пакетом по таймеру кадра"""
+        self.dirty_items.update(indices)
+        if not self.redraw_scheduled:
+            self.redraw_scheduled = True
+            self.root.after(self.REDRAW_INTERVAL_MS, self.flush_redraw)
+    
+    def flush_redraw(self):
+        """Обновление строк таблицы и карточек только для измененных товаров"""
+        self.redraw_scheduled = False
+        batch = sorted(self.dirty_items)[:self.REDRAW_BATCH_SIZE]
+        self.dirty_items.difference_update(batch)
         
-        # Создаем карточки для каждого товара
-        for i, item in enumerate(self.parsed_data):
-            card = self.create_item_card(item, i)
-            card.pack(fill=tk.X, padx=10, pady=5)
+        # Список строк таблицы запрашивается один раз на пакет, а не для каждого товара
+        children = self.tree.get_children()
+        for index in batch:
+            if index >= len(self.parsed_data):
+                continue
+            item = self.parsed_data[index]
+            if index < len(children):
+                self.update_table_row(index, item, children[index])
+            card = self.visible_cards.get(index)
+            if card is not None:
+                self.fill_item_card(card, item)
+        
+        # Остаток - в следующих кадрах, чтобы окно оставалось отзывчивым
+        if self.dirty_items:
+            self.redraw_scheduled = True
+            self.root.after(self.REDRAW_INTERVAL_MS, self.flush_redraw)
+    
+    def item_index(self, item):
+        """Текущая позиция товара в списке (после удалений индексы сдвигаются)"""
+        for i, other in enumerate(self.parsed_data):
+            if other is item:
+                return i
+        return None
+    
+    def card_fields(self, item):
+        """Значения, отображаемые в карточке товара"""
+        item_type = item.get('type', 'part')
+        part_num = item.get('part_number', '')
         
-        # Настраиваем canvas
-        self.canvas.create_window((0, 0), window=self.card_frame, anchor="nw")
-        self.card_frame.update_idletasks()
+        name = item.get('name', 'Без названия')
+        if len(name) > self.CARD_NAME_LENGTH:
+            name = name[:self.CARD_NAME_LENGTH] + "..."
+        
+        # Статус обогащения
+        if item.get('part_info') or item.get('set_info') or item.get('minifig_info'):
+            status = ("✓ Обогащено", "#27AE60")
+        else:
+            status = ("Не обогащено", "#E74C3C")
+        
+        # API информация
+        info_lines = []
+        if item.get('part_info'):
+            info_lines.append(f"📚 Категория: {item['part_info'].get('part_cat_name', '')}")
+        elif item.get('set_info'):
+            info_lines.append(f"🎭 Тема: {item['set_info'].get('theme_name', '')}")
+            info_lines.append(f"📅 Год: {item['set_info'].get('year', '')}")
+        elif item.get('minifig_info'):
+            info_lines.append(f"🧩 Деталей: {item['minifig_info'].get('num_parts', '')}")
         
-        # Настраиваем прокрутку
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        color = item.get('color', '')
+        type_text = {'part': 'Деталь', 'set': 'Набор', 'minifig': 'Минифигурка'}.get(item_type, 'Деталь')
+        return {
+            'image': (item_type, part_num),
+            'name': name,
+            'number': f"🔢 Номер: {part_num}" if part_num and part_num != 'UNKNOWN' else "",
+            'status': status,
+            'quantity': f"📦 Количество: {item.get('quantity', '1')}",
+            'type': f"🏷️ Тип: {type_text}",
+            'color': f"🎨 Цвет: {color}" if color else "",
+            'info': tuple(info_lines + [""] * (2 - len(info_lines)))
+        }
     
-    def create_item_card(self, item, index):
+    def create_item_card(self, item):
         """Создать карточку товара"""
-        card = ttk.Frame(self.card_frame, style="Card.TFrame")
+        card = ttk.Frame(self.canvas, style="Card.TFrame")
+        # Высота карточки задана слотом: длинное название или дополнительные
+        # метки не наползают на следующую карточку, а обрезаются внутри своей
+        card.window = self.canvas.create_window(0, 0, window=card, anchor="nw",
+                                                height=self.CARD_HEIGHT - 10)
+        labels = {}
         
         # Заголовок карточки
         header = ttk.Frame(card, style="CardHeader.TFrame")
         header.pack(fill=tk.X, padx=15, pady=(15, 0))
         
-        # Левая часть заголовка с изображением
+        # Левая часть заголовка с изображением (или иконкой типа)
         left_header = ttk.Frame(header)
         left_header.pack(side=tk.LEFT, fill=tk.Y)
+        labels['image'] = ttk.Label(left_header, foreground="#007BFF")
+        labels['image'].pack(side=tk.LEFT, padx=(0, 15))
         
-        # Загружаем изображение
-        image_loaded = False
-        part_num = item.get('part_number', '')
-        item_type = item.get('type', 'part')
-        
-        if part_num and part_num != 'UNKNOWN':
-            if item_type == 'part':
-                photo = self.load_part_image(part_num)
-            elif item_type == 'set':
-                photo = self.load_set_image(part_num)
-            else:
-                photo = None
-            
-            if photo:
-                # Создаем Label для изображения
-                image_label = ttk.Label(left_header, image=photo)
-                image_label.image = photo  # Сохраняем ссылку
-                image_label.pack(side=tk.LEFT, padx=(0, 15))
-                image_loaded = True
-        
-        # Если изображение не загружено, показываем иконку
-        if not image_loaded:
-            type_icon = self.get_type_icon(item_type)
-            icon_label = ttk.Label(left_header, text=type_icon, font=("Arial", 24), 
-                                 foreground="#007BFF")
-            icon_label.pack(side=tk.LEFT, padx=(0, 15))
-        
-        # Центральная часть заголовка
+        # Центральная часть заголовка: название и номер детали/набора
         center_header = ttk.Frame(header)
         center_header.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        labels['name'] = ttk.Label(center_header, font=("Arial", 14, "bold"), 
+                                   foreground="#2C3E50", wraplength=600)
+        labels['name'].pack(anchor=tk.W, pady=(0, 5))
+        labels['number'] = ttk.Label(center_header, font=("Arial", 11), foreground="#7F8C8D")
+        labels['number'].pack_options = {'anchor': tk.W}
         
-        # Название товара
-        name = item.get('name', 'Без названия')
-        if len(name) > 80:
-            name = name[:80] + "..."
-        
-        name_label = ttk.Label(center_header, text=name, font=("Arial", 14, "bold"), 
-                              foreground="#2C3E50", wraplength=600)
-        name_label.pack(anchor=tk.W, pady=(0, 5))
-        
-        # Номер детали/набора
-        if part_num and part_num != 'UNKNOWN':
-            part_label = ttk.Label(center_header, text=f"🔢 Номер: {part_num}", 
-                                 font=("Arial", 11), foreground="#7F8C8D")
-            part_label.pack(anchor=tk.W)
-        
-        # Правая часть заголовка
+        # Правая часть заголовка: статус обогащения
         right_header = ttk.Frame(header)
         right_header.pack(side=tk.RIGHT, fill=tk.Y)
+        labels['status'] = ttk.Label(right_header, font=("Arial", 11, "bold"))
+        labels['status'].pack(anchor=tk.NE, pady=(0, 10))
         
-        # Статус обогащения
-        status = "Не обогащено"
-        status_color = "#E74C3C"
-        if item.get('part_info') or item.get('set_info') or item.get('minifig_info'):
-            status = "✓ Обогащено"
-            status_color = "#27AE60"
-        
-        status_label = ttk.Label(right_header, text=status, font=("Arial", 11, "bold"), 
-                                foreground=status_color)
-        status_label.pack(anchor=tk.NE, pady=(0, 10))
+        # Подвал карточки (размещается раньше тела, чтобы кнопки всегда были видны)
+        footer = ttk.Frame(card, style="CardFooter.TFrame")
+        footer.pack(side=tk.BOTTOM, fill=tk.X, padx=15, pady=(0, 15))
         
         # Тело карточки
         body = ttk.Frame(card, style="CardBody.TFrame")
@@ -1074,66 +604,83 @@ class OrderParser:
         info_frame = ttk.Frame(body)
         info_frame.pack(fill=tk.X)
         
-        # Левая колонка
+        # Левая колонка: количество, тип, цвет
         left_col = ttk.Frame(info_frame)
         left_col.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        for key in ('quantity', 'type', 'color'):
+            labels[key] = ttk.Label(left_col, font=("Arial", 11), foreground="#34495E")
+            labels[key].pack_options = {'anchor': tk.W, 'pady': 3}
+        labels['quantity'].pack(anchor=tk.W, pady=3)
+        labels['type'].pack(anchor=tk.W, pady=3)
         
-        # Количество
-        quantity = item.get('quantity', '1')
-        ttk.Label(left_col, text=f"📦 Количество: {quantity}", 
-                 font=("Arial", 11), foreground="#34495E").pack(anchor=tk.W, pady=3)
-        
-        # Тип товара
-        type_text = {'part': 'Деталь', 'set': 'Набор', 'minifig': 'Минифигурка'}.get(item_type, 'Деталь')
-        ttk.Label(left_col, text=f"🏷️ Тип: {type_text}", 
-                 font=("Arial", 11), foreground="#34495E").pack(anchor=tk.W, pady=3)
-        
-        # Цвет
-        color = item.get('color', '')
-        if color:
-            ttk.Label(left_col, text=f"🎨 Цвет: {color}", 
-                     font=("Arial", 11), foreground="#34495E").pack(anchor=tk.W, pady=3)
-        
-        # Правая колонка
+        # Правая колонка: информация из API
         right_col = ttk.Frame(info_frame)
         right_col.pack(side=tk.RIGHT, fill=tk.X, expand=True)
-        
-        # API информация
-        if item.get('part_info'):
-            part_info = item['part_info']
-            ttk.Label(right_col, text=f"📚 Категория: {part_info.get('part_cat_name', '')}", 
-                     font=("Arial", 11), foreground="#34495E").pack(anchor=tk.W, pady=3)
-        elif item.get('set_info'):
-            set_info = item['set_info']
-            ttk.Label(right_col, text=f"🎭 Тема: {set_info.get('theme_name', '')}", 
-                     font=("Arial", 11), foreground="#34495E").pack(anchor=tk.W, pady=3)
-            ttk.Label(right_col, text=f"📅 Год: {set_info.get('year', '')}", 
-                     font=("Arial", 11), foreground="#34495E").pack(anchor=tk.W, pady=3)
-        elif item.get('minifig_info'):
-            minifig_info = item['minifig_info']
-            ttk.Label(right_col, text=f"🧩 Деталей: {minifig_info.get('num_parts', '')}", 
-                     font=("Arial", 11), foreground="#34495E").pack(anchor=tk.W, pady=3)
-        
-        # Подвал карточки
-        footer = ttk.Frame(card, style="CardFooter.TFrame")
-        footer.pack(fill=tk.X, padx=15, pady=(0, 15))
+        labels['info'] = [ttk.Label(right_col, font=("Arial", 11), foreground="#34495E") for _ in range(2)]
+        for label in labels['info']:
+            label.pack_options = {'anchor': tk.W, 'pady': 3}
         
         # Кнопки действий
         button_frame = ttk.Frame(footer)
         button_frame.pack(side=tk.RIGHT)
         
-        # Кнопка редактирования
-        edit_btn = ttk.Button(button_frame, text="✏️ Редактировать", 
-                             style="Action.TButton", command=lambda: self.edit_item(index))
+        # Кнопки работают с товаром карточки, а не с номером на момент создания
+        edit_btn = ttk.Button(button_frame, text="✏️ Редактировать", style="Action.TButton",
+                              command=lambda: self.edit_item(self.item_index(card.item)))
         edit_btn.pack(side=tk.LEFT, padx=5)
         
-        # Кнопка удаления
-        delete_btn = ttk.Button(button_frame, text="🗑️ Удалить", 
-                               style="Danger.TButton", command=lambda: self.delete_item(index))
+        delete_btn = ttk.Button(button_frame, text="🗑️ Удалить", style="Danger.TButton",
+                                command=lambda: self.delete_item(self.item_index(card.item)))
         delete_btn.pack(side=tk.LEFT, padx=5)
         
+        card.labels = labels
+        card.fields = {}
+        self.fill_item_card(card, item)
         return card
     
+    def set_optional_label(self, label, text):
+        """Показать метку с текстом или скрыть ее, если текста нет"""
+        if text:
+            label.configure(text=text)
+            if not label.winfo_manager():
+                label.pack(**label.pack_options)
+        elif label.winfo_manager():
+            label.pack_forget()
+    
+    def fill_item_card(self, card, item):
+        """Обновить карточку: меняются только поля, значения которых изменились"""
+        card.item = item
+        fields = self.card_fields(item)
+        old = card.fields
+        labels = card.labels
+        
+        # Без изображения карточка запрашивает его снова: загрузка могла сорваться из-за сети
+        image_changed = fields['image'] != old.get('image')
+        if image_changed or labels['image'].image is None:
+            item_type, part_num = fields['image']
+            photo = self.card_photos.get(fields['image'])
+            if photo is None and part_num and part_num != 'UNKNOWN':
+                self.request_card_image(item_type, part_num)
+            if image_changed or photo is not None:
+                self.set_card_image(labels['image'], item_type, photo)
+        
+        if fields['name'] != old.get('name'):
+            labels['name'].configure(text=fields['name'])
+        if fields['status'] != old.get('status'):
+            text, color = fields['status']
+            labels['status'].configure(text=text, foreground=color)
+        for key in ('quantity', 'type'):
+            if fields[key] != old.get(key):
+                labels[key].configure(text=fields[key])
+        for key in ('number', 'color'):
+            if fields[key] != old.get(key):
+                self.set_optional_label(labels[key], fields[key])
+        if fields['info'] != old.get('info'):
+            for label, text in zip(labels['info'], fields['info']):
+                self.set_optional_label(label, text)
+        
+        card.fields = fields
+    
     def get_type_icon(self, item_type):
         """Получить иконку для типа товара"""
         icons = {
@@ -1143,83 +690,82 @@ class OrderParser:
         }
         return icons.get(item_type, '🧱')
     
-    def load_part_image(self, part_num):
-        """Загрузка изображения детали из API"""
-        # Проверяем доступность PIL
-        if not self.pil_available:
-            return None
-            
-        try:
-            # URL для изображения детали из Rebrickable
-            image_url = f"https://img.rebrickable.com/part_img/parts/{part_num}.jpg"
-            
-            # Загружаем изображение
-            response = requests.get(image_url, timeout=10)
-            if response.status_code == 200:
-                # Конвертируем в PhotoImage для tkinter
-                try:
-                    from PIL import Image, ImageTk
-                    import io
-                    
-                    image_data = io.BytesIO(response.content)
-                    pil_image = Image.open(image_data)
-                    
-                    # Изменяем размер для карточки
-                    pil_image = pil_image.resize((80, 80), Image.Resampling.LANCZOS)
-                    
-                    # Конвертируем в PhotoImage
-                    photo = ImageTk.PhotoImage(pil_image)
-                    return photo
-                except ImportError:
-                    print("PIL/Pillow не установлен. Изображения не будут загружены.")
-                    return None
-            else:
-                return None
-        except Exception as e:
-            print(f"Ошибка загрузки изображения для {part_num}: {e}")
-            return None
+    def set_card_image(self, label, item_type, photo):
+        """Показать изображение товара или иконку типа, пока изображения нет"""
+        if photo:
+            label.configure(image=photo, text="")
+        else:
+            label.configure(image="", text=self.get_type_icon(item_type), font=("Arial", 24))
+        label.image = photo  # Сохраняем ссылку
     
-    def load_set_image(self, set_num):
-        """Загрузка изображения набора из API"""
-        # Проверяем доступность PIL
-        if not self.pil_available:
-            return None
-            
+    def request_card_image(self, item_type, part_num):
+        """Поставить изображение детали/набора в очередь загрузки"""
+        key = (item_type, part_num)
+        if self.image_loader is None or item_type not in ('part', 'set'):
+            return
+        # Пока идет загрузка, повторные запросы не нужны; отсутствующие (404) не запрашиваем
+        if key in self.images_requested or key in self.images_missing:
+            return
+        self.images_requested.add(key)
+        self.images_pending += 1
+        self.image_loader.request(item_type, part_num,
+                                  lambda key, image, missing: self.loaded_images.put((key, image, missing)))
+        if self.images_pending == 1:
+            self.root.after(50, self.drain_loaded_images)
+    
+    def drain_loaded_images(self):
+        """Подстановка загруженных изображений в видимые карточки (главный поток)"""
+        from PIL import ImageTk
+        
+        arrived = {}
         try:
-            # URL для изображения набора из Rebrickable
-            image_url = f"https://img.rebrickable.com/sets/{set_num}.jpg"
-            
-            response = requests.get(image_url, timeout=10)
-            if response.status_code == 200:
-                try:
-                    from PIL import Image, ImageTk
-                    import io
-                    
-                    image_data = io.BytesIO(response.content)
-                    pil_image = Image.open(image_data)
-                    pil_image = pil_image.resize((80, 80), Image.Resampling.LANCZOS)
-                    
-                    photo = ImageTk.PhotoImage(pil_image)
-                    return photo
-                except ImportError:
-                    print("PIL/Pillow не установлен. Изображения не будут загружены.")
-                    return None
-            else:
-                return None
-        except Exception as e:
-            print(f"Ошибка загрузки изображения набора {set_num}: {e}")
-            return None
+            while True:
+                key, image, missing = self.loaded_images.get_nowait()
+                self.images_pending -= 1
+                self.images_requested.discard(key)
+                if missing:
+                    self.images_missing.add(key)
+                elif image is not None:
+                    arrived[key] = ImageTk.PhotoImage(image)
+                    self.card_photos.put(key, arrived[key])
+        except queue.Empty:
+            pass
+        
+        if arrived:
+            for card in self.visible_cards.values():
+                key = card.fields.get('image')
+                if key in arrived:
+                    self.set_card_image(card.labels['image'], key[0], arrived[key])
+        
+        if self.images_pending > 0:
+            self.root.after(50, self.drain_loaded_images)
+    
+    def on_close(self):
+        """Закрытие окна: незавершенные загрузки изображений отменяются"""
+        if self.image_loader is not None:
+            self.image_loader.shutdown()
+        self.root.destroy()
     
     def edit_item(self, index):
         """Редактировать товар (заглушка)"""
+        if index is None:
+            return
         messagebox.showinfo("Редактирование", f"Редактирование товара {index + 1} (функция в разработке)")
     
     def delete_item(self, index):
         """Удалить товар (заглушка)"""
+        if index is None:
+            return
         if messagebox.askyesno("Удаление", f"Удалить товар {index + 1}?"):
-            del self.parsed_data[index]
-            self.update_cards_display()
-            self.update_table_display()
+            self.parsed_data.pop(index)
+            children = self.tree.get_children()
+            if index < len(children):
+                self.row_values.pop(children[index], None)
+                self.tree.delete(children[index])
+            # Отложенные перерисовки ссылаются на старые номера
+            self.dirty_items = {i - 1 if i > index else i for i in self.dirty_items if i != index}
+            # Видимые карточки сдвигаются: переиспользуются с новыми товарами
+            self.render_visible_cards()
         
     def browse_input_file(self):
         filename = filedialog.askopenfilename(
@@ -1237,7 +783,9 @@ class OrderParser:
         filename = filedialog.asksaveasfilename(
             title="Сохранить CSV файл для импорта",
             defaultextension=".csv",
-            filetypes=[("CSV файлы", "*.csv"), ("Все файлы", "*.*")]
+            filetypes=[("CSV файлы", "*.csv"), ("JSON Lines", "*.jsonl")]
+                      + ([("Parquet", "*.parquet")] if 'parquet' in available_formats() else [])
+                      + [("Все файлы", "*.*")]
         )
         if filename:
             self.output_file.set(filename)
@@ -1247,267 +795,71 @@ class OrderParser:
             messagebox.showerror("Ошибка", "Выберите HTML файл заказа")
             return
         
-        try:
-            self.status_var.set("Парсинг файла...")
-            self.root.update()
-            
-            with open(self.input_file.get(), 'r', encoding='utf-8') as file:
-                html_content = file.read()
-            
-            # Парсинг HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Поиск раздела "Содержимое заказа"
-            order_content = soup.find('h3', string=lambda text: text and 'Содержимое заказа' in text)
-            
-            if not order_content:
-                messagebox.showerror("Ошибка", "Раздел 'Содержимое заказа' не найден в файле")
-                return
-            
-            # Поиск всех товаров в заказе
-            items = []
-            order_section = order_content.find_parent('div', class_='sale-order-detail-payment-options-order-content')
-            
-            if order_section:
-                # Поиск всех строк с товарами
-                item_rows = order_section.find_all('div', class_='sale-order-detail-order-item-tr')
-                
-                for row in item_rows:
-                    if 'sale-order-detail-order-basket-info' in row.get('class', []):
-                        item_data = self.extract_item_data(row)
-                        if item_data:
-                            items.append(item_data)
-            
-            self.parsed_data = items
-            
-            # Очистка таблицы
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Заполнение таблицы
-            for item in items:
-                self.tree.insert('', 'end', values=(
-                    item.get('name', '')[:50] + "..." if len(item.get('name', '')) > 50 else item.get('name', ''),
-                    item.get('part_number', 'UNKNOWN'),
-                    item.get('quantity', ''),
-                    item.get('color', ''),
-                    item.get('type', ''),
-                    "Не обогащено"
-                ))
-            
-            # Обновляем карточки если включен режим карточек
-            if self.current_view_mode == "cards":
-                self.update_cards_display()
-            
+        input_path = self.input_file.get()
+        self.start_task("Парсинг файла", lambda progress: self.parse_order_file(input_path, progress),
+                        self.on_order_parsed, "Ошибка при парсинге файла")
+    
+    def parse_order_file(self, input_path, progress=None):
+        """Чтение и разбор HTML заказа (выполняется в фоновом потоке)
+
+        Возвращает (товары, хэш HTML, восстановлены ли товары из сохраненных результатов).
+        """
+        content_hash = file_hash(input_path)
+        items = self.result_store.get(content_hash, RebrickableAPI.version_for(self.catalog.data_dir))
+        if items is not None:
+            print(f"Заказ восстановлен из сохраненных результатов: {len(items)} товаров")
+            return items, content_hash, True
+        return order_html.parse_order_file(input_path, progress), content_hash, False
+    
+    def on_order_parsed(self, payload):
+        """Вывод результатов парсинга (главный поток)"""
+        items, self.order_hash, restored = payload
+        self.parsed_data = items
+        
+        # Заполнение таблицы
+        self.update_table_display()
+        
+        # Обновляем карточки если включен режим карточек
+        if self.current_view_mode == "cards":
+            self.update_cards_display()
+        
+        # Для восстановленного заказа обогащение уже выполнено, доступен и экспорт
+        buttons = ["🔧 Обогатить данными", "📊 Экспорт в CSV"] if restored else ["🔧 Обогатить данными"]
+        if restored:
+            enriched_count = sum(1 for item in items
+                                 if item.get('part_info') or item.get('set_info') or item.get('minifig_info'))
+            self.status_var.set(f"Найдено товаров: {len(items)} (из сохраненных результатов, "
+                                f"обогащено: {enriched_count})")
+        else:
             self.status_var.set(f"Найдено товаров: {len(items)}")
-            
-            # Активация кнопки обогащения
-            # Ищем кнопку по переменной view_mode
-            for child in self.root.winfo_children():
-                if isinstance(child, ttk.Frame):
-                    for button in child.winfo_children():
-                        if isinstance(button, ttk.Frame):
-                            for btn in button.winfo_children():
-                                if isinstance(btn, ttk.Button) and btn.cget('text') == "🔧 Обогатить данными":
-                                    btn.configure(state="normal")
-                                    break
-            
+        
+        # Активация кнопок
+        # Ищем кнопки по точному тексту
+        for child in self.root.winfo_children():
+            if isinstance(child, ttk.Frame):
+                for button in child.winfo_children():
+                    if isinstance(button, ttk.Frame):
+                        for btn in button.winfo_children():
+                            if isinstance(btn, ttk.Button) and btn.cget('text') in buttons:
+                                btn.configure(state="normal")
+        
+        if restored:
+            messagebox.showinfo("Успех", f"Заказ уже обрабатывался, результаты восстановлены.\n"
+                                         f"Найдено товаров: {len(items)}, обогащено: {enriched_count}")
+        else:
             messagebox.showinfo("Успех", f"Парсинг завершен. Найдено товаров: {len(items)}")
-            
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при парсинге файла:\n{str(e)}")
-            self.status_var.set("Ошибка при парсинге")
     
     def extract_item_data(self, row):
-        """Извлечение данных о товаре из строки HTML"""
-        try:
-            item_data = {}
-            
-            # Название товара
-            title_element = row.find('div', class_='sale-order-detail-order-item-title')
-            if title_element:
-                link = title_element.find('a')
-                if link:
-                    item_data['name'] = link.get_text(strip=True)
-                else:
-                    item_data['name'] = title_element.get_text(strip=True)
-            
-            # Ищем количество в колонке "Количество"
-            quantity_found = False
-            # Ищем все td элементы и ищем тот, который содержит заголовок "Количество"
-            all_tds = row.find_all('div', class_='sale-order-detail-order-item-td')
-            for td in all_tds:
-                # Проверяем, содержит ли td заголовок "Количество"
-                title_element = td.find('div', class_='sale-order-detail-order-item-td-title')
-                if title_element and 'Количество' in title_element.get_text():
-                    # Нашли колонку с количеством, ищем span с числом
-                    text_element = td.find('div', class_='sale-order-detail-order-item-td-text')
-                    if text_element:
-                        span = text_element.find('span')
-                        if span:
-                            span_text = span.get_text(strip=True)
-                            # Ищем количество в формате "1 шт", "6 шт" и т.д.
-                            quantity_match = re.search(r'(\d+)\s*шт', span_text)
-                            if quantity_match:
-                                item_data['quantity'] = quantity_match.group(1)
-                                quantity_found = True
-                                print(f"DEBUG: Количество найдено: '{span_text}' -> {item_data['quantity']}")
-                                break
-                            
-                            # Если не нашли "шт", ищем просто число
-                            if not quantity_found and span_text.isdigit() and 1 <= int(span_text) <= 99:
-                                item_data['quantity'] = span_text
-                                quantity_found = True
-                                print(f"DEBUG: Количество найдено как число: '{span_text}' -> {item_data['quantity']}")
-                                break
-                    break
-            
-            # Ищем цвет в специальном блоке
-            color_found = False
-            # Ищем все блоки с цветом
-            color_divs = row.find_all('div', class_='sale-order-detail-order-item-color')
-            for color_div in color_divs:
-                # Проверяем, что это блок с цветом, а не с состоянием
-                color_name_span = color_div.find('span', class_='sale-order-detail-order-item-color-name')
-                if color_name_span:
-                    color_name_text = color_name_span.get_text(strip=True)
-                    # Проверяем различные варианты названий для цвета
-                    if any(keyword in color_name_text.lower() for keyword in ['цвет:', 'color:', 'цвет', 'color']):
-                        # Нашли блок с цветом, извлекаем значение
-                        color_type_span = color_div.find('span', class_='sale-order-detail-order-item-color-type')
-                        if color_type_span:
-                            color_text = color_type_span.get_text(strip=True)
-                            # Убираем код цвета в скобках, если есть
-                            color_match = re.search(r'([^(]+)', color_text)
-                            if color_match:
-                                clean_color = color_match.group(1).strip()
-                                # Дополнительная очистка цвета
-                                clean_color = re.sub(r'\s+', ' ', clean_color)  # Убираем лишние пробелы
-                                clean_color = re.sub(r'^\s+|\s+$', '', clean_color)  # Убираем пробелы в начале и конце
-                                item_data['color'] = clean_color
-                            else:
-                                item_data['color'] = color_text.strip()
-                            color_found = True
-                            print(f"DEBUG: Цвет найден: '{color_text}' -> {item_data['color']}")
-                            break
-            
-            # Если цвет не найден в блоках, попробуем найти в названии товара
-            if not color_found:
-                item_name = item_data.get('name', '')
-                if item_name:
-                    # Ищем цвет в конце названия (например, "Trans-Red U", "Black U")
-                    color_match = re.search(r'([A-Za-z\-\s]+)\s*[UBN]\s*$', item_name)
-                    if color_match:
-                        potential_color = color_match.group(1).strip()
-                        # Проверяем, что это похоже на цвет
-                        if any(color_word in potential_color.lower() for color_word in ['red', 'blue', 'green', 'yellow', 'black', 'white', 'gray', 'orange', 'purple', 'pink', 'brown', 'gold', 'silver', 'trans', 'красн', 'син', 'зелен', 'желт', 'черн', 'бел', 'сер', 'оранж', 'фиолет', 'розов', 'коричнев', 'голуб', 'золот', 'серебр', 'прозрачн']):
-                            item_data['color'] = potential_color
-                            color_found = True
-                            print(f"DEBUG: Цвет найден в названии: '{potential_color}'")
-                    
-                    # Если не нашли в конце, ищем в скобках
-                    if not color_found:
-                        bracket_match = re.search(r'\(([^)]+)\)', item_name)
-                        if bracket_match:
-                            bracket_content = bracket_match.group(1)
-                            # Ищем цвет в скобках
-                            if any(color_word in bracket_content.lower() for color_word in ['red', 'blue', 'green', 'yellow', 'black', 'white', 'gray', 'orange', 'purple', 'pink', 'brown', 'gold', 'silver', 'trans', 'красн', 'син', 'зелен', 'желт', 'черн', 'бел', 'сер', 'оранж', 'фиолет', 'розов', 'коричнев', 'голуб', 'золот', 'серебр', 'прозрачн']):
-                                item_data['color'] = bracket_content.strip()
-                                color_found = True
-                                print(f"DEBUG: Цвет найден в скобках: '{bracket_content}'")
-            
-            # Если количество не найдено, устанавливаем по умолчанию
-            if not quantity_found:
-                item_data['quantity'] = '1'
-                print(f"DEBUG: Количество не найдено, установлено по умолчанию: 1")
-            
-            # Если цвет не найден, устанавливаем пустую строку
-            if not color_found:
-                item_data['color'] = ''
-                print(f"DEBUG: Цвет не найден, установлен пустым")
-            
-            # Определение типа товара
-            item_data['type'] = self.determine_item_type(item_data['name'])
-            
-            # Извлечение номера детали/набора
-            item_data['part_number'] = self.extract_part_number(item_data['name'])
-            
-            return item_data if item_data.get('name') else None
-            
-        except Exception as e:
-            print(f"Ошибка при извлечении данных товара: {e}")
-            return None
+        """Извлечение данных о товаре из строки HTML (BeautifulSoup)"""
+        return order_html.extract_item_data(row)
     
     def determine_item_type(self, name):
         """Определение типа товара по названию"""
-        name_lower = name.lower()
-        
-        # Простые и четкие правила
-        if any(word in name_lower for word in ['минифигурка', 'minifig', 'фигурка', 'figure']):
-            return 'minifig'
-        elif any(word in name_lower for word in ['набор', 'set', 'конструктор']):
-            return 'set'
-        else:
-            return 'part'  # По умолчанию считаем деталью
+        return order_html.determine_item_type(name)
     
     def extract_part_number(self, name):
         """Извлечение номера детали/набора из названия"""
-        # Поиск номера в формате sw0578, 30374, 64567 и т.д.
-        part_match = re.search(r'([a-z]{2}\d{4}|\d{5})', name, re.IGNORECASE)
-        if part_match:
-            return part_match.group(1).upper()
-        
-        # Поиск номера в скобках
-        bracket_match = re.search(r'\(([^)]+)\)', name)
-        if bracket_match:
-            bracket_content = bracket_match.group(1)
-            # Ищем номер в содержимом скобок
-            number_match = re.search(r'([a-z]{2}\d{4}|\d{5})', bracket_content, re.IGNORECASE)
-            if number_match:
-                return number_match.group(1).upper()
-        
-        # Поиск других форматов номеров (например, 4-5 цифр подряд)
-        number_match = re.search(r'(\d{4,6})', name)
-        if number_match:
-            return number_match.group(1)
-        
-        # Поиск номера в начале или конце названия
-        # Убираем лишние символы и ищем числа
-        clean_name = re.sub(r'[^\w\s\d-]', '', name)
-        words = clean_name.split()
-        for word in words:
-            if re.match(r'^\d{3,6}$', word):
-                return word
-        
-        # Поиск номеров в формате "№12345" или "N12345"
-        number_match = re.search(r'[№N]\s*(\d{3,6})', name, re.IGNORECASE)
-        if number_match:
-            return number_match.group(1)
-        
-        # Поиск номеров после слова "номер" или "number"
-        number_match = re.search(r'(?:номер|number)\s*[:\-]?\s*(\d{3,6})', name, re.IGNORECASE)
-        if number_match:
-            return number_match.group(1)
-        
-        # Поиск номеров в формате "12345-67" или "12345/67"
-        number_match = re.search(r'(\d{3,6})[-/]\d{1,3}', name)
-        if number_match:
-            return number_match.group(1)
-        
-        # Поиск номеров в конце строки после пробела
-        number_match = re.search(r'\s(\d{3,6})\s*$', name)
-        if number_match:
-            return number_match.group(1)
-        
-        # НОВЫЙ: Поиск любых цифр длиной от 3 символов
-        all_numbers = re.findall(r'\d{3,}', name)
-        if all_numbers:
-            # Берем самый длинный номер
-            longest_number = max(all_numbers, key=len)
-            if len(longest_number) >= 3:
-                return longest_number
-        
-        return None
+        return order_html.extract_part_number(name)
     
     def enrich_with_rebrickable(self):
         """Обогащение данных информацией из Rebrickable"""
@@ -1515,298 +867,154 @@ class OrderParser:
             messagebox.showwarning("Предупреждение", "Нет данных для обогащения")
             return
         
-        try:
-            self.status_var.set("Инициализация API Rebrickable...")
-            self.root.update()
+        # Товары фиксируются на момент запуска: результаты применяются к этим же словарям
+        items = list(self.parsed_data)
+        order_hash = self.order_hash
+        self.start_task("Обогащение", lambda progress: self.resolve_items(items, progress, order_hash),
+                        self.on_enrichment_done, "Ошибка при обогащении данных")
+    
+    def resolve_items(self, items, progress, order_hash=None):
+        """Поиск товаров в каталоге (выполняется в фоновом потоке)"""
+        progress(0, len(items), "ожидание загрузки каталога Rebrickable")
+        
+        # Общий каталог загружен заранее и переиспользуется между заказами
+        api = self.catalog.get()
+        if api is None:
+            raise RuntimeError(f"Каталог Rebrickable не загружен: {self.catalog.error}")
+        if api.parts_df.empty:
+            return api, items, None
+        
+        # Все товары заказа ищутся одним пакетом
+        results = api.resolve_many(items, progress=progress)
+        
+        # Результаты поиска пригодятся для следующих заказов
+        api.save_lookup_cache()
+        
+        # Обогащенный заказ сохраняется целиком, если каталог соответствует текущим CSV
+        if order_hash and self.catalog.is_current():
+            self.result_store.put(order_hash, api.catalog_version(),
+                                  [dict(item, **result) for item, result in zip(items, results)])
+        return api, items, results
+    
+    def on_enrichment_done(self, payload):
+        """Применение найденных данных к товарам (главный поток)"""
+        self.rebrickable_api, items, results = payload
+        self.catalog_status_var.set(self.catalog.status_text())
+        
+        if results is None:
+            messagebox.showwarning("Предупреждение", "Данные Rebrickable не найдены в папке Data/\nCSV файл будет создан с базовой информацией")
             
-            # Инициализация API
-            self.rebrickable_api = RebrickableAPI()
+            # Активация кнопки экспорта даже без обогащения
+            # Ищем кнопку по точному тексту
+            for child in self.root.winfo_children():
+                if isinstance(child, ttk.Frame):
+                    for button in child.winfo_children():
+                        if isinstance(button, ttk.Frame):
+                            for btn in button.winfo_children():
+                                if isinstance(btn, ttk.Button) and btn.cget('text') == "📊 Экспорт в CSV":
+                                    btn.configure(state="normal")
+                                    break
+            return
+        
+        enriched_count = 0
+        changed = set()
+        for item, result in zip(items, results):
+            if any(item.get(field) != value for field, value in result.items()):
+                item.update(result)
+                changed.add(id(item))
             
-            if not self.rebrickable_api.parts_df.empty:
-                self.status_var.set("Обогащение данных...")
-                self.root.update()
-                
-                enriched_count = 0
-                
-                for i, item in enumerate(self.parsed_data):
-                    part_number = item.get('part_number')
-                    item_type = item.get('type')
-                    
-                    if part_number and part_number != 'UNKNOWN':
-                        # Обновляем статус
-                        self.status_var.set(f"Обработка {i+1}/{len(self.parsed_data)}: {part_number}")
-                        self.root.update()
-                        
-                        # Обогащаем данные в зависимости от типа
-                        enriched = False
-                        
-                        # Сначала пробуем найти по определенному типу
-                        if item_type == 'part':
-                            part_info = self.rebrickable_api.search_part(part_number)
-                            if part_info:
-                                item['part_info'] = part_info
-                                enriched_count += 1
-                                enriched = True
-                                print(f"✓ Найдена деталь по номеру: {part_number} -> {part_info['name']}")
-                            else:
-                                # Пробуем найти по названию
-                                part_info = self.rebrickable_api.search_part_by_name(item.get('name', ''))
-                                if part_info:
-                                    item['part_info'] = part_info
-                                    enriched_count += 1
-                                    enriched = True
-                                    print(f"✓ Найдена деталь по названию: {item.get('name', '')} -> {part_info['name']}")
-                        
-                        elif item_type == 'set':
-                            set_info = self.rebrickable_api.search_set(part_number)
-                            if set_info:
-                                item['set_info'] = set_info
-                                enriched_count += 1
-                                enriched = True
-                                print(f"✓ Найден набор по номеру: {part_number} -> {set_info['name']}")
-                            else:
-                                # Пробуем найти по названию
-                                set_info = self.rebrickable_api.search_set_by_name(item.get('name', ''))
-                                if set_info:
-                                    item['set_info'] = set_info
-                                    enriched_count += 1
-                                    enriched = True
-                                    print(f"✓ Найден набор по названию: {item.get('name', '')} -> {set_info['name']}")
-                        
-                        elif item_type == 'minifig':
-                            minifig_info = self.rebrickable_api.search_minifig(part_number)
-                            if minifig_info:
-                                item['minifig_info'] = minifig_info
-                                enriched_count += 1
-                                enriched = True
-                                print(f"✓ Найдена минифигурка по номеру: {part_number} -> {minifig_info['name']}")
-                            else:
-                                # Пробуем найти по названию
-                                minifig_info = self.rebrickable_api.search_minifig_by_name(item.get('name', ''))
-                                if minifig_info:
-                                    item['minifig_info'] = minifig_info
-                                    enriched_count += 1
-                                    enriched = True
-                                    print(f"✓ Найдена минифигурка по названию: {item.get('name', '')} -> {minifig_info['name']}")
-                        
-                        # Если не удалось найти по определенному типу, пробуем все типы
-                        if not enriched:
-                            print(f"⚠ Попытка поиска по всем типам для: {part_number}")
-                            
-                            # Пробуем найти как деталь
-                            part_info = self.rebrickable_api.search_part(part_number)
-                            if part_info:
-                                item['part_info'] = part_info
-                                item['type'] = 'part'  # Обновляем тип
-                                enriched_count += 1
-                                enriched = True
-                                print(f"✓ Найдена как деталь: {part_number} -> {part_info['name']}")
-                            
-                            # Если не найдена как деталь, пробуем как набор
-                            elif not enriched:
-                                set_info = self.rebrickable_api.search_set(part_number)
-                                if set_info:
-                                    item['set_info'] = set_info
-                                    item['type'] = 'set'  # Обновляем тип
-                                    enriched_count += 1
-                                    enriched = True
-                                    print(f"✓ Найдена как набор: {part_number} -> {set_info['name']}")
-                            
-                            # Если не найден как набор, пробуем как минифигурку
-                            elif not enriched:
-                                minifig_info = self.rebrickable_api.search_minifig(part_number)
-                                if minifig_info:
-                                    item['minifig_info'] = minifig_info
-                                    item['type'] = 'minifig'  # Обновляем тип
-                                    enriched_count += 1
-                                    enriched = True
-                                    print(f"✓ Найдена как минифигурка: {part_number} -> {minifig_info['name']}")
-                            
-                            # Если все еще не найдено, пробуем поиск по названию для всех типов
-                            if not enriched:
-                                print(f"⚠ Поиск по названию для всех типов: {item.get('name', '')}")
-                                
-                                # Пробуем как деталь
-                                part_info = self.rebrickable_api.search_part_by_name(item.get('name', ''))
-                                if part_info:
-                                    item['part_info'] = part_info
-                                    item['type'] = 'part'
-                                    enriched_count += 1
-                                    enriched = True
-                                    print(f"✓ Найдена как деталь по названию: {item.get('name', '')} -> {part_info['name']}")
-                                
-                                # Пробуем как набор
-                                elif not enriched:
-                                    set_info = self.rebrickable_api.search_set_by_name(item.get('name', ''))
-                                    if set_info:
-                                        item['set_info'] = set_info
-                                        item['type'] = 'set'
-                                        enriched_count += 1
-                                        enriched = True
-                                        print(f"✓ Найден как набор по названию: {item.get('name', '')} -> {set_info['name']}")
-                                
-                                # Пробуем как минифигурку
-                                elif not enriched:
-                                    minifig_info = self.rebrickable_api.search_minifig_by_name(item.get('name', ''))
-                                    if minifig_info:
-                                        item['minifig_info'] = minifig_info
-                                        item['type'] = 'minifig'
-                                        enriched_count += 1
-                                        enriched = True
-                                        print(f"✓ Найдена как минифигурка по названию: {item.get('name', '')} -> {minifig_info['name']}")
-                            
-                            if not enriched:
-                                print(f"✗ Товар не найден ни в одном типе: {part_number}")
-                        
-                        # Поиск цвета
-                        color_name = item.get('color', '')
-                        if color_name:
-                            color_info = self.rebrickable_api.search_color(color_name)
-                            if color_info:
-                                item['color_info'] = color_info
-                                print(f"✓ Найден цвет: {color_name} -> {color_info['name']}")
-                            else:
-                                print(f"✗ Цвет не найден: {color_name}")
-                    else:
-                        print(f"⚠ Номер не извлечен для: {item.get('name', 'Unknown')}")
-                        # Пробуем найти по названию, если номер не извлечен
-                        item_name = item.get('name', '')
-                        if item_name:
-                            if item_type == 'part':
-                                part_info = self.rebrickable_api.search_part_by_name(item_name)
-                                if part_info:
-                                    item['part_info'] = part_info
-                                    enriched_count += 1
-                                    print(f"✓ Найдена деталь по названию (без номера): {item_name} -> {part_info['name']}")
-                            elif item_type == 'set':
-                                set_info = self.rebrickable_api.search_set_by_name(item_name)
-                                if set_info:
-                                    item['set_info'] = set_info
-                                    enriched_count += 1
-                                    print(f"✓ Найден набор по названию (без номера): {item_name} -> {set_info['name']}")
-                            elif item_type == 'minifig':
-                                minifig_info = self.rebrickable_api.search_minifig_by_name(item_name)
-                                if minifig_info:
-                                    item['minifig_info'] = minifig_info
-                                    enriched_count += 1
-                                    print(f"✓ Найдена минифигурка по названию (без номера): {item_name} -> {minifig_info['name']}")
-                    
-                    # Обновляем таблицу
-                    self.update_table_row(i, item)
-                    
-                    # Обновляем карточки если включен режим карточек
-                    if self.current_view_mode == "cards":
-                        self.update_cards_display()
-                    
-                    # Небольшая задержка для обновления UI
-                    time.sleep(0.01)
-                
-                # Обновляем всю таблицу после завершения обогащения
-                self.update_table_display()
-                
-                self.status_var.set(f"Обогащение завершено. Обработано: {enriched_count}/{len(self.parsed_data)}")
-                
-                # Активация кнопки экспорта
-                # Ищем кнопку по точному тексту
-                for child in self.root.winfo_children():
-                    if isinstance(child, ttk.Frame):
-                        for button in child.winfo_children():
-                            if isinstance(button, ttk.Frame):
-                                for btn in button.winfo_children():
-                                    if isinstance(btn, ttk.Button) and btn.cget('text') == "📊 Экспорт в CSV":
-                                        btn.configure(state="normal")
-                                        break
-                
-                messagebox.showinfo("Успех", f"Обогащение завершено!\nОбработано товаров: {enriched_count}/{len(self.parsed_data)}")
+            info = result.get('part_info') or result.get('set_info') or result.get('minifig_info')
+            if info:
+                enriched_count += 1
+                print(f"✓ Найдено: {item.get('part_number') or item.get('name', '')} -> {info['name']}")
             else:
-                messagebox.showwarning("Предупреждение", "Данные Rebrickable не найдены в папке Data/\nCSV файл будет создан с базовой информацией")
-                
-                # Активация кнопки экспорта даже без обогащения
-                # Ищем кнопку по точному тексту
-                for child in self.root.winfo_children():
-                    if isinstance(child, ttk.Frame):
-                        for button in child.winfo_children():
-                            if isinstance(button, ttk.Frame):
-                                for btn in button.winfo_children():
-                                    if isinstance(btn, ttk.Button) and btn.cget('text') == "📊 Экспорт в CSV":
-                                        btn.configure(state="normal")
-                                        break
-                
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при обогащении данных:\n{str(e)}")
-            self.status_var.set("Ошибка при обогащении")
+                print(f"✗ Товар не найден: {item.get('part_number') or item.get('name', '')}")
+        
+        # Перерисовываются только строки и карточки изменившихся товаров
+        self.request_redraw(i for i, item in enumerate(self.parsed_data) if id(item) in changed)
+        
+        elapsed = time.perf_counter() - self.task_started
+        self.status_var.set(f"Обогащение завершено. Обработано: {enriched_count}/{len(items)} "
+                            f"за {elapsed:.1f} с ({len(items) / max(elapsed, 1e-6):.0f} товаров/с)")
+        
+        # Активация кнопки экспорта
+        # Ищем кнопку по точному тексту
+        for child in self.root.winfo_children():
+            if isinstance(child, ttk.Frame):
+                for button in child.winfo_children():
+                    if isinstance(button, ttk.Frame):
+                        for btn in button.winfo_children():
+                            if isinstance(btn, ttk.Button) and btn.cget('text') == "📊 Экспорт в CSV":
+                                btn.configure(state="normal")
+                                break
+        
+        messagebox.showinfo("Успех", f"Обогащение завершено!\nОбработано товаров: {enriched_count}/{len(items)}")
     
-    def update_table_row(self, index, item):
-        """Обновление строки в таблице"""
-        # Находим элемент в таблице
-        children = self.tree.get_children()
-        if index < len(children):
+    def table_row_values(self, item):
+        """Значения строки таблицы для товара"""
+        # Определяем статус API и название для отображения
+        status = "Не обогащено"
+        display_name = item.get('name', '')
+        
+        if item.get('part_info') or item.get('set_info') or item.get('minifig_info'):
+            status = "✓ Обогащено"
+            # Показываем официальное название из API если доступно
+            if item.get('part_info'):
+                api_name = item['part_info'].get('name', '')
+                if api_name:
+                    display_name = f"✓ {api_name}"
+            elif item.get('set_info'):
+                api_name = item['set_info'].get('name', '')
+                if api_name:
+                    display_name = f"✓ {api_name}"
+            elif item.get('minifig_info'):
+                api_name = item['minifig_info'].get('name', '')
+                if api_name:
+                    display_name = f"✓ {api_name}"
+        
+        return (
+            display_name[:50] + "..." if len(display_name) > 50 else display_name,
+            item.get('part_number', 'UNKNOWN'),
+            item.get('quantity', ''),
+            item.get('color', ''),
+            item.get('type', ''),
+            status
+        )
+    
+    def update_table_row(self, index, item, item_id=None):
+        """Обновление строки в таблице (только если значения изменились)"""
+        if item_id is None:
+            children = self.tree.get_children()
+            if index >= len(children):
+                return
             item_id = children[index]
-            
-            # Определяем статус API и название для отображения
-            status = "Не обогащено"
-            display_name = item.get('name', '')
-            
-            if item.get('part_info') or item.get('set_info') or item.get('minifig_info'):
-                status = "✓ Обогащено"
-                # Показываем официальное название из API если доступно
-                if item.get('part_info'):
-                    api_name = item['part_info'].get('name', '')
-                    if api_name:
-                        display_name = f"✓ {api_name}"
-                elif item.get('set_info'):
-                    api_name = item['set_info'].get('name', '')
-                    if api_name:
-                        display_name = f"✓ {api_name}"
-                elif item.get('minifig_info'):
-                    api_name = item['minifig_info'].get('name', '')
-                    if api_name:
-                        display_name = f"✓ {api_name}"
-            
-            # Обновляем строку
-            self.tree.item(item_id, values=(
-                display_name[:50] + "..." if len(display_name) > 50 else display_name,
-                item.get('part_number', 'UNKNOWN'),
-                item.get('quantity', ''),
-                item.get('color', ''),
-                item.get('type', ''),
-                status
-            ))
+        
+        values = self.table_row_values(item)
+        if self.row_values.get(item_id) != values:
+            self.tree.item(item_id, values=values)
+            self.row_values[item_id] = values
     
     def update_table_display(self):
-        """Обновить отображение таблицы"""
-        # Очищаем таблицу
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        """Обновить отображение таблицы
         
-        # Заполняем таблицу данными
-        for item in self.parsed_data:
-            status = "Не обогащено"
-            display_name = item.get('name', '')
-            
-            if item.get('part_info') or item.get('set_info') or item.get('minifig_info'):
-                status = "✓ Обогащено"
-                if item.get('part_info'):
-                    api_name = item['part_info'].get('name', '')
-                    if api_name:
-                        display_name = f"✓ {api_name}"
-                elif item.get('set_info'):
-                    api_name = item['set_info'].get('name', '')
-                    if api_name:
-                        display_name = f"✓ {api_name}"
-                elif item.get('minifig_info'):
-                    api_name = item['minifig_info'].get('name', '')
-                    if api_name:
-                        display_name = f"✓ {api_name}"
-            
-            self.tree.insert('', 'end', values=(
-                display_name[:50] + "..." if len(display_name) > 50 else display_name,
-                item.get('part_number', 'UNKNOWN'),
-                item.get('quantity', ''),
-                item.get('color', ''),
-                item.get('type', ''),
-                status
-            ))
+        Строки не пересоздаются: недостающие добавляются, лишние удаляются,
+        у остальных меняются только изменившиеся значения.
+        """
+        children = self.tree.get_children()
+        
+        # Лишние строки (товаров стало меньше)
+        extra = children[len(self.parsed_data):]
+        if extra:
+            self.tree.delete(*extra)
+            for item_id in extra:
+                self.row_values.pop(item_id, None)
+        
+        for i, item in enumerate(self.parsed_data):
+            if i < len(children):
+                self.update_table_row(i, item, children[i])
+            else:
+                values = self.table_row_values(item)
+                self.row_values[self.tree.insert('', 'end', values=values)] = values
     
     def export_to_csv(self):
         if not self.parsed_data:
@@ -1821,93 +1029,8 @@ class OrderParser:
             self.status_var.set("Экспорт в CSV...")
             self.root.update()
             
-            with open(self.output_file.get(), 'w', newline='', encoding='utf-8-sig') as csvfile:
-                # Заголовки для импорта в LEGO каталог
-                fieldnames = [
-                    'type', 'id', 'quantity', 'name',
-                    'part_cat_id', 'part_cat_name',
-                    'color_id', 'color_name',
-                    'set_theme_id', 'set_theme_name', 'set_year', 'set_num_parts',
-                    'minifig_num_parts'
-                ]
-                
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=',')
-                writer.writeheader()
-                
-                for item in self.parsed_data:
-                    item_type = item.get('type', 'part')
-                    part_number = item.get('part_number', 'UNKNOWN')
-                    
-                    # Приоритет названий: сначала API, потом оригинальное название
-                    api_name = ""
-                    if item_type == 'part' and item.get('part_info'):
-                        api_name = item['part_info'].get('name', '')
-                    elif item_type == 'set' and item.get('set_info'):
-                        api_name = item['set_info'].get('name', '')
-                    elif item_type == 'minifig' and item.get('minifig_info'):
-                        api_name = item['minifig_info'].get('name', '')
-                    
-                    # Используем название из API если доступно, иначе оригинальное
-                    final_name = api_name if api_name else item.get('name', '')
-                    
-                    if item_type == 'part':
-                        # Для деталей
-                        part_info = item.get('part_info', {})
-                        color_info = item.get('color_info', {})
-                        
-                        writer.writerow({
-                            'type': 'part',
-                            'id': part_number,
-                            'quantity': item.get('quantity', '1'),
-                            'name': final_name,
-                            'part_cat_id': part_info.get('part_cat_id', ''),
-                            'part_cat_name': part_info.get('part_cat_name', ''),
-                            'color_id': color_info.get('id', ''),
-                            'color_name': color_info.get('name', item.get('color', '')),
-                            'set_theme_id': '',
-                            'set_theme_name': '',
-                            'set_year': '',
-                            'set_num_parts': '',
-                            'minifig_num_parts': ''
-                        })
-                    elif item_type == 'set':
-                        # Для наборов
-                        set_info = item.get('set_info', {})
-                        
-                        writer.writerow({
-                            'type': 'set',
-                            'id': part_number,
-                            'quantity': item.get('quantity', '1'),
-                            'name': final_name,
-                            'part_cat_id': '',
-                            'part_cat_name': '',
-                            'color_id': '',
-                            'color_name': '',
-                            'set_theme_id': set_info.get('theme_id', ''),
-                            'set_theme_name': set_info.get('theme_name', ''),
-                            'set_year': set_info.get('year', ''),
-                            'set_num_parts': set_info.get('num_parts', ''),
-                            'minifig_num_parts': ''
-                        })
-                    elif item_type == 'minifig':
-                        # Для минифигурок
-                        minifig_info = item.get('minifig_info', {})
-                        
-                        writer.writerow({
-                            'type': 'minifig',
-                            'id': part_number,
-                            'quantity': item.get('quantity', '1'),
-                            'name': final_name,
-                            'part_cat_id': '',
-                            'part_cat_name': '',
-                            'color_id': '',
-                            'color_name': '',
-                            'set_theme_id': '',
-                            'set_theme_name': '',
-                            'set_year': '',
-                            'set_num_parts': '',
-                            'minifig_num_parts': minifig_info.get('num_parts', '')
-                        })
+            # Формат определяется по расширению: .csv, .jsonl или набор .parquet
+            export_items(self.output_file.get(), self.parsed_data)
             
             self.status_var.set(f"Экспорт завершен: {self.output_file.get()}")
             messagebox.showinfo("Успех", f"Данные успешно экспортированы в файл для импорта:\n{self.output_file.get()}\n\nФайл готов для импорта в каталог LEGO!")
@@ -1918,7 +1041,9 @@ class OrderParser:
     
     def clear_data(self):
         """Очистка всех данных"""
+        self.cancel_task()
         self.parsed_data = []
+        self.order_hash = None
         self.input_file.set("")
         self.output_file.set("")
         self.rebrickable_api = None
@@ -1926,11 +1051,11 @@ class OrderParser:
         # Очистка таблицы
         for item in self.tree.get_children():
             self.tree.delete(item)
+        self.row_values.clear()
         
-        # Очистка карточек
-        if hasattr(self, 'card_frame'):
-            for widget in self.card_frame.winfo_children():
-                widget.destroy()
+        # Очистка карточек (виджеты остаются в пуле)
+        self.render_visible_cards()
+        self.dirty_items.clear()
         
         # Деактивация кнопок
         # Ищем кнопки по точному тексту
@@ -0,0 +1,117 @@
+"""
+Сохраненные результаты разбора и обогащения заказов (по содержимому HTML)
+"""
+
+import os
+import pickle
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from catalog_snapshot import replace_atomically
+
+# Меняется при изменении формата записей, старые записи не читаются
+STORE_FORMAT_VERSION = 1
+
+
+class ResultStore:
+    """Товары заказа после обогащения, сохраненные на диск
+
+    Ключ записи - SHA-1 содержимого HTML заказа и версия каталога
+    (RebrickableAPI.catalog_version). Записи каждой версии каталога лежат в
+    своей папке; после изменения Data/ папки прежних версий удаляются целиком.
+    При превышении max_bytes удаляются давно не использованные записи.
+    """
+
+    def __init__(self, store_dir: Path, max_bytes: int = 50 * 1024 * 1024):
+        self.store_dir = Path(store_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _version_dir(self, version: str) -> Path:
+        return self.store_dir / version[:16]
+
+    def _path(self, content_hash: str, version: str) -> Path:
+        return self._version_dir(version) / f"{content_hash}.pkl"
+
+    def get(self, content_hash: str, version: str) -> Optional[List[Dict]]:
+        """Товары заказа или None, если для этой версии каталога записи нет"""
+        path = self._path(content_hash, version)
+        try:
+            with open(path, 'rb') as f:
+                payload = pickle.load(f)
+        except FileNotFoundError:
+            payload = None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            # Поврежденная запись просто пересоздается
+            payload = None
+            self._remove(path)
+
+        if (not isinstance(payload, dict) or payload.get('format') != STORE_FORMAT_VERSION
+                or payload.get('version') != version or payload.get('hash') != content_hash):
+            self.misses += 1
+            return None
+
+        # Время изменения служит отметкой последнего использования для вытеснения
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return payload['items']
+
+    def put(self, content_hash: str, version: str, items: List[Dict]):
+        """Сохранить товары заказа для версии каталога"""
+        path = self._path(content_hash, version)
+        payload = {'format': STORE_FORMAT_VERSION, 'version': version, 'hash': content_hash, 'items': items}
+        try:
+            self.invalidate(keep_version=version)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            def write(tmp_path):
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            replace_atomically(path, write)
+            self._evict(path.parent)
+        except OSError as e:
+            print(f"Не удалось сохранить результаты заказа: {e}")
+
+    def invalidate(self, keep_version: Optional[str] = None):
+        """Удаление записей всех версий каталога, кроме keep_version"""
+        keep = self._version_dir(keep_version).name if keep_version else None
+        try:
+            version_dirs = [p for p in self.store_dir.iterdir() if p.is_dir() and p.name != keep]
+        except OSError:
+            return
+        for version_dir in version_dirs:
+            shutil.rmtree(version_dir, ignore_errors=True)
+
+    def _remove(self, path: Path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _evict(self, version_dir: Path):
+        """Удаление самых старых записей до 90% лимита"""
+        with self._lock:
+            files = []
+            for path in version_dir.glob("*.pkl"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in files)
+            if total <= self.max_bytes:
+                return
+            files.sort()
+            target = self.max_bytes * 0.9
+            for _, size, path in files:
+                if total <= target:
+                    break
+                self._remove(path)
+                total -= size
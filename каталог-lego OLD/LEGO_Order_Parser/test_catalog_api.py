@@ -0,0 +1,67 @@
+"""
+Проверка поиска по номеру в RebrickableAPI (python -m unittest test_catalog_api)
+"""
+
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from catalog_api import RebrickableAPI
+
+# Порядок строк как в sets.csv Rebrickable: частичное совпадение берет первую
+SETS_CSV = """set_num,name,year,theme_id,num_parts,img_url
+10455-1,Set 10455,2010,1,10,
+1772-1,Set 1772,1998,1,10,
+4552-1,Set 4552,2003,1,10,
+5005051-1,Set 5005051,2017,1,10,
+75192-1,Millennium Falcon,2017,1,7541,
+"""
+
+THEMES_CSV = """id,name,parent_id
+1,Test,
+"""
+
+MINIFIGS_CSV = """fig_num,name,num_parts,img_url
+fig-000001,Toy Store Employee,4,
+sw0578,Clone Trooper,4,
+"""
+
+
+class SetNumberTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        data_dir = Path(cls.tmp.name) / "Data"
+        data_dir.mkdir()
+        (data_dir / "sets.csv").write_text(SETS_CSV, encoding="utf-8")
+        (data_dir / "themes.csv").write_text(THEMES_CSV, encoding="utf-8")
+        (data_dir / "minifigs.csv").write_text(MINIFIGS_CSV, encoding="utf-8")
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.api = RebrickableAPI(data_dir, use_snapshot=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def search_set(self, set_num):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = self.api.search_set(set_num)
+        return result['set_num'] if result else None
+
+    def test_exact_and_case_insensitive(self):
+        self.assertEqual(self.search_set('75192-1'), '75192-1')
+        self.assertEqual(self.search_set(' 75192-1 '), '75192-1')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(self.api.search_minifig('Sw0578')['fig_num'], 'sw0578')
+
+    def test_version_suffix_is_not_merged_with_number(self):
+        # Суффикс версии не склеивается с номером: 455-21 не становится 4552-1
+        self.assertEqual(self.search_set('455-21'), '10455-1')
+        self.assertIsNone(self.search_set('17721-'))
+        self.assertIsNone(self.search_set('50050511'))
+
+
+if __name__ == '__main__':
+    unittest.main()
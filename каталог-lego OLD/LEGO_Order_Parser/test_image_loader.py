@@ -0,0 +1,172 @@
+"""
+Проверка ImageLoader на локальном HTTP-сервере (python -m unittest test_image_loader)
+"""
+
+import io
+import threading
+import time
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from image_loader import ImageLoader
+
+# Задержка ответа сервера: за это время успевают прийти параллельные запросы
+RESPONSE_DELAY = 0.2
+
+
+def jpeg_bytes() -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (120, 120), "red").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class StandInServer:
+    """Сервер изображений: считает запросы и одновременные соединения
+
+    failures[path] - список кодов, которые сервер вернет перед ответом 200
+    (например [429, 503]); путь, начинающийся с /missing, всегда дает 404.
+    """
+
+    def __init__(self):
+        self.image = jpeg_bytes()
+        self.lock = threading.Lock()
+        self.hits = Counter()
+        self.times = {}
+        self.failures = {}
+        self.active = 0
+        self.max_active = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(self)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def handle(self, request):
+        path = request.path.split("/")[-1]
+        with self.lock:
+            self.hits[path] += 1
+            self.times.setdefault(path, []).append(time.monotonic())
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            pending = self.failures.get(path)
+            status = pending.pop(0) if pending else 200
+        try:
+            time.sleep(RESPONSE_DELAY)
+            if path.startswith("missing"):
+                status = 404
+            body = self.image if status == 200 else b""
+            request.send_response(status)
+            request.send_header("Content-Length", str(len(body)))
+            request.end_headers()
+            request.wfile.write(body)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ImageLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer()
+        self.server.start()
+        self.loader = ImageLoader(max_workers=4, base_url=self.server.base_url, timeout=5, backoff=0.1)
+        self.results = {}
+        self.done = threading.Condition()
+
+    def tearDown(self):
+        self.loader.shutdown()
+        self.server.stop()
+
+    def callback(self, key, image, missing):
+        with self.done:
+            self.results.setdefault(key, []).append((image, missing))
+            self.done.notify_all()
+
+    def wait_for(self, count, timeout=10):
+        """Ожидание count вызовов callback"""
+        with self.done:
+            self.assertTrue(self.done.wait_for(
+                lambda: sum(len(r) for r in self.results.values()) >= count, timeout))
+
+    def test_concurrent_fetches(self):
+        numbers = [str(3001 + i) for i in range(8)]
+        started = time.monotonic()
+        for number in numbers:
+            self.loader.request('part', number, self.callback)
+        self.wait_for(len(numbers))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(self.server.max_active, 4)
+        # 8 изображений по 0.2 с в 4 потока - два "раунда", а не восемь
+        self.assertLess(elapsed, len(numbers) * RESPONSE_DELAY / 2)
+        for number in numbers:
+            [(image, missing)] = self.results[('part', number)]
+            self.assertEqual(image.size, (80, 80))
+            self.assertFalse(missing)
+
+    def test_duplicate_requests_are_coalesced(self):
+        for _ in range(5):
+            self.loader.request('part', '3001', self.callback)
+        self.wait_for(5)
+
+        self.assertEqual(self.server.hits['3001.jpg'], 1)
+        self.assertEqual(len(self.results[('part', '3001')]), 5)
+        self.assertEqual(self.loader.stats['requests'], 1)
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        self.server.failures['3001.jpg'] = [429, 503]
+        self.loader.request('part', '3001', self.callback)
+        self.wait_for(1)
+
+        [(image, missing)] = self.results[('part', '3001')]
+        self.assertIsNotNone(image)
+        self.assertFalse(missing)
+        self.assertEqual(self.server.hits['3001.jpg'], 3)
+        self.assertEqual(self.loader.stats['retries'], 2)
+        # Паузы между попытками растут: 0.1 с, затем 0.2 с (плюс время ответа)
+        first, second, third = self.server.times['3001.jpg']
+        self.assertGreaterEqual(second - first, RESPONSE_DELAY + 0.1)
+        self.assertGreaterEqual(third - second, RESPONSE_DELAY + 0.2)
+
+    def test_exhausted_retries_are_not_missing(self):
+        self.server.failures['3001.jpg'] = [500] * 4
+        self.loader.request('part', '3001', self.callback)
+        self.wait_for(1)
+
+        [(image, missing)] = self.results[('part', '3001')]
+        self.assertIsNone(image)
+        self.assertFalse(missing)
+        self.assertEqual(self.server.hits['3001.jpg'], 4)
+        self.assertEqual(self.loader.stats['failed'], 1)
+
+    def test_not_found_is_missing_and_not_retried(self):
+        self.loader.request('part', 'missing-1', self.callback)
+        self.wait_for(1)
+
+        [(image, missing)] = self.results[('part', 'missing-1')]
+        self.assertIsNone(image)
+        self.assertTrue(missing)
+        self.assertEqual(self.server.hits['missing-1.jpg'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Двухуровневый кэш миниатюр: готовые PhotoImage в памяти и файлы на диске
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Hashable, Optional, Tuple
+
+# Отрицательная запись (404) считается актуальной неделю: изображение могут добавить позже
+MISSING_TTL = 7 * 24 * 3600
+
+
+class PhotoCache:
+    """LRU готовых к показу изображений (PhotoImage) в памяти"""
+
+    def __init__(self, max_size: int = 300):
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable):
+        photo = self._data.get(key)
+        if photo is not None:
+            self._data.move_to_end(key)
+        return photo
+
+    def put(self, key: Hashable, photo):
+        self._data[key] = photo
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+
+class ThumbnailCache:
+    """Уменьшенные изображения на диске с ограничением общего размера
+
+    Файлы называются по типу и номеру товара: part_3001.png, set_75192-1.png.
+    Для отсутствующих на сервере изображений хранится пустой файл .404.
+    При превышении max_bytes удаляются давно не использованные файлы.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 100 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _path(self, key: Tuple[str, str], suffix: str) -> Path:
+        item_type, number = key
+        safe_number = re.sub(r'[^\w.-]', '_', str(number))
+        return self.cache_dir / f"{item_type}_{safe_number}{suffix}"
+
+    def get(self, key: Tuple[str, str]) -> Tuple[bool, Optional[Path]]:
+        """(известно ли изображение, путь к файлу или None для отрицательной записи)"""
+        path = self._path(key, ".png")
+        if path.exists():
+            self._touch(path)
+            return True, path
+
+        missing = self._path(key, ".404")
+        try:
+            if time.time() - missing.stat().st_mtime < MISSING_TTL:
+                return True, None
+            missing.unlink()
+        except OSError:
+            pass
+        return False, None
+
+    def put(self, key: Tuple[str, str], image):
+        """Сохранить миниатюру (PIL.Image)"""
+        path = self._path(key, ".png")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            image.save(tmp_path, format="PNG")
+            os.replace(tmp_path, path)
+            self._added(path.stat().st_size)
+        except OSError as e:
+            print(f"Не удалось сохранить миниатюру {path.name}: {e}")
+
+    def put_missing(self, key: Tuple[str, str]):
+        """Запомнить, что изображения на сервере нет"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._path(key, ".404").touch()
+        except OSError:
+            pass
+
+    def _touch(self, path: Path):
+        # Время изменения служит отметкой последнего использования для вытеснения
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _added(self, size: int):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(p.stat().st_size for p in self.cache_dir.glob("*.png"))
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Удаление самых старых файлов до 90% лимита"""
+        files = []
+        for path in self.cache_dir.glob("*.png"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import gc
+import io
+import json
+import math
+import sys
+import tempfile
+import zlib
+from dataclasses import asdict, dataclass, field
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Primary key columns per file. inventory_parts lists a part twice when it is
+# both a regular and a spare part, so is_spare is part of its key;
+# part_relationships has no key column and is compared by the whole row.
+PRIMARY_KEYS: Dict[str, Optional[List[str]]] = {
+    "themes.csv": ["id"],
+    "colors.csv": ["id"],
+    "part_categories.csv": ["id"],
+    "parts.csv": ["part_num"],
+    "part_relationships.csv": None,
+    "elements.csv": ["element_id"],
+    "sets.csv": ["set_num"],
+    "minifigs.csv": ["fig_num"],
+    "inventories.csv": ["id"],
+    "inventory_parts.csv": ["inventory_id", "part_num", "color_id", "is_spare"],
+    "inventory_sets.csv": ["inventory_id", "set_num"],
+    "inventory_minifigs.csv": ["inventory_id", "fig_num"],
+}
+
+DELTA_DIRNAME = "delta"
+# Rows are hash-partitioned so each partition pair fits comfortably in memory
+PARTITION_BYTES = 4 * 1024 * 1024
+
+
+@dataclass
+class FileDelta:
+    name: str
+    status: str  # unchanged, diffed, new, missing, schema_changed
+    key: Optional[List[str]] = None
+    added: int = 0
+    removed: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    outputs: List[str] = field(default_factory=list)
+
+
+def csv_sources(snapshot: Path, name: str) -> List[Path]:
+    """The CSV itself, or its split parts when the original was removed."""
+    if (snapshot / name).is_file():
+        return [snapshot / name]
+    parts_dir = snapshot / f"{Path(name).stem}_split"
+    return sorted(parts_dir.glob(f"{Path(name).stem}_part_*.csv")) if parts_dir.is_dir() else []
+
+
+def records(f) -> Iterator[Tuple[List[str], str]]:
+    """Parsed rows together with their raw text.
+
+    Lines without quotes are split directly, which is exact for them and much
+    faster than csv.reader; quoted records (possibly spanning several lines)
+    go through the csv module.
+    """
+    pending = ""
+    for line in f:
+        if pending or '"' in line:
+            pending += line
+            if pending.count('"') % 2:
+                # Inside a quoted field that continues on the next line
+                continue
+            raw, pending = pending, ""
+            row = parse_record(raw)
+        else:
+            raw = line
+            row = line.rstrip("\r\n").split(",")
+        if row and row != [""]:
+            yield row, raw if raw.endswith("\n") else raw + "\n"
+    if pending:
+        yield parse_record(pending), pending + "\n"
+
+
+def read_records(sources: Sequence[Path]) -> Tuple[Optional[List[str]], Iterator[Tuple[List[str], str]]]:
+    """Header and the records of one CSV or its split parts (each part has the header)."""
+    if not sources:
+        return None, iter(())
+    with sources[0].open("r", newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), None)
+
+    def read() -> Iterator[Tuple[List[str], str]]:
+        for source in sources:
+            with source.open("r", newline="", encoding="utf-8") as f:
+                items = records(f)
+                next(items, None)
+                yield from items
+
+    return header, read()
+
+
+def key_getter(key_index: List[int]) -> Callable[[List[str]], Tuple[str, ...]]:
+    """Row -> key tuple (itemgetter returns a bare value for a single column)."""
+    if len(key_index) == 1:
+        index = key_index[0]
+        return lambda row: (row[index],)
+    return itemgetter(*key_index)
+
+
+def partition(items: Iterator[Tuple[List[str], str]], key_of: Callable, count: int, target: Path) -> None:
+    """Spread records over count files by a stable hash of their key.
+
+    The raw text is written as is: re-serializing every row with csv.writer
+    would cost more than the whole rest of the join.
+    """
+    target.mkdir(parents=True, exist_ok=True)
+    files = [(target / f"{i:04d}.csv").open("w", newline="", encoding="utf-8") for i in range(count)]
+    try:
+        if count == 1:
+            files[0].writelines(raw for _, raw in items)
+            return
+        writes = [f.write for f in files]
+        for row, raw in items:
+            writes[zlib.crc32("\x1f".join(key_of(row)).encode("utf-8")) % count](raw)
+    finally:
+        for f in files:
+            f.close()
+
+
+def load_partition(path: Path, key_of: Callable) -> Dict[Tuple[str, ...], str]:
+    with path.open("r", newline="", encoding="utf-8") as f:
+        return {key_of(row): raw for row, raw in records(f)}
+
+
+def parse_record(raw: str) -> List[str]:
+    return next(csv.reader(io.StringIO(raw)), [])
+
+
+def diff_file(old_snapshot: Path, new_snapshot: Path, name: str, out_dir: Path) -> FileDelta:
+    """Row-level delta of one CSV between two snapshots (partitioned hash join).
+
+    Writes <stem>.added.csv and <stem>.changed.csv with full new rows and
+    <stem>.removed.csv with the key columns of deleted rows.
+    """
+    old_sources = csv_sources(old_snapshot, name)
+    new_sources = csv_sources(new_snapshot, name)
+    if not new_sources:
+        return FileDelta(name, "missing")
+    if not old_sources:
+        return FileDelta(name, "new")
+
+    old_header, old_records = read_records(old_sources)
+    new_header, new_records = read_records(new_sources)
+    if old_header != new_header:
+        return FileDelta(name, "schema_changed")
+
+    key = PRIMARY_KEYS.get(name) or new_header
+    if any(column not in new_header for column in key):
+        return FileDelta(name, "schema_changed")
+    key_of = key_getter([new_header.index(column) for column in key])
+    delta = FileDelta(name, "diffed", key=key)
+
+    size = max(sum(p.stat().st_size for p in old_sources), sum(p.stat().st_size for p in new_sources))
+    count = max(1, math.ceil(size / PARTITION_BYTES))
+    stem = Path(name).stem
+    out_dir.mkdir(parents=True, exist_ok=True)
+    outputs = {kind: out_dir / f"{stem}.{kind}.csv" for kind in ("added", "removed", "changed")}
+
+    # Millions of short-lived row lists only trigger useless cyclic GC passes
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with tempfile.TemporaryDirectory(dir=out_dir) as tmp:
+            join_partitions(old_records, new_records, key_of, count, Path(tmp), outputs, new_header, key, delta)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    for kind, path in outputs.items():
+        if getattr(delta, kind):
+            delta.outputs.append(path.name)
+        else:
+            path.unlink()
+    return delta
+
+
+def join_partitions(
+    old_records: Iterator[Tuple[List[str], str]],
+    new_records: Iterator[Tuple[List[str], str]],
+    key_of: Callable,
+    count: int,
+    tmp: Path,
+    outputs: Dict[str, Path],
+    header: List[str],
+    key: List[str],
+    delta: FileDelta,
+) -> None:
+    """Partition both sides, then compare each pair of partitions in memory."""
+    partition(old_records, key_of, count, tmp / "old")
+    partition(new_records, key_of, count, tmp / "new")
+
+    files = {kind: path.open("w", newline="", encoding="utf-8") for kind, path in outputs.items()}
+    try:
+        csv.writer(files["added"]).writerow(header)
+        csv.writer(files["changed"]).writerow(header)
+        removed = csv.writer(files["removed"])
+        removed.writerow(key)
+        for i in range(count):
+            old = load_partition(tmp / "old" / f"{i:04d}.csv", key_of)
+            new = load_partition(tmp / "new" / f"{i:04d}.csv", key_of)
+            # Sorted within a partition so that reruns produce identical files
+            for row_key in sorted(new):
+                raw = new[row_key]
+                previous = old.pop(row_key, None)
+                if previous is None:
+                    files["added"].write(raw)
+                    delta.added += 1
+                elif previous != raw and parse_record(previous) != parse_record(raw):
+                    # Same text is the same row; different text may still differ only in quoting
+                    files["changed"].write(raw)
+                    delta.changed += 1
+                else:
+                    delta.unchanged += 1
+            for row_key in sorted(old):
+                removed.writerow(row_key)
+                delta.removed += 1
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def diff_snapshots(
+    old_snapshot: Path,
+    new_snapshot: Path,
+    names: Optional[Sequence[str]] = None,
+    unchanged: Sequence[str] = (),
+) -> Dict[str, FileDelta]:
+    """Delta of every CSV between two snapshot directories into new_snapshot/delta.
+
+    Files listed in unchanged (same SHA-256 in both snapshots) are not read.
+    A summary.json with the per-file counts is written next to the deltas.
+    """
+    out_dir = new_snapshot / DELTA_DIRNAME
+    out_dir.mkdir(parents=True, exist_ok=True)
+    deltas: Dict[str, FileDelta] = {}
+    for name in names or PRIMARY_KEYS:
+        if name in unchanged:
+            deltas[name] = FileDelta(name, "unchanged", key=PRIMARY_KEYS.get(name))
+        else:
+            deltas[name] = diff_file(old_snapshot, new_snapshot, name, out_dir)
+
+    summary = {
+        "previous": str(old_snapshot),
+        "current": str(new_snapshot),
+        "files": {name: asdict(delta) for name, delta in deltas.items()},
+    }
+    (out_dir / "summary.json").write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+    return deltas
+
+
+def print_deltas(deltas: Dict[str, FileDelta]) -> None:
+    for delta in deltas.values():
+        if delta.status == "diffed":
+            print(f"  {delta.name}: +{delta.added} -{delta.removed} ~{delta.changed} (={delta.unchanged})")
+        else:
+            print(f"  {delta.name}: {delta.status.replace('_', ' ')}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Row-level delta between two Rebrickable snapshots")
+    parser.add_argument("old", help="previous rebrickable_YYYY-MM-DD_HH-MM-SS directory")
+    parser.add_argument("new", help="current snapshot directory; deltas go to <new>/delta")
+    args = parser.parse_args(argv)
+
+    deltas = diff_snapshots(Path(args.old), Path(args.new))
+    print_deltas(deltas)
+    print(f"Summary: {Path(args.new) / DELTA_DIRNAME / 'summary.json'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
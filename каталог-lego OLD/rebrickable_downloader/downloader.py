@@ -1,13 +1,19 @@
 from __future__ import annotations
 
-import gzip
-import io
+import argparse
+import hashlib
+import json
 import os
 import shutil
 import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 try:
     import requests
@@ -18,12 +24,23 @@ try:
     # When running as a package: python -m rebrickable_downloader.downloader
     from .urls import REBRICKABLE_GZ_URLS
     from .splitter import split_inventory_parts, write_parts_info
+    from .state import STATE_FILENAME, SnapshotState, conditional_headers
+    from .delta import diff_snapshots, print_deltas
 except Exception:  # When frozen into an EXE, relative imports may fail
     from rebrickable_downloader.urls import REBRICKABLE_GZ_URLS  # type: ignore
     from rebrickable_downloader.splitter import (  # type: ignore
         split_inventory_parts,
         write_parts_info,
     )
+    from rebrickable_downloader.state import (  # type: ignore
+        STATE_FILENAME,
+        SnapshotState,
+        conditional_headers,
+    )
+    from rebrickable_downloader.delta import (  # type: ignore
+        diff_snapshots,
+        print_deltas,
+    )
 
 
 def ensure_requests():
@@ -40,37 +57,496 @@ def timestamped_dir(base: Path) -> Path:
     return out
 
 
-def download_gz(url: str) -> bytes:
+# Size of network reads and the cap on decompressed output per step, so
+# memory use stays at a few MB regardless of the file size
+CHUNK_SIZE = 256 * 1024
+# Concurrent downloads; all files come from one CDN host
+DEFAULT_WORKERS = 4
+# Retries after dropped connections and transient server errors: 1, 2, 4, 8, 16 s
+RETRIES = 5
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# (connect, read) timeouts; the read timeout applies to each chunk, not the whole file
+TIMEOUT = (15, 60)
+# Compressed .part files of unfinished downloads, inside the output base directory
+PARTIAL_DIRNAME = ".partial"
+
+
+class TruncatedStream(IOError):
+    """The connection or the gzip stream ended early; the download can be resumed."""
+
+
+class TransientHTTPError(IOError):
+    """A server error worth retrying (429, 5xx)."""
+
+
+class IntegrityError(IOError):
+    """Downloaded data is corrupt or does not match the recorded hash."""
+
+
+def retryable_errors() -> tuple:
     ensure_requests()
-    with requests.get(url, stream=True, timeout=60) as r:  # type: ignore
+    return (
+        TruncatedStream,
+        TransientHTTPError,
+        requests.ConnectionError,  # type: ignore
+        requests.Timeout,  # type: ignore
+        requests.exceptions.ChunkedEncodingError,  # type: ignore
+    )
+
+
+@dataclass
+class DownloadResult:
+    name: str
+    path: Path
+    compressed_bytes: int
+    size: int
+    sha256: str
+    seconds: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # True when the server answered 304 and the previous snapshot's file was linked
+    reused: bool = False
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.compressed_bytes / (1024 * 1024) / max(self.seconds, 1e-6)
+
+
+class GunzipWriter:
+    """Incrementally inflates gzip data into a file, hashing and counting output."""
+
+    def __init__(self, out, chunk_size: int = CHUNK_SIZE):
+        self.out = out
+        self.chunk_size = chunk_size
+        self.digest = hashlib.sha256()
+        self.compressed_bytes = 0
+        self.size = 0
+        # 16 + MAX_WBITS: expect the gzip header; zlib checks the CRC-32 and length
+        # trailer of each member and raises zlib.error on a mismatch
+        self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, chunk: bytes) -> None:
+        self.compressed_bytes += len(chunk)
+        while chunk:
+            if self._inflater.eof:
+                # Concatenated gzip members (valid per RFC 1952): start the next one
+                self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self._write(self._inflater.decompress(chunk, self.chunk_size))
+            chunk = self._inflater.unused_data if self._inflater.eof else self._inflater.unconsumed_tail
+
+    def close(self) -> None:
+        self._write(self._inflater.flush())
+        if not self._inflater.eof:
+            raise TruncatedStream(f"Truncated gzip stream after {self.compressed_bytes} bytes")
+
+    def _write(self, data: bytes) -> None:
+        if data:
+            self.out.write(data)
+            self.digest.update(data)
+            self.size += len(data)
+
+
+def download_to_file(
+    url: str,
+    dest: Path,
+    session=None,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    part_path: Optional[Path] = None,
+    recorded: Optional[dict] = None,
+    retries: int = RETRIES,
+    backoff: float = BACKOFF_SECONDS,
+) -> Optional[DownloadResult]:
+    """Stream a .csv.gz from url and write the decompressed CSV to dest.
+
+    Data goes response -> zlib -> temp file chunk by chunk; dest is replaced
+    only after the whole stream has been inflated and the gzip trailer checked.
+    Returns None when a conditional request (headers) gets 304 Not Modified.
+
+    The compressed bytes are also kept in part_path (default: dest + ".gz.part").
+    Dropped connections and transient HTTP errors are retried with exponential
+    backoff, resuming with a Range request from the end of the .part file; a
+    .part left by an interrupted run is resumed the same way. If the server
+    reports the ETag recorded in the state, the CSV must also match the
+    recorded SHA-256.
+    """
+    ensure_requests()
+    started = time.perf_counter()
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part_path = part_path or dest.with_name(dest.name + ".gz.part")
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    http = session if session is not None else requests
+    for attempt in range(retries + 1):
+        try:
+            result = _download_attempt(url, dest, http, part_path, headers, chunk_size, progress, recorded)
+            if result is not None:
+                result.seconds = time.perf_counter() - started
+            return result
+        except IntegrityError as e:
+            # Corrupt data cannot be resumed: start over from the first byte
+            discard_part(part_path)
+            error = e
+        except retryable_errors() as e:
+            error = e
+        if attempt == retries:
+            raise error
+        delay = min(backoff * 2 ** attempt, MAX_BACKOFF_SECONDS)
+        print(f"  {dest.name}: {error}; retry {attempt + 1}/{retries} in {delay:.0f} s", flush=True)
+        time.sleep(delay)
+    return None  # not reached
+
+
+def _download_attempt(
+    url: str,
+    dest: Path,
+    http,
+    part_path: Path,
+    headers: Optional[Dict[str, str]],
+    chunk_size: int,
+    progress: Optional[Callable[[int, Optional[int]], None]],
+    recorded: Optional[dict],
+) -> Optional[DownloadResult]:
+    meta_path = part_meta_path(part_path)
+    tmp_path = dest.with_name(dest.name + ".tmp")
+    meta = read_part_meta(meta_path)
+    validator = meta.get("etag") or meta.get("last_modified")
+    offset = part_path.stat().st_size if part_path.exists() and meta.get("url") == url and validator else 0
+    if offset:
+        # If-Range: the server sends the rest only if the file has not changed since
+        request_headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+    else:
+        discard_part(part_path)
+        request_headers = dict(headers or {})
+
+    with http.get(url, stream=True, timeout=TIMEOUT, headers=request_headers) as r:
+        if r.status_code == 304:
+            return None
+        if r.status_code in RETRY_STATUSES:
+            raise TransientHTTPError(f"HTTP {r.status_code} for {url}")
+        if r.status_code == 416:
+            # The .part is not a prefix of the current file
+            raise IntegrityError(f"Cannot resume {url} at byte {offset}")
         r.raise_for_status()
-        return r.content
+        if offset and not (r.status_code == 206 and range_start(r) == offset):
+            # Full response: the file changed or the server ignores Range
+            offset = 0
+        if offset:
+            etag, last_modified = meta.get("etag"), meta.get("last_modified")
+        else:
+            etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+            write_part_meta(meta_path, {"url": url, "etag": etag, "last_modified": last_modified})
+        length = int(r.headers["Content-Length"]) if "Content-Length" in r.headers else None
+        total = offset + length if length is not None else None
 
+        try:
+            with tmp_path.open("wb") as out:
+                writer = GunzipWriter(out, chunk_size)
+                try:
+                    if offset:
+                        # Rebuild the decompressor state from the bytes already on disk
+                        with part_path.open("rb") as f:
+                            for chunk in iter(lambda: f.read(chunk_size), b""):
+                                writer.feed(chunk)
+                    with part_path.open("ab" if offset else "wb") as part:
+                        for chunk in r.iter_content(chunk_size):
+                            part.write(chunk)
+                            writer.feed(chunk)
+                            if progress is not None:
+                                progress(writer.compressed_bytes, total)
+                    if total is not None and writer.compressed_bytes < total:
+                        raise TruncatedStream(f"Connection closed after {writer.compressed_bytes} of {total} bytes")
+                    writer.close()
+                except zlib.error as e:
+                    raise IntegrityError(f"Corrupt gzip data in {url}: {e}") from e
 
-def gunzip_bytes(data: bytes) -> bytes:
-    with gzip.GzipFile(fileobj=io.BytesIO(data)) as gz:
-        return gz.read()
+            sha256 = writer.digest.hexdigest()
+            if recorded and etag and etag == recorded.get("etag") and sha256 != recorded.get("sha256"):
+                raise IntegrityError(f"SHA-256 differs from the recorded one for ETag {etag}")
+            os.replace(tmp_path, dest)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    discard_part(part_path)
+    return DownloadResult(
+        name=dest.name,
+        path=dest,
+        compressed_bytes=writer.compressed_bytes,
+        size=writer.size,
+        sha256=sha256,
+        seconds=0.0,
+        etag=etag,
+        last_modified=last_modified,
+    )
+
+
+def range_start(response) -> Optional[int]:
+    """First byte position from a Content-Range header ("bytes 100-199/200")."""
+    try:
+        return int(response.headers["Content-Range"].split()[1].split("-")[0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def part_meta_path(part_path: Path) -> Path:
+    return part_path.with_name(part_path.name + ".json")
+
+
+def read_part_meta(meta_path: Path) -> dict:
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
 
 
-def write_file(path: Path, data: bytes) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("wb") as f:
-        f.write(data)
+def write_part_meta(meta_path: Path, meta: dict) -> None:
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
 
 
-def download_and_extract_all(output_root: Path) -> Path:
+def discard_part(part_path: Path) -> None:
+    part_path.unlink(missing_ok=True)
+    part_meta_path(part_path).unlink(missing_ok=True)
+
+
+def fetch_file(
+    name: str,
+    url: str,
+    out_dir: Path,
+    session=None,
+    previous: Optional[dict] = None,
+    state: Optional[SnapshotState] = None,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    part_dir: Optional[Path] = None,
+) -> DownloadResult:
+    """Download one file, or link it from the previous snapshot if unchanged.
+
+    With a previous state entry the request carries If-None-Match /
+    If-Modified-Since; on 304 the old files are linked (or copied) into out_dir
+    after checking them against the recorded hash.
+    """
+    started = time.perf_counter()
+    part_path = (part_dir / f"{name}.gz.part") if part_dir else None
+    result = download_to_file(
+        url, out_dir / name, session, CHUNK_SIZE, progress, conditional_headers(previous), part_path, previous
+    )
+    if result is not None:
+        return result
+    if previous is None or state is None:
+        raise RuntimeError(f"Unexpected 304 Not Modified for {url}")
+    if not state.verify(name, previous):
+        # The previous copy is damaged: download it again without validators
+        print(f"  {name}: previous copy does not match the recorded hash, downloading again", flush=True)
+        result = download_to_file(url, out_dir / name, session, CHUNK_SIZE, progress, None, part_path, previous)
+        if result is None:
+            raise RuntimeError(f"Unexpected 304 Not Modified for {url}")
+        return result
+    state.reuse(previous, out_dir)
+    return DownloadResult(
+        name=name,
+        path=out_dir / name,
+        compressed_bytes=0,
+        size=previous["size"],
+        sha256=previous["sha256"],
+        seconds=time.perf_counter() - started,
+        etag=previous.get("etag"),
+        last_modified=previous.get("last_modified"),
+        reused=True,
+    )
+
+
+def make_session(workers: int = DEFAULT_WORKERS):
+    """Shared keep-alive session with a connection pool sized for the workers."""
+    ensure_requests()
+    session = requests.Session()  # type: ignore
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers))  # type: ignore
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def remote_size(url: str, session) -> int:
+    """Compressed size from a HEAD request (0 when unknown)."""
+    try:
+        r = session.head(url, allow_redirects=True, timeout=15)
+        r.raise_for_status()
+        return int(r.headers.get("Content-Length", 0))
+    except Exception:
+        return 0
+
+
+class ProgressPrinter:
+    """Thread-safe per-file progress lines, throttled to one per file per interval."""
+
+    def __init__(self, total_files: int, interval: float = 2.0):
+        self.total_files = total_files
+        self.interval = interval
+        self.finished = 0
+        self._last: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def callback(self, name: str) -> Callable[[int, Optional[int]], None]:
+        started = time.perf_counter()
+
+        def report(done: int, total: Optional[int]) -> None:
+            now = time.perf_counter()
+            with self._lock:
+                if now - self._last.get(name, started) < self.interval:
+                    return
+                self._last[name] = now
+            percent = f" ({done * 100 // total}%)" if total else ""
+            speed = done / (1024 * 1024) / max(now - started, 1e-6)
+            print(f"  {name}: {done / (1024 * 1024):.1f} MB{percent}, {speed:.1f} MB/s", flush=True)
+
+        return report
+
+    def done(self, name: str, outcome: Union[DownloadResult, Exception]) -> None:
+        with self._lock:
+            self.finished += 1
+            position = f"[{self.finished}/{self.total_files}]"
+        if isinstance(outcome, Exception):
+            print(f"{position} {name}: FAILED: {outcome}", flush=True)
+        elif outcome.reused:
+            print(f"{position} {name}: not modified, linked from previous snapshot", flush=True)
+        else:
+            print(
+                f"{position} {name}: {outcome.compressed_bytes / (1024 * 1024):.1f} MB gz -> "
+                f"{outcome.size / (1024 * 1024):.1f} MB in {outcome.seconds:.1f} s "
+                f"({outcome.mb_per_second:.1f} MB/s)",
+                flush=True,
+            )
+
+
+def download_all(
+    urls: Dict[str, str],
+    out_dir: Path,
+    workers: int = DEFAULT_WORKERS,
+    session=None,
+    state: Optional[SnapshotState] = None,
+    part_dir: Optional[Path] = None,
+) -> Dict[str, Union[DownloadResult, Exception]]:
+    """Download and extract every file concurrently into out_dir.
+
+    Largest files start first so the long downloads overlap with the small
+    ones. A failed file does not stop the others; its exception is returned
+    in place of the result. With a state, unchanged files are not downloaded.
+    Partial downloads are kept in part_dir (default: out_dir) for resuming.
+    """
+    session = session or make_session(workers)
+    previous = {name: state.entry(name, url) if state else None for name, url in urls.items()}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Sizes recorded by the previous run save the HEAD requests
+        unknown = [name for name in urls if not previous[name]]
+        sizes = {name: entry["compressed_size"] for name, entry in previous.items() if entry}
+        sizes.update(zip(unknown, pool.map(lambda name: remote_size(urls[name], session), unknown)))
+        order = sorted(urls, key=lambda name: sizes[name], reverse=True)
+        printer = ProgressPrinter(len(order))
+        futures = {
+            pool.submit(
+                fetch_file, name, urls[name], out_dir, session, previous[name], state, printer.callback(name), part_dir
+            ): name
+            for name in order
+        }
+        outcomes: Dict[str, Union[DownloadResult, Exception]] = {}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                outcomes[name] = future.result()
+            except Exception as e:
+                outcomes[name] = e
+            printer.done(name, outcomes[name])
+    return {name: outcomes[name] for name in urls}
+
+
+def print_summary(outcomes: Dict[str, Union[DownloadResult, Exception]], seconds: float) -> None:
+    results = [o for o in outcomes.values() if isinstance(o, DownloadResult)]
+    failed = {name: o for name, o in outcomes.items() if isinstance(o, Exception)}
+    compressed = sum(r.compressed_bytes for r in results)
+    reused = sum(1 for r in results if r.reused)
+    print(
+        f"Downloaded {len(results) - reused}/{len(outcomes)} files, unchanged {reused}: "
+        f"{compressed / (1024 * 1024):.1f} MB gz -> {sum(r.size for r in results) / (1024 * 1024):.1f} MB "
+        f"in {seconds:.1f} s ({compressed / (1024 * 1024) / max(seconds, 1e-6):.1f} MB/s)"
+    )
+    for name, error in failed.items():
+        print(f"Failed: {name}: {type(error).__name__}: {error}", file=sys.stderr)
+
+
+def refresh(
+    output_root: Path,
+    workers: int = DEFAULT_WORKERS,
+    full: bool = False,
+    max_part_size_mb: int = 20,
+    delta: bool = True,
+) -> Tuple[Path, Dict[str, Union[DownloadResult, Exception]]]:
+    """Create a new snapshot, downloading only files changed since the last run.
+
+    The state file in output_root remembers validators and hashes per URL;
+    full=True ignores it and downloads everything. With delta=True the rows
+    added, removed and changed since the last complete snapshot (every file
+    downloaded or reused) go to <snapshot>/delta; crashed or partial runs are
+    never used as the base.
+    """
+    output_root.mkdir(parents=True, exist_ok=True)
+    state = SnapshotState(output_root / STATE_FILENAME)
+    base = state.base_snapshot() if delta else None
+    if full:
+        state.files = {}
     out_dir = timestamped_dir(output_root)
-    for name, url in REBRICKABLE_GZ_URLS.items():
-        gz_bytes = download_gz(url)
-        csv_bytes = gunzip_bytes(gz_bytes)
-        write_file(out_dir / name, csv_bytes)
+    started = time.perf_counter()
+    # Partial downloads outlive the run's timestamped directory, so a rerun resumes them
+    outcomes = download_all(REBRICKABLE_GZ_URLS, out_dir, workers, state=state, part_dir=output_root / PARTIAL_DIRNAME)
+    print_summary(outcomes, time.perf_counter() - started)
+
+    split_inventory_parts_like_data(out_dir, max_part_size_mb=max_part_size_mb)
+
+    if base is not None:
+        # Hashes of the base snapshot itself: a file reused from a later partial run may differ from it
+        previous_dir, previous_hashes = base
+        unchanged = [
+            name for name, o in outcomes.items()
+            if isinstance(o, DownloadResult) and o.sha256 == previous_hashes.get(name)
+        ]
+        started = time.perf_counter()
+        deltas = diff_snapshots(previous_dir, out_dir, names=list(REBRICKABLE_GZ_URLS), unchanged=unchanged)
+        print(f"Delta against {previous_dir.name} ({time.perf_counter() - started:.1f} s):")
+        print_deltas(deltas)
+
+    for name, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            continue
+        previous = state.files.get(name)
+        outputs = previous["outputs"] if outcome.reused else snapshot_outputs(out_dir, name)
+        state.record(name, REBRICKABLE_GZ_URLS[name], outcome, out_dir, outputs)
+    if not any(isinstance(o, Exception) for o in outcomes.values()):
+        state.mark_complete(out_dir)
+    state.save()
+    return out_dir, outcomes
+
+
+def snapshot_outputs(out_dir: Path, name: str) -> List[str]:
+    """Files a downloaded CSV ended up as in the snapshot (relative paths)."""
+    parts_dir = out_dir / "inventory_parts_split"
+    if name == "inventory_parts.csv" and not (out_dir / name).exists() and parts_dir.is_dir():
+        return [f"{parts_dir.name}/{p.name}" for p in sorted(parts_dir.iterdir()) if p.is_file()]
+    return [name]
+
+
+def download_and_extract_all(output_root: Path, workers: int = DEFAULT_WORKERS) -> Path:
+    out_dir, outcomes = refresh(output_root, workers)
+    failed = [name for name, o in outcomes.items() if isinstance(o, Exception)]
+    if failed:
+        raise RuntimeError(f"Failed to download: {', '.join(failed)}")
     return out_dir
 
 
 def split_inventory_parts_like_data(output_dir: Path, max_part_size_mb: int = 20) -> None:
     source_csv = output_dir / "inventory_parts.csv"
     if not source_csv.exists():
-        print(f"inventory_parts.csv not found in {output_dir}")
+        if not (output_dir / "inventory_parts_split").is_dir():
+            print(f"inventory_parts.csv not found in {output_dir}")
+        # Otherwise the split parts were linked from the previous snapshot
         return
 
     parts_dir = output_dir / "inventory_parts_split"
@@ -99,14 +575,22 @@ def split_inventory_parts_like_data(output_dir: Path, max_part_size_mb: int = 20
 
 
 def main(argv=None) -> int:
-    argv = argv or sys.argv[1:]
-    base = Path.cwd() / "Downloads"
-    if len(argv) >= 1:
-        base = Path(argv[0]).expanduser().resolve()
-    out_dir = download_and_extract_all(base)
-    split_inventory_parts_like_data(out_dir, max_part_size_mb=20)
-    print(f"Done. Output: {out_dir}")
-    return 0
+    parser = argparse.ArgumentParser(description="Download Rebrickable CSV files")
+    parser.add_argument("output", nargs="?", default=str(Path.cwd() / "Downloads"),
+                        help="base directory for rebrickable_YYYY-MM-DD_HH-MM-SS (default: ./Downloads)")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"concurrent downloads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--full", action="store_true",
+                        help=f"ignore {STATE_FILENAME} and download every file")
+    parser.add_argument("--no-delta", action="store_true",
+                        help="do not compute row-level changes against the previous snapshot")
+    args = parser.parse_args(argv)
+
+    base = Path(args.output).expanduser().resolve()
+    out_dir, outcomes = refresh(base, max(1, args.workers), full=args.full, delta=not args.no_delta)
+    failed = [name for name, o in outcomes.items() if isinstance(o, Exception)]
+    print(f"{'Done with errors' if failed else 'Done'}. Output: {out_dir}")
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+STATE_FILENAME = "rebrickable_state.json"
+STATE_FORMAT = 1
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    """Hard-link src to dst, falling back to a copy (other drive, no link support)."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class SnapshotState:
+    """What previous runs downloaded, per file name.
+
+    Stored as JSON next to the snapshot directories. Each entry keeps the
+    source URL, the HTTP validators (ETag, Last-Modified), the compressed and
+    extracted sizes, the SHA-256 of the CSV and the files it produced in the
+    snapshot (inventory_parts.csv becomes the inventory_parts_split/ parts).
+    The last run that got every file is kept separately with the hashes it
+    had, as the base for row-level deltas.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: Dict[str, dict] = {}
+        self.complete: Optional[dict] = None
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("format") == STATE_FORMAT:
+                self.files = data.get("files", {})
+                self.complete = data.get("complete")
+        except (OSError, ValueError):
+            pass
+
+    def entry(self, name: str, url: str) -> Optional[dict]:
+        """Previous entry for name if it is for the same URL and its files are still there."""
+        entry = self.files.get(name)
+        if not entry or entry.get("url") != url:
+            return None
+        snapshot = Path(entry["snapshot"])
+        for rel in entry["outputs"]:
+            if not (snapshot / rel).is_file():
+                return None
+        if entry["outputs"] == [name] and (snapshot / name).stat().st_size != entry["size"]:
+            return None
+        return entry
+
+    def verify(self, name: str, entry: dict) -> bool:
+        """Check a single-file entry against its recorded SHA-256 before reusing it."""
+        if entry["outputs"] != [name]:
+            # Split parts have no recorded hash of their own; their presence was checked
+            return True
+        return file_sha256(Path(entry["snapshot"]) / entry["outputs"][0]) == entry["sha256"]
+
+    def reuse(self, entry: dict, out_dir: Path) -> None:
+        """Link the files of a previous entry into a new snapshot."""
+        snapshot = Path(entry["snapshot"])
+        for rel in entry["outputs"]:
+            link_or_copy(snapshot / rel, out_dir / rel)
+
+    def record(self, name: str, url: str, result, out_dir: Path, outputs: Optional[List[str]] = None) -> None:
+        self.files[name] = {
+            "url": url,
+            "etag": result.etag,
+            "last_modified": result.last_modified,
+            "compressed_size": result.compressed_bytes or self.files.get(name, {}).get("compressed_size", 0),
+            "size": result.size,
+            "sha256": result.sha256,
+            "snapshot": str(out_dir),
+            "outputs": outputs or [name],
+        }
+
+    def mark_complete(self, out_dir: Path) -> None:
+        """Remember out_dir as a snapshot in which every file was downloaded or reused."""
+        self.complete = {
+            "snapshot": str(out_dir),
+            "sha256": {name: entry["sha256"] for name, entry in self.files.items()},
+        }
+
+    def base_snapshot(self) -> Optional[Tuple[Path, Dict[str, str]]]:
+        """Last complete snapshot and the SHA-256 of its files, if it still exists.
+
+        State files written before complete runs were marked fall back to the
+        entries themselves when they all point to the same snapshot.
+        """
+        if self.complete:
+            snapshot, hashes = Path(self.complete["snapshot"]), self.complete["sha256"]
+        else:
+            snapshots = {entry["snapshot"] for entry in self.files.values()}
+            if len(snapshots) != 1:
+                return None
+            snapshot = Path(snapshots.pop())
+            hashes = {name: entry["sha256"] for name, entry in self.files.items()}
+        return (snapshot, hashes) if snapshot.is_dir() else None
+
+    def save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        data = {"format": STATE_FORMAT, "files": self.files, "complete": self.complete}
+        tmp_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+def conditional_headers(entry: Optional[dict]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since for a previously downloaded file."""
+    headers: Dict[str, str] = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
@@ -0,0 +1,261 @@
+"""Downloader tests against a local http.server stand-in for the CDN.
+
+Run from the repository folder: python -m unittest rebrickable_downloader.test_downloader
+"""
+from __future__ import annotations
+
+import contextlib
+import gzip
+import hashlib
+import io
+import random
+import socket
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from rebrickable_downloader import downloader
+from rebrickable_downloader.downloader import (
+    DownloadResult,
+    IntegrityError,
+    download_all,
+    download_to_file,
+    part_meta_path,
+    print_summary,
+    write_part_meta,
+)
+
+
+def make_csv(rows: int, seed: int = 1) -> bytes:
+    rng = random.Random(seed)
+    lines = ["id,part_num,color_id,quantity"]
+    lines += [f"{i},{rng.randrange(10 ** 6)},{rng.randrange(300)},{rng.randrange(50)}" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def etag_of(data: bytes) -> str:
+    return '"%s"' % hashlib.md5(data).hexdigest()
+
+
+class StandInServer:
+    """Serves files[path] with ETag, Range and If-Range, like the Rebrickable CDN.
+
+    drop[path] = (bytes, times): the first `times` responses are cut after
+    `bytes` bytes of body. Paths in ignore_range always get the full 200.
+    Every request is logged as (path, Range, If-Range, status).
+    """
+
+    def __init__(self):
+        self.files: dict = {}
+        self.drop: dict = {}
+        self.ignore_range: set = set()
+        self.log: list = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_HEAD(self):
+                server.handle(self, head=True)
+
+            def do_GET(self):
+                server.handle(self, head=False)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/{path}"
+
+    def handle(self, request, head: bool) -> None:
+        path = request.path.lstrip("/")
+        data = self.files.get(path)
+        if data is None:
+            if not head:
+                with self.lock:
+                    self.log.append((path, None, None, 404))
+            request.send_response(404)
+            request.send_header("Content-Length", "0")
+            request.end_headers()
+            return
+        etag = etag_of(data)
+        start, status = 0, 200
+        range_header, if_range = request.headers.get("Range"), request.headers.get("If-Range")
+        if range_header and path not in self.ignore_range and if_range in (None, etag):
+            start, status = int(range_header.split("=")[1].split("-")[0]), 206
+        with self.lock:
+            if not head:
+                self.log.append((path, range_header, if_range, status))
+            cut = None
+            dropped, times = self.drop.get(path, (0, 0))
+            if not head and times:
+                self.drop[path] = (dropped, times - 1)
+                cut = dropped
+        body = data[start:]
+        request.send_response(status)
+        request.send_header("ETag", etag)
+        request.send_header("Accept-Ranges", "bytes")
+        request.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            request.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        request.end_headers()
+        if head:
+            return
+        if cut is not None:
+            request.wfile.write(body[:cut])
+            request.wfile.flush()
+            request.close_connection = True
+            request.connection.shutdown(socket.SHUT_RDWR)
+            return
+        request.wfile.write(body)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.csv = make_csv(20000)
+        self.gz = gzip.compress(self.csv)
+        self.server = StandInServer().__enter__()
+        self.server.files["parts.csv.gz"] = self.gz
+        self.url = self.server.url("parts.csv.gz")
+        self.dest = self.dir / "parts.csv"
+        self.part = self.dir / "parts.csv.gz.part"
+
+    def tearDown(self):
+        self.server.__exit__()
+        self.tmp.cleanup()
+
+    def download(self, **kwargs):
+        kwargs.setdefault("backoff", 0.01)
+        return download_to_file(self.url, self.dest, chunk_size=4096, part_path=self.part, **kwargs)
+
+    def assert_published(self, result):
+        self.assertEqual(self.dest.read_bytes(), self.csv)
+        self.assertEqual(result.sha256, hashlib.sha256(self.csv).hexdigest())
+        self.assertEqual(result.size, len(self.csv))
+        self.assertFalse(self.part.exists())
+        self.assertFalse(part_meta_path(self.part).exists())
+
+    def test_dropped_connection_resumes_with_range(self):
+        self.server.drop["parts.csv.gz"] = (len(self.gz) // 3, 1)
+        result = self.download()
+
+        self.assert_published(result)
+        first, second = self.server.log
+        self.assertEqual(first[3], 200)
+        # Resumed from what reached the .part (whole chunks before the drop)
+        offset = int(second[1].split("=")[1].rstrip("-"))
+        self.assertTrue(0 < offset <= len(self.gz) // 3)
+        self.assertEqual(second[2], etag_of(self.gz))
+        self.assertEqual(second[3], 206)
+        self.assertEqual(result.compressed_bytes, len(self.gz))
+
+    def test_server_ignoring_range_restarts_from_zero(self):
+        self.server.drop["parts.csv.gz"] = (len(self.gz) // 3, 1)
+        self.server.ignore_range.add("parts.csv.gz")
+        result = self.download()
+
+        self.assert_published(result)
+        second = self.server.log[1]
+        self.assertIsNotNone(second[1])
+        self.assertEqual(second[3], 200)
+
+    def test_stale_part_is_replaced_when_if_range_does_not_match(self):
+        # A .part of an older version of the file, left by an interrupted run
+        old_gz = gzip.compress(make_csv(20000, seed=2))
+        self.part.write_bytes(old_gz[: len(old_gz) // 2])
+        write_part_meta(part_meta_path(self.part), {"url": self.url, "etag": etag_of(old_gz), "last_modified": None})
+        result = self.download()
+
+        self.assert_published(result)
+        [request] = self.server.log
+        self.assertEqual(request[2], etag_of(old_gz))
+        self.assertEqual(request[3], 200)
+
+    def test_hash_mismatch_is_not_published(self):
+        self.dest.write_bytes(b"previous\n")
+        recorded = {"etag": etag_of(self.gz), "sha256": "0" * 64}
+        with self.assertRaises(IntegrityError):
+            self.download(recorded=recorded, retries=1)
+
+        self.assertEqual(self.dest.read_bytes(), b"previous\n")
+        self.assertFalse((self.dir / "parts.csv.tmp").exists())
+        self.assertEqual(len(self.server.log), 2)
+
+    def test_size_mismatch_is_not_published(self):
+        # Wrong ISIZE in the gzip trailer: the data inflates but its length is off
+        self.server.files["parts.csv.gz"] = self.gz[:-4] + (len(self.csv) + 1).to_bytes(4, "little")
+        with self.assertRaises(IntegrityError):
+            self.download(retries=1)
+
+        self.assertFalse(self.dest.exists())
+        self.assertFalse((self.dir / "parts.csv.tmp").exists())
+        self.assertFalse(self.part.exists())
+
+
+class DownloadAllTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.server = StandInServer().__enter__()
+        self.csvs = {"themes.csv": make_csv(100), "parts.csv": make_csv(20000), "sets.csv": make_csv(3000)}
+        for name, data in self.csvs.items():
+            self.server.files[f"{name}.gz"] = gzip.compress(data)
+        # colors.csv is not on the server: its download fails with 404
+        self.urls = {name: self.server.url(f"{name}.gz") for name in [*self.csvs, "colors.csv"]}
+
+    def tearDown(self):
+        self.server.__exit__()
+        self.tmp.cleanup()
+
+    def test_largest_files_are_scheduled_first(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_all(self.urls, self.dir, workers=1)
+
+        requested = [path for path, *_ in self.server.log]
+        self.assertEqual(requested, ["parts.csv.gz", "sets.csv.gz", "themes.csv.gz", "colors.csv.gz"])
+
+    def test_failed_file_does_not_stop_the_others(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            outcomes = download_all(self.urls, self.dir, workers=2)
+
+        self.assertEqual(list(outcomes), list(self.urls))
+        self.assertIsInstance(outcomes["colors.csv"], Exception)
+        for name, data in self.csvs.items():
+            self.assertIsInstance(outcomes[name], DownloadResult)
+            self.assertEqual((self.dir / name).read_bytes(), data)
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            print_summary(outcomes, 1.0)
+        self.assertIn("Downloaded 3/4 files", stdout.getvalue())
+        self.assertIn("Failed: colors.csv: HTTPError", stderr.getvalue())
+
+    def test_exit_code_is_1_when_a_file_fails(self):
+        stdout = io.StringIO()
+        with mock.patch.object(downloader, "REBRICKABLE_GZ_URLS", self.urls), \
+                contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            code = downloader.main([str(self.dir), "-j", "2", "--no-delta"])
+
+        self.assertEqual(code, 1)
+        self.assertIn("Done with errors", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()